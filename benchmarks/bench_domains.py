@@ -0,0 +1,56 @@
+"""
+Microbenchmark of registered-domain extraction: tldextract.extract (the
+original utils.extract_link_domain) against the bundled suffix list lookup,
+per link and in batches of one page's links. Also checks both agree.
+
+Usage: python -m benchmarks.bench_domains
+"""
+import random
+import time
+
+import tldextract
+
+from src.webscraper import domains
+
+NUM_PAGES = 500
+LINKS_PER_PAGE = 50
+HOSTS = ["example.com", "www.example.com", "blog.example.co.uk", "shop.example.com.au", "example.org",
+         "cdn.example.net", "www.city.kawasaki.jp", "news.example.de", "example.github.io", "192.168.0.1"]
+
+
+def page_links(seed=0):
+    """
+    Links found on each page of a synthetic crawl, mostly same-site
+    """
+    rng = random.Random(seed)
+    return [[f"https://{rng.choice(HOSTS)}/section-{rng.randint(0, 20)}/page-{rng.randint(0, 1000)}?id={n}"
+             for n in range(LINKS_PER_PAGE)] for _ in range(NUM_PAGES)]
+
+
+def timed(function, pages):
+    start = time.perf_counter()
+    for links in pages:
+        function(links)
+    return time.perf_counter() - start
+
+
+def main():
+    pages = page_links()
+    links = [link for page in pages for link in page]
+    mismatches = [link for link in links
+                  if tldextract.extract(link).registered_domain.lower() != domains.link_domain(link)]
+    print(f"{len(links)} links, {len(mismatches)} disagreements with tldextract")
+
+    domains.registered_domain.cache_clear()
+    results = [
+        ("tldextract", timed(lambda page: [tldextract.extract(link).registered_domain.lower() for link in page], pages)),
+        ("link_domain", timed(lambda page: [domains.link_domain(link) for link in page], pages)),
+        ("link_domains", timed(domains.link_domains, pages)),
+    ]
+    print(f"{'method':>12} {'seconds':>8} {'us/link':>8} {'speedup':>8}")
+    for name, seconds in results:
+        print(f"{name:>12} {seconds:>8.3f} {seconds / len(links) * 1e6:>8.2f} {results[0][1] / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
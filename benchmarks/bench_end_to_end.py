@@ -0,0 +1,109 @@
+"""
+Benchmark end-to-end scraper throughput (sites/hour) offline.
+
+scrape.main runs unchanged against the local backends: sites are read from
+an in-memory LocalQueue and results written to a LocalBucket on disk, so
+no AWS account is needed. The crawl of each site is simulated (a fixed
+latency, then a text file of words), so the numbers measure the pipeline
+around the crawl: queue reads and deletes, uploads, success-rate and
+metadata bookkeeping. Runs in a scratch directory with its own params.json.
+
+Usage: python -m benchmarks.bench_end_to_end [num_sites]
+"""
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import contextlib
+
+NUM_SITES = 200
+SITE_LATENCY = 0.01 # Simulated seconds per site crawl
+SITE_WORDS = 2000
+OVERRIDES = {
+    "storage_backend": "local",
+    "queue_backend": "local",
+    "local_storage_dir": "local_storage",
+    "num_processes": 1, # Simulated crawl is patched into this process only
+    "sqs_wait_time": 0
+}
+
+
+class FakeDriverPool:
+    """
+    Stand-in for DriverPool: the simulated crawl never starts Chrome
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def warm(self, count=None):
+        pass
+
+    def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def simulated_crawl(scrape):
+    """
+    crawl_site replacement: waits SITE_LATENCY, then writes a site's text
+    file as the real crawl does
+    """
+    def crawl_site(url, driver_pool=None, sampler=None, seen_store=None):
+        time.sleep(SITE_LATENCY)
+        result = scrape.new_result(url)
+        result["code"] = 200
+        result["total_words"] = SITE_WORDS
+        result["duration"] = SITE_LATENCY
+        result["text_file"] = os.path.join(os.getcwd(), f"{result['home_domain']}.txt")
+        with open(result["text_file"], 'w', encoding='utf-8') as f:
+            f.write(" ".join(f"word{n % 500}" for n in range(SITE_WORDS)))
+        return result
+    return crawl_site
+
+
+def main():
+    num_sites = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_SITES
+    with open("params.json") as f:
+        params = json.load(f)
+    params.update(OVERRIDES)
+    start_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            with open("params.json", 'w') as f:
+                json.dump(params, f)
+            # Imported here so config reads the scratch params.json
+            from src.webscraper import scrape
+            from src.webscraper.backends import sqs_queue, s3_bucket
+            from src.webscraper.uploader import shared_uploader
+
+            scrape.crawl_site = simulated_crawl(scrape)
+            scrape.DriverPool = FakeDriverPool
+            queue = sqs_queue()
+            for n in range(num_sites):
+                queue.send_message(MessageBody="", MessageAttributes={
+                    "domain": {"StringValue": f"site{n}.com", "DataType": "String"}})
+
+            start = time.time()
+            with contextlib.redirect_stdout(io.StringIO()): # main prints a summary of every run
+                scrape.main("bench-queue", num_sites)
+            duration = time.time() - start
+
+            objects = len(s3_bucket().objects.filter(Prefix="html_data/"))
+            uploader = shared_uploader()
+            print(f"{'sites':>6} {'seconds':>8} {'sites/hour':>11} {'crawl share':>12} {'uploaded':>9} {'left in queue':>14}")
+            print(f"{num_sites:>6} {duration:>8.2f} {num_sites / duration * 3600:>11.0f} "
+                  f"{num_sites * SITE_LATENCY / duration:>11.0%} {objects:>9} {len(queue):>14}")
+            if uploader.failed > 0:
+                print(f"{uploader.failed} uploads failed")
+        finally:
+            os.chdir(start_directory)
+
+
+if __name__ == "__main__":
+    main()
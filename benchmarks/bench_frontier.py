@@ -0,0 +1,80 @@
+"""
+Microbenchmark of the Frontier against the original MinHeap, replaying the
+pattern SmartQueue uses: every scanned page reports links, each link is
+deduplicated against visited and queued links, and new ones are inserted.
+
+Usage: python -m benchmarks.bench_frontier
+"""
+import random
+import time
+
+from src.webscraper import utils as ut
+from src.webscraper.frontier import Frontier
+from src.webscraper.minheap import MinHeap
+
+PAGE_COUNTS = [100, 500, 1000]
+LINKS_PER_PAGE = 20
+
+
+def link_in_queue_scan(link_to_check, queue):
+    """
+    Original utils.link_in_queue: copies and scans every queued link
+    """
+    queued_links = list(queue.indices.keys())
+    for link in queued_links:
+        if link_to_check == link:
+            return True
+    return False
+
+
+def site_links(num_pages, seed=0):
+    """
+    Links found on each page of a synthetic site; about half were seen before
+    """
+    rng = random.Random(seed)
+    pages = []
+    for n in range(num_pages):
+        pages.append([f"https://example.com/section-{rng.randint(0, 20)}/page-{rng.randint(0, 2 * num_pages)}"
+                      for _ in range(LINKS_PER_PAGE)])
+    return pages
+
+
+def run_minheap(pages):
+    queue = MinHeap(len(pages) * LINKS_PER_PAGE + 1)
+    queue.insert(0, "https://example.com")
+    for links in pages:
+        if queue.is_empty():
+            break
+        queue.remove_next()
+        for link in links:
+            if (link not in queue.visited) and not link_in_queue_scan(link, queue):
+                queue.insert(queue.size() + 1 + 100 * ut.num_slashes(link), link)
+
+
+def run_frontier(pages):
+    queue = Frontier()
+    queue.insert(0, "https://example.com")
+    for links in pages:
+        if queue.is_empty():
+            break
+        queue.remove_next()
+        for link in links:
+            if not queue.seen(link):
+                queue.insert(queue.size() + 1 + 100 * ut.num_slashes(link), link)
+
+
+def main():
+    print(f"{'pages':>6} {'MinHeap (s)':>12} {'Frontier (s)':>13} {'speedup':>8}")
+    for num_pages in PAGE_COUNTS:
+        pages = site_links(num_pages)
+        start = time.perf_counter()
+        run_minheap(pages)
+        minheap_time = time.perf_counter() - start
+        start = time.perf_counter()
+        run_frontier(pages)
+        frontier_time = time.perf_counter() - start
+        print(f"{num_pages:>6} {minheap_time:>12.4f} {frontier_time:>13.4f} {minheap_time / frontier_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
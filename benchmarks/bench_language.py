@@ -0,0 +1,54 @@
+"""
+Benchmark root-page language detection: the original check (langdetect.detect
+on the whole body text) against LanguageGate, for a page that declares its
+language and one that does not, on a synthetic 1000-word page.
+
+Usage: python -m benchmarks.bench_language
+"""
+import time
+import random
+
+import langdetect
+
+from src.webscraper.language import LanguageGate
+from src.webscraper.thread import page_result
+
+NUM_WORDS = 1000 # Words on the root page (max_words_per_page)
+REPEATS = 20
+SENTENCE = ("the company provides software and services that help businesses track time "
+            "manage projects and report on budgets for their teams and customers").split()
+
+
+def make_page():
+    rng = random.Random(0)
+    return [rng.choice(SENTENCE) for _ in range(NUM_WORDS)]
+
+
+def measure(check):
+    """
+    Returns: (ms per call, set of verdicts) (tuple)
+    """
+    check() # Load detector profiles outside the timing
+    verdicts = set()
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        verdicts.add(check())
+    return ((time.perf_counter() - start) / REPEATS * 1000, verdicts)
+
+
+def main():
+    words = make_page()
+    gate = LanguageGate()
+    checks = [
+        ("langdetect, full text", lambda: langdetect.detect(" ".join(words)) == "en"),
+        ("gate, sampled text", lambda: gate.is_english(page_result(words, []))),
+        ("gate, <html lang>", lambda: gate.is_english(page_result(words, [], lang="en-US")))
+    ]
+    print(f"{'method':>22} {'ms/page':>8} {'verdicts':>9}")
+    for name, check in checks:
+        ms, verdicts = measure(check)
+        print(f"{name:>22} {ms:>8.2f} {len(verdicts):>9}")
+
+
+if __name__ == "__main__":
+    main()
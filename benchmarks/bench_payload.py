@@ -0,0 +1,103 @@
+"""
+Benchmark building and encoding a site's data JSON on a synthetic 100k-word
+site: the original path (Processor.get_text string concatenation, then
+json.dumps twice) against the streaming path (Processor.write_text, then
+the payload encoder read the way an S3 upload reads it), and the streaming
+path in the compressed "json" and "ndjson" payload formats. Each run happens
+in a fresh process so peak RSS is measured separately.
+
+Usage: python -m benchmarks.bench_payload
+"""
+import os
+import json
+import time
+import random
+import resource
+import tempfile
+import multiprocessing as mp
+
+from src.webscraper.processor import Processor
+from src.webscraper.payload import PieceReader, encoded_payload, read_text_chunks
+
+NUM_PAGES = 100
+WORDS_PER_PAGE = 1000 # 100k words per site
+UPLOAD_READ_SIZE = 8 * 1024 * 1024 # Bytes an S3 upload reads at a time
+METHODS = {"original": None, "streaming": "legacy", "json-gzip": "json", "ndjson-gzip": "ndjson"} # -> payload format
+FIELDS = {"domain": "https://example.com", "date": "2024-01-01_00:00:00", "duration": 120.0,
+          "count": NUM_PAGES * WORDS_PER_PAGE}
+
+
+class FakeQueue:
+    """
+    Stand-in for a scanned SmartQueue: just the page text
+    """
+
+    def __init__(self):
+        rng = random.Random(0)
+        vocabulary = [f"word{n}" for n in range(20000)]
+        self.text = [[rng.choice(vocabulary) for _ in range(WORDS_PER_PAGE)] for _ in range(NUM_PAGES)]
+        self.english = True
+
+
+def original_get_text(queue):
+    """
+    Original Processor.get_text
+    """
+    result = ''
+    for page in queue.text:
+        for word in page:
+            result += word
+            result += " "
+    return result
+
+
+def run_original(queue, directory):
+    data = dict(FIELDS, html=original_get_text(queue))
+    json_data = json.dumps(data, indent = 2)
+    body = json.dumps(json_data).encode("utf-8") # put_object encodes the string body
+    return len(body)
+
+
+def run_streaming(queue, directory, payload_format="legacy"):
+    text_file = os.path.join(directory, "site.txt")
+    Processor(queue).write_text(text_file)
+    pieces, compress, _ = encoded_payload(FIELDS, read_text_chunks(text_file), payload_format)
+    reader = PieceReader(pieces, compress)
+    size = 0
+    while True:
+        block = reader.read(UPLOAD_READ_SIZE)
+        if not block:
+            return size
+        size += len(block)
+
+
+def measure(method):
+    """
+    Run one method in this (fresh) process
+
+    Returns: (seconds, extra peak RSS in MB, payload bytes) (tuple)
+    """
+    queue = FakeQueue()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        if method == "original":
+            size = run_original(queue, directory)
+        else:
+            size = run_streaming(queue, directory, METHODS[method])
+        seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline # kB on Linux
+    return (seconds, peak / 1024, size)
+
+
+def main():
+    print(f"{'method':>12} {'seconds':>8} {'peak RSS (MB)':>14} {'bytes':>9}")
+    context = mp.get_context("spawn")
+    for method in METHODS:
+        with context.Pool(1) as pool:
+            seconds, peak, size = pool.apply(measure, (method,))
+        print(f"{method:>12} {seconds:>8.3f} {peak:>14.1f} {size:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark SmartQueue throughput (pages/sec) as the number of threads grows.
+
+Pages are served by a fake scanner that sleeps for a fixed latency and
+returns a few new links, so the numbers measure the queue's worker loop
+rather than Chrome or the network.
+
+Usage: python -m benchmarks.bench_threads
+"""
+import os
+import time
+import tempfile
+
+from src.webscraper.smart_queue import SmartQueue
+from src.webscraper.spill import PageSpill
+from src.webscraper.seen_store import SeenStore
+
+PAGE_LATENCY = 0.05 # Simulated seconds per page scan
+MAX_PAGES = 80
+THREAD_COUNTS = [1, 2, 3, 4]
+
+
+class FakeScannerThread:
+    """
+    Stand-in for ScannerThread: sleeps instead of rendering a page
+    """
+
+    def __init__(self):
+        self.thread = None
+
+    def scan_page(self, link, continue_link_gathering, keep=None, deadline=None):
+        time.sleep(PAGE_LATENCY)
+        links = []
+        if continue_link_gathering:
+            links = [f"{link}/{n}" for n in range(3)]
+        return ([f"{link}#{n}" for n in range(100)], links, "") # Distinct text, so no page is a near-duplicate
+
+    def release_driver(self, failed=False):
+        pass
+
+    def quit(self):
+        pass
+
+
+def run(num_threads, seen_store, spill_file):
+    queue = SmartQueue("https://example.com", num_threads=num_threads, max_links=MAX_PAGES, seen_store=seen_store)
+    queue.text = PageSpill(spill_file)
+    queue.scanner_threads = [FakeScannerThread() for _ in range(num_threads)]
+    queue.home_domain = "example.com"
+    queue.original_link_count = 1
+    queue.populate_queue(["https://example.com"])
+    queue.start_time = time.time()
+    queue.visit_all_links()
+    duration = time.time() - queue.start_time
+    queue.text.close()
+    return queue.pages_visited, duration
+
+
+def main():
+    print(f"{'threads':>8} {'pages':>6} {'seconds':>8} {'pages/sec':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_threads in THREAD_COUNTS:
+            # Fresh store per run, so no page counts as crawled before
+            seen_store = SeenStore(os.path.join(directory, f"urls{num_threads}"), capacity=10000)
+            pages, duration = run(num_threads, seen_store, os.path.join(directory, f"site{num_threads}.ndjson"))
+            seen_store.close()
+            print(f"{num_threads:>8} {pages:>6} {duration:>8.2f} {pages / duration:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
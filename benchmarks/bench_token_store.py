@@ -0,0 +1,61 @@
+"""
+Benchmark memory held by a site's text: the original list of str per page
+against TokenStore, on a synthetic site of 4 x 40 pages of 1000 words (4
+concurrent sites) with a realistic vocabulary. Memory is measured with
+tracemalloc, so only what the text itself allocates is counted.
+
+Usage: python -m benchmarks.bench_token_store
+"""
+import time
+import random
+import tracemalloc
+
+from src.webscraper.token_store import TokenStore
+
+NUM_PAGES = 160
+WORDS_PER_PAGE = 1000
+VOCABULARY_SIZE = 20000
+
+
+def scanned_pages(rng, vocabulary):
+    """
+    Pages as scanned: new str objects per word, as split() returns them
+    """
+    for _ in range(NUM_PAGES):
+        yield " ".join(rng.choice(vocabulary) for _ in range(WORDS_PER_PAGE)).split()
+
+
+def measure(method):
+    """
+    Returns: (MB held, seconds to store, seconds to read back) (tuple)
+    """
+    rng = random.Random(0)
+    vocabulary = [f"word{n}" for n in range(VOCABULARY_SIZE)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    if method == "list":
+        text = []
+        for page in scanned_pages(rng, vocabulary):
+            text.append(page)
+    else:
+        text = TokenStore()
+        for page in scanned_pages(rng, vocabulary):
+            text.append(page)
+    stored = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for page in text:
+        " ".join(page)
+    return (held / 1024 / 1024, stored, time.perf_counter() - start)
+
+
+def main():
+    print(f"{'method':>12} {'MB held':>8} {'store (s)':>10} {'read (s)':>9}")
+    for method in ["list", "TokenStore"]:
+        held, stored, read = measure(method)
+        print(f"{method:>12} {held:>8.1f} {stored:>10.3f} {read:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark a run of sites with simulated crawl and S3 latency: uploads sent
+inline after each site (the original put_object calls) against uploads
+queued on an Uploader, which overlap with the next site's crawl.
+
+Usage: python -m benchmarks.bench_uploader
+"""
+import time
+
+from src.webscraper.uploader import Uploader
+
+NUM_SITES = 20
+CRAWL_TIME = 0.1 # Simulated seconds to crawl a site
+UPLOADS_PER_SITE = 4 # Site data, flagged links, metadata, CPU/RAM csv
+UPLOAD_LATENCY = 0.05 # Simulated seconds per S3 request
+
+
+class FakeClient:
+    """
+    Stand-in for a boto3 S3 client that takes UPLOAD_LATENCY per request
+    """
+
+    def put_object(self, Bucket, Body, Key):
+        time.sleep(UPLOAD_LATENCY)
+
+
+def run_inline():
+    client = FakeClient()
+    for site in range(NUM_SITES):
+        time.sleep(CRAWL_TIME)
+        for n in range(UPLOADS_PER_SITE):
+            client.put_object(Bucket="bucket", Body="{}", Key=f"site{site}/{n}.json")
+
+
+def run_uploader():
+    uploader = Uploader(FakeClient(), "bucket")
+    for site in range(NUM_SITES):
+        time.sleep(CRAWL_TIME)
+        for n in range(UPLOADS_PER_SITE):
+            uploader.put_object(Body="{}", Key=f"site{site}/{n}.json")
+    uploader.close() # Shutdown flush is part of the run
+    return uploader.blocked_time
+
+
+def main():
+    print(f"{'method':>9} {'seconds':>8} {'sites/sec':>10}")
+    for name, run in [("inline", run_inline), ("uploader", run_uploader)]:
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        print(f"{name:>9} {seconds:>8.2f} {NUM_SITES / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import io
+import os
+import time
+import uuid
+import shutil
+import threading
+from . import config
+
+from botocore.config import Config
+
+
+STORAGE_BACKEND = config.STORAGE_BACKEND # "s3", or "local" for LocalBucket/LocalClient
+QUEUE_BACKEND = config.QUEUE_BACKEND # "sqs", or "local" for LocalQueue
+LOCAL_STORAGE_DIR = config.LOCAL_STORAGE_DIR # Directory holding the local buckets
+
+LOCAL_QUEUES = {} # Queue name -> LocalQueue, shared by everything in this process
+LOCAL_QUEUES_LOCK = threading.Lock()
+
+
+def s3_bucket(bucket_name=None):
+    """
+    Bucket results are stored in: a boto3 S3 Bucket, or a LocalBucket when
+    storage_backend is "local"
+    """
+    bucket_name = bucket_name or config.BUCKET_NAME
+    if STORAGE_BACKEND == "local":
+        return LocalBucket(bucket_name)
+    return config.S3_SESSION.resource('s3').Bucket(bucket_name)
+
+
+def s3_client(max_pool_connections=10):
+    """
+    Low-level storage client: a boto3 S3 client, or a LocalClient when
+    storage_backend is "local"
+    """
+    if STORAGE_BACKEND == "local":
+        return LocalClient()
+    return config.S3_SESSION.client('s3', config=Config(max_pool_connections=max_pool_connections))
+
+
+def sqs_queue(queue_name=None):
+    """
+    Queue sites are read from: a boto3 SQS Queue, or this process's
+    LocalQueue of that name when queue_backend is "local"
+    """
+    queue_name = queue_name or config.QUEUE_NAME
+    if QUEUE_BACKEND == "local":
+        with LOCAL_QUEUES_LOCK:
+            if queue_name not in LOCAL_QUEUES:
+                LOCAL_QUEUES[queue_name] = LocalQueue(queue_name)
+            return LOCAL_QUEUES[queue_name]
+    return config.SQS_SESSION.resource('sqs').get_queue_by_name(QueueName=queue_name)
+
+
+def object_path(root, bucket_name, key):
+    """
+    File holding an object of a local bucket; keys may not leave the bucket
+    """
+    bucket_root = os.path.abspath(os.path.join(root, bucket_name))
+    path = os.path.abspath(os.path.join(bucket_root, key))
+    if not path.startswith(bucket_root + os.sep):
+        raise ValueError(f"invalid key: {key}")
+    return path
+
+
+def write_object(path, source):
+    """
+    Write an object's file from bytes, a string or a file object. Written
+    to a temporary file first, so readers never see part of an object.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{uuid.uuid4().hex}.part"
+    with open(temporary, 'wb') as f:
+        if isinstance(source, str):
+            f.write(source.encode('utf-8'))
+        elif isinstance(source, (bytes, bytearray)):
+            f.write(source)
+        else:
+            shutil.copyfileobj(source, f)
+    os.replace(temporary, path)
+
+
+def read_object(path):
+    """
+    Body of an object, in the shape of a boto3 get() response
+    """
+    with open(path, 'rb') as f:
+        return {"Body": io.BytesIO(f.read()), "ContentLength": os.path.getsize(path)}
+
+
+class LocalObject:
+    """
+    Object (or object summary) of a LocalBucket, with the methods of a boto3 Object the scraper uses
+    """
+
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+
+    def get(self):
+        return read_object(self.bucket.path(self.key)) # FileNotFoundError if missing
+
+    def delete(self):
+        try:
+            os.remove(self.bucket.path(self.key))
+        except FileNotFoundError:
+            pass # Deleting a missing object is not an error in S3 either
+
+
+class LocalObjects:
+    """
+    Object listing of a LocalBucket, like boto3's bucket.objects
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def all(self):
+        return self.filter()
+
+    def filter(self, Prefix=""):
+        objects = []
+        for directory, _, filenames in os.walk(self.bucket.root):
+            for filename in filenames:
+                if filename.endswith(".part"):
+                    continue # Object still being written
+                key = os.path.relpath(os.path.join(directory, filename), self.bucket.root).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    objects.append(LocalObject(self.bucket, key))
+        return sorted(objects, key=lambda summary: summary.key)
+
+
+class LocalBucket:
+    """
+    S3 stand-in: a bucket kept as files under local_storage_dir/<bucket>/,
+    one per key. Supports the Bucket calls the scraper makes (put_object,
+    Object().get()/delete(), objects.filter()).
+
+    Inputs:
+    bucket_name (string); (optional) root (string): Directory of local buckets
+    """
+
+    def __init__(self, bucket_name, root=None):
+        self.name = bucket_name
+        self.storage_root = root or LOCAL_STORAGE_DIR
+        self.root = os.path.abspath(os.path.join(self.storage_root, bucket_name))
+        self.objects = LocalObjects(self)
+
+    def path(self, key):
+        return object_path(self.storage_root, self.name, key)
+
+    def put_object(self, Body, Key, **kwargs):
+        write_object(self.path(Key), Body)
+        return LocalObject(self, Key)
+
+    def Object(self, key):
+        return LocalObject(self, key)
+
+
+class LocalClient:
+    """
+    S3 client stand-in writing to the same files as LocalBucket. Supports
+    the client calls the uploader makes; ExtraArgs such as ContentEncoding
+    are accepted and ignored (payload.read_payload() detects gzip itself).
+
+    Inputs:
+    (optional) root (string): Directory of local buckets
+    """
+
+    def __init__(self, root=None):
+        self.root = root or LOCAL_STORAGE_DIR
+
+    def put_object(self, Bucket, Body, Key, **kwargs):
+        write_object(object_path(self.root, Bucket, Key), Body)
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        write_object(object_path(self.root, Bucket, Key), Fileobj)
+
+    def get_object(self, Bucket, Key):
+        return read_object(object_path(self.root, Bucket, Key))
+
+
+class LocalMessage:
+    """
+    Message received from a LocalQueue, with the attributes of a boto3 Message
+    """
+
+    def __init__(self, queue, message_id, body, message_attributes, receipt_handle):
+        self.queue = queue
+        self.message_id = message_id
+        self.body = body
+        self.message_attributes = message_attributes
+        self.receipt_handle = receipt_handle
+
+    def delete(self):
+        self.queue.delete_messages(Entries=[{"Id": "0", "ReceiptHandle": self.receipt_handle}])
+
+
+class LocalQueue:
+    """
+    In-memory SQS stand-in shared by the threads of one process. Received
+    messages are hidden for their visibility timeout and handed out again
+    if not deleted in time; receives long-poll up to WaitTimeSeconds. Only
+    the latest receipt handle of a message can delete it or change its
+    visibility, as in SQS.
+
+    Inputs:
+    (optional) name (string)
+    """
+
+    def __init__(self, name="local"):
+        self.name = name
+        self.messages = {} # message id -> {"body", "attributes", "visible_at", "receipt_handle"}
+        self.handles = {} # current receipt handle -> message id
+        self.condition = threading.Condition()
+        self.received = 0 # Messages handed out, counting redeliveries
+        self.deleted = 0
+
+
+    def send_message(self, MessageBody, MessageAttributes=None, **kwargs):
+        message_id = uuid.uuid4().hex
+        with self.condition:
+            self.messages[message_id] = {"body": MessageBody, "attributes": MessageAttributes or {},
+                                         "visible_at": 0.0, "receipt_handle": None}
+            self.condition.notify_all()
+        return {"MessageId": message_id}
+
+
+    def visible(self, now):
+        return [message_id for message_id, message in self.messages.items() if message["visible_at"] <= now]
+
+
+    def receive_messages(self, MessageAttributeNames=None, MaxNumberOfMessages=1, WaitTimeSeconds=0,
+                         VisibilityTimeout=30, **kwargs):
+        deadline = time.monotonic() + WaitTimeSeconds
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                ready = self.visible(now)
+                if ready or now >= deadline:
+                    break
+                # Woken by send_message or a released message; hidden messages reappear on their own
+                hidden = [message["visible_at"] for message in self.messages.values()]
+                self.condition.wait(min([deadline] + hidden) - now)
+            received = []
+            for message_id in ready[:MaxNumberOfMessages]:
+                message = self.messages[message_id]
+                self.handles.pop(message["receipt_handle"], None)
+                message["receipt_handle"] = uuid.uuid4().hex
+                message["visible_at"] = now + VisibilityTimeout
+                self.handles[message["receipt_handle"]] = message_id
+                received.append(LocalMessage(self, message_id, message["body"],
+                                             dict(message["attributes"]) if MessageAttributeNames else {},
+                                             message["receipt_handle"]))
+            self.received += len(received)
+            return received
+
+
+    def batch(self, Entries, apply):
+        """
+        Run apply(message_id, entry) for each entry with a current receipt
+        handle; returns a batch response like boto3's
+        """
+        response = {"Successful": [], "Failed": []}
+        with self.condition:
+            for entry in Entries[:10]:
+                message_id = self.handles.get(entry["ReceiptHandle"])
+                if message_id is None:
+                    response["Failed"].append({"Id": entry["Id"], "Code": "ReceiptHandleIsInvalid",
+                                               "SenderFault": True})
+                    continue
+                apply(message_id, entry)
+                response["Successful"].append({"Id": entry["Id"]})
+            self.condition.notify_all()
+        return response
+
+
+    def change_message_visibility_batch(self, Entries):
+        def apply(message_id, entry):
+            self.messages[message_id]["visible_at"] = time.monotonic() + entry["VisibilityTimeout"]
+        return self.batch(Entries, apply)
+
+
+    def delete_messages(self, Entries):
+        def apply(message_id, entry):
+            del self.handles[entry["ReceiptHandle"]]
+            del self.messages[message_id]
+            self.deleted += 1
+        return self.batch(Entries, apply)
+
+
+    def __len__(self):
+        with self.condition:
+            return len(self.messages)
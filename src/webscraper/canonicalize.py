@@ -0,0 +1,95 @@
+from . import config
+
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+
+CACHE_SIZE = 65536 # Canonical forms memoized per process
+TRACKING_PARAMS = config.TRACKING_PARAMS # Query parameter names dropped from links ("utm_*" matches a prefix)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+INDEX_PAGES = {"index.html", "index.htm", "index.shtml", "index.php", "index.asp", "index.aspx",
+               "default.asp", "default.aspx"}
+
+TRACKING_NAMES = frozenset(name.lower() for name in TRACKING_PARAMS if not name.endswith("*"))
+TRACKING_PREFIXES = tuple(name[:-1].lower() for name in TRACKING_PARAMS if name.endswith("*"))
+
+
+def is_tracking_param(name):
+    """
+    True if a query (or ;path) parameter name matches a tracking_params rule
+    """
+    name = name.lower()
+    return name in TRACKING_NAMES or (len(TRACKING_PREFIXES) > 0 and name.startswith(TRACKING_PREFIXES))
+
+
+def strip_path_params(path):
+    """
+    Remove tracked ;name=value parameters from path segments
+    (e.g. /cart;jsessionid=A1B2 -> /cart)
+    """
+    if ";" not in path:
+        return path
+    segments = []
+    for segment in path.split("/"):
+        name, *params = segment.split(";")
+        kept = [param for param in params if not is_tracking_param(param.split("=", 1)[0])]
+        segments.append(";".join([name] + kept))
+    return "/".join(segments)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_url(link, scheme=None):
+    """
+    Canonical form of a link, so variants of the same page share one
+    frontier entry. Replaces utils.clean_link, which only removed the anchor
+    tag and trailing slash. Scheme and host are lowercased, default ports,
+    index pages, tracking parameters and the anchor tag are removed, the
+    remaining query parameters are sorted (each left encoded as written) and
+    the trailing slash is dropped.
+
+    Inputs:
+    link (string) - A url; (optional) scheme (string) - "http" or "https" to
+    fold both schemes into, e.g. the scheme the site's root page was served with
+
+    Returns: string - canonical url
+    """
+    try:
+        parse = urlsplit(link.strip())
+        port = parse.port
+    except ValueError:
+        return link # Malformed host or port, leave for is_link() to reject
+    link_scheme = parse.scheme.lower()
+    if link_scheme not in DEFAULT_PORTS:
+        return urlunsplit((parse.scheme, parse.netloc, parse.path, parse.query, ""))
+    if port == DEFAULT_PORTS[link_scheme]:
+        port = None # Default port of the link's own scheme, checked before folding
+    if scheme is not None and port is None:
+        link_scheme = scheme # A link on an explicit port keeps the scheme that port serves
+
+    host = (parse.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]" # IPv6 literal
+    if port is not None:
+        host = f"{host}:{port}"
+    if parse.username is not None:
+        userinfo = parse.username if parse.password is None else f"{parse.username}:{parse.password}"
+        host = f"{userinfo}@{host}"
+
+    path = strip_path_params(parse.path)
+    head, _, last = path.rpartition("/")
+    if last.lower() in INDEX_PAGES:
+        path = head + "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+    if path == "/":
+        path = ""
+
+    query = ""
+    if parse.query:
+        # Raw name=value pieces keep their encoding ("/", "+", %20, bare "?flag"), so the
+        # canonical url fetches the same page; names are only decoded to match tracking rules
+        pieces = [piece for piece in parse.query.split("&")
+                  if piece and not is_tracking_param(unquote_plus(piece.split("=", 1)[0]))]
+        query = "&".join(sorted(pieces))
+
+    return urlunsplit((link_scheme, host, path, query, ""))
@@ -31,3 +31,34 @@ INITIAL_SCAN_TIME_LIMIT = params["initial_scan_time_limit"]
 NEW_LINKS_PER_PAGE = params["new_links_per_page"]
 ROOT_DIRECTORY = params["root_directory"]
 USER_AGENTS = params["user_agents"]
+FETCH_MODE = params["fetch_mode"]
+DRIVER_MAX_PAGES = params["driver_max_pages"]
+LINK_CACHE_TTL = params["link_cache_ttl"]
+SAMPLE_INTERVAL = params["sample_interval"]
+SAMPLE_BUFFER_SIZE = params["sample_buffer_size"]
+NUM_PROCESSES = params["num_processes"]
+PROCESS_MEMORY_MB = params["process_memory_mb"]
+DOMAIN_CACHE_SIZE = params["domain_cache_size"]
+HONOR_CANONICAL = params["honor_canonical"]
+TRACKING_PARAMS = params["tracking_params"]
+SEEN_STORE_PATH = params["seen_store_path"]
+SEEN_STORE_CAPACITY = params["seen_store_capacity"]
+RECRAWL_AFTER = params["recrawl_after"]
+NEAR_DUPLICATE_DISTANCE = params["near_duplicate_distance"]
+INCREMENTAL = params["incremental"]
+PAGE_CACHE_DIR = params["page_cache_dir"]
+SPILL_PAGES = params["spill_pages"]
+LANGUAGE_SAMPLE_WORDS = params["language_sample_words"]
+CHECK_PAGE_LANGUAGE = params["check_page_language"]
+SUCCESS_RATE_FLUSH_INTERVAL = params["success_rate_flush_interval"]
+METADATA_INDEX_PATH = params["metadata_index_path"]
+METADATA_SYNC_INTERVAL = params["metadata_sync_interval"]
+UPLOAD_WORKERS = params["upload_workers"]
+UPLOAD_QUEUE_SIZE = params["upload_queue_size"]
+PAYLOAD_FORMAT = params["payload_format"]
+SQS_BATCH_SIZE = params["sqs_batch_size"]
+SQS_WAIT_TIME = params["sqs_wait_time"]
+SQS_VISIBILITY_TIMEOUT = params["sqs_visibility_timeout"]
+STORAGE_BACKEND = params["storage_backend"]
+QUEUE_BACKEND = params["queue_backend"]
+LOCAL_STORAGE_DIR = params["local_storage_dir"]
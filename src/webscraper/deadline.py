@@ -0,0 +1,78 @@
+import time
+import threading
+
+
+class TimeoutException(Exception):
+    """
+    Raised when work runs past its deadline
+    """
+    pass
+
+
+class Deadline:
+    """
+    Thread-safe time limit for a site scan (or part of one). Replaces the
+    SIGALRM-based time_limit: a Deadline can be shared by threads, nested
+    with child(), and is enforced cooperatively (threads check it between
+    pages) and through Chrome page-load/script timeouts.
+
+    Inputs:
+    seconds (float): Time allowed from now
+    (optional) parent (Deadline): Enclosing deadline; this one never ends later
+    """
+
+    def __init__(self, seconds, parent=None):
+        self.expires_at = time.monotonic() + seconds
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.parent = parent
+        self.cancelled = threading.Event() # Set to end the deadline early
+
+
+    def child(self, seconds):
+        """
+        Deadline for a sub-task, ending after seconds or with this deadline,
+        whichever is sooner
+        """
+        return Deadline(seconds, parent=self)
+
+
+    def remaining(self):
+        """
+        Seconds left, 0 if expired or cancelled
+
+        Returns: float
+        """
+        if self.is_cancelled():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+    def timeout(self, cap):
+        """
+        Timeout to use for a blocking call: the time remaining, capped at cap,
+        and never below 1 second so drivers accept it
+
+        Returns: float
+        """
+        return max(1.0, min(cap, self.remaining()))
+
+
+    def check(self):
+        """
+        Raise TimeoutException if the deadline has passed
+        """
+        if self.expired():
+            raise TimeoutException("Timed out!")
+
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+    def is_cancelled(self):
+        return self.cancelled.is_set() or (self.parent is not None and self.parent.is_cancelled())
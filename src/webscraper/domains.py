@@ -0,0 +1,150 @@
+import os
+import re
+from . import config
+
+from functools import lru_cache
+
+
+PSL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat") # Bundled snapshot
+DOMAIN_CACHE_SIZE = config.DOMAIN_CACHE_SIZE # Hostnames whose registered domain is memoized
+SCHEME_RE = re.compile(r"^([abcdefghijklmnopqrstuvwxyz0-9-.+]+:)?//") # Same scheme handling as tldextract
+IPV4_RE = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+UNICODE_DOTS = str.maketrans({"。": ".", "．": ".", "｡": "."})
+
+
+class SuffixList:
+    """
+    Public suffix rules (ICANN section of the Public Suffix List) compiled
+    into sets for label-by-label lookup. Loaded from the snapshot bundled
+    with the package, so no network request is ever made.
+
+    Inputs:
+    (optional) path (string): Public Suffix List file
+    """
+
+    def __init__(self, path=PSL_FILE):
+        self.rules = set() # Suffixes, e.g. "co.uk"
+        self.wildcards = set() # Parents of wildcard rules, e.g. "ck" for "*.ck"
+        self.exceptions = set() # Exception rules, e.g. "www.ck" for "!www.ck"
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                rule = line.strip()
+                if rule.startswith("// ===END ICANN DOMAINS==="):
+                    break # Private domains are not used, as with tldextract's defaults
+                if not rule or rule.startswith("//"):
+                    continue
+                for form in self.forms(rule.split()[0].lower()):
+                    if form.startswith("!"):
+                        self.exceptions.add(form[1:])
+                    elif form.startswith("*."):
+                        self.wildcards.add(form[2:])
+                    else:
+                        self.rules.add(form)
+
+
+    @staticmethod
+    def forms(rule):
+        """
+        A rule as written, plus its punycode form for internationalized rules,
+        so hostnames match in either form
+        """
+        forms = [rule]
+        if not rule.isascii():
+            try:
+                forms.append(".".join(label.encode("idna").decode("ascii") if not label.isascii() else label
+                                      for label in rule.split(".")))
+            except UnicodeError:
+                pass
+        return forms
+
+
+    def suffix_length(self, labels):
+        """
+        Number of trailing labels forming the public suffix, 0 if no rule
+        matches. The longest matching rule wins; exceptions remove a label.
+
+        Inputs: labels (list) - hostname split on "."
+        Returns: int
+        """
+        count = len(labels)
+        for start in range(count):
+            candidate = ".".join(labels[start:])
+            if candidate in self.exceptions:
+                return count - start - 1
+            if candidate in self.rules:
+                return count - start
+            if start + 1 < count and ".".join(labels[start + 1:]) in self.wildcards:
+                return count - start
+        return 0
+
+
+SUFFIX_LIST = SuffixList() # Compiled once per process
+
+
+def link_host(url):
+    """
+    Hostname of a url, lowercased without port or user info. Urls without a
+    scheme are accepted.
+
+    Returns: string - "" for IPv6 hosts
+    """
+    if url.startswith(("https://", "http://")):
+        netloc = url[url.index("//") + 2:] # Common case, no regex needed
+    else:
+        netloc = SCHEME_RE.sub("", url.strip().lower())
+    for separator in "/?#":
+        netloc = netloc.partition(separator)[0]
+    netloc = netloc.rpartition("@")[2]
+    if netloc.startswith("["):
+        return "" # IPv6 literal
+    host = netloc.partition(":")[0].lower()
+    if not host.isascii():
+        host = host.translate(UNICODE_DOTS)
+    return host.strip(".")
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def registered_domain(host):
+    """
+    Registered domain of a hostname: the public suffix plus one label
+    (e.g. shop.example.co.uk -> example.co.uk). Matches tldextract's
+    registered_domain, "" for IP addresses and unknown suffixes.
+
+    Inputs: host (string) - lowercased hostname
+    Returns: string
+    """
+    if not host or IPV4_RE.match(host):
+        return ""
+    labels = host.split(".")
+    suffix_length = SUFFIX_LIST.suffix_length(labels)
+    if suffix_length == 0 or suffix_length >= len(labels):
+        return ""
+    return ".".join(labels[-suffix_length - 1:])
+
+
+def link_domain(url):
+    """
+    Registered domain of a url
+
+    Returns: string
+    """
+    return registered_domain(link_host(url))
+
+
+def link_domains(urls):
+    """
+    Batch version of link_domain for all links on a page; each distinct
+    hostname is looked up once.
+
+    Inputs: urls (list)
+    Returns: list of registered domains, in the same order as urls
+    """
+    by_host = {}
+    domains = []
+    for url in urls:
+        host = link_host(url)
+        domain = by_host.get(host)
+        if domain is None:
+            domain = by_host[host] = registered_domain(host)
+        domains.append(domain)
+    return domains
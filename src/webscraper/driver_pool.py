@@ -0,0 +1,169 @@
+import threading
+import logging
+from . import utils as ut
+from . import config
+
+
+DRIVER_MAX_PAGES = config.DRIVER_MAX_PAGES # Pages a driver renders before it is replaced
+
+
+class PooledDriver:
+    """
+    A Chrome driver leased from a DriverPool, with the number of pages it
+    has rendered so far
+    """
+
+    def __init__(self, driver, header_index):
+        self.driver = driver
+        self.header_index = header_index # Index of user agent in USER_AGENTS
+        self.pages = 0 # Pages rendered by this driver
+
+
+class DriverPool:
+    """
+    Long-lived pool of headless Chrome drivers, owned by the process and
+    shared by every SmartQueue it runs. Drivers are reset (cookies, storage,
+    extra tabs) when returned, health-checked when leased, and replaced after
+    max_pages pages or after a failure.
+
+    Inputs:
+    (optional) size (int): Number of idle drivers kept warm
+    (optional) max_pages (int): Pages a driver renders before it is recycled
+    """
+
+    def __init__(self, size=config.NUM_THREADS + 1, max_pages=DRIVER_MAX_PAGES):
+        self.size = size
+        self.max_pages = max_pages
+        self.idle = [] # PooledDriver objects ready to be leased
+        self.lock = threading.Lock()
+        self.launched = 0 # Number of drivers started by the pool
+        self.recycled = 0 # Number of drivers quit by the pool
+
+
+    def warm(self, count=None):
+        """
+        Start drivers ahead of time so the first site does not pay for
+        Chrome startup
+
+        Inputs: (optional) count (int) - drivers to start, defaults to size
+        Returns: None
+        """
+        count = self.size if count is None else count
+        for _ in range(count - len(self.idle)):
+            pooled = self._launch()
+            with self.lock:
+                self.idle.append(pooled)
+
+
+    def acquire(self):
+        """
+        Lease a healthy driver, starting a new one if none are idle
+
+        Inputs: None
+        Returns: PooledDriver
+        """
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                pooled = self.idle.pop()
+            if self._healthy(pooled):
+                return pooled
+            self._quit(pooled)
+        return self._launch()
+
+
+    def release(self, pooled, failed=False):
+        """
+        Return a leased driver. Drivers that failed, hit the page limit, or
+        cannot be reset are quit; others are reset and kept idle.
+
+        Inputs:
+        pooled (PooledDriver); (optional) failed (boolean) - True if the
+        driver raised an error while in use
+
+        Returns: None
+        """
+        if failed or pooled.pages >= self.max_pages or not self._reset(pooled):
+            self._quit(pooled)
+            return
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(pooled)
+                return
+        self._quit(pooled)
+
+
+    def drain(self):
+        """
+        Quit all idle drivers. The pool stays usable and starts new drivers
+        on demand.
+        """
+        with self.lock:
+            idle = self.idle
+            self.idle = []
+        for pooled in idle:
+            self._quit(pooled)
+
+
+    def close(self):
+        """
+        Shut the pool down at process exit
+        """
+        self.drain()
+
+
+    def _launch(self):
+        driver, header_index = ut.create_driver()
+        with self.lock:
+            self.launched += 1
+        return PooledDriver(driver, header_index)
+
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logging.warning(f"driver_pool: error quitting driver: {e}")
+        with self.lock:
+            self.recycled += 1
+
+
+    def _healthy(self, pooled):
+        """
+        Check the driver's browser still responds
+        """
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+
+    def _reset(self, pooled):
+        """
+        Clear state left by the previous site: extra tabs, web storage and
+        cookies, then park the driver on a blank page
+
+        Returns: boolean - True if the reset succeeded
+        """
+        driver = pooled.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            try:
+                # Clear all storage types (local, session, IndexedDB, cache) for the last site
+                origin = driver.execute_script("return window.location.origin")
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin",
+                                       {"origin": origin, "storageTypes": "all"})
+            except Exception:
+                pass # No origin to clear (about:blank, data: urls)
+            driver.delete_all_cookies()
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logging.warning(f"driver_pool: error resetting driver: {e}")
+            return False
@@ -0,0 +1,175 @@
+import time
+
+
+class Frontier:
+    """
+    Priority queue of links waiting to be visited, replacing MinHeap for
+    SmartQueue. The heap grows as needed, and every membership check (queued,
+    visited, or either) is a dict/set lookup, so deduplicating links stays
+    O(1) however many pages a site has.
+
+    Entries are [priority, order, link]; order breaks priority ties so equal
+    priorities come out first-in first-out. Re-inserting a queued link with a
+    lower priority moves it up (decrease-key). Orders are unique, so comparing
+    entries never falls through to comparing links.
+
+    With a SeenStore, recently_crawled() reports links crawled by an earlier
+    run within recrawl_after seconds. They are still queued, so the links on
+    them are followed and their text is kept; ScannerThreads serve them from
+    the site's page cache instead of fetching them.
+
+    Inputs:
+    (optional) seen_store (SeenStore): Crawls recorded by earlier runs
+    (optional) recrawl_after (float): Seconds before a crawled link is queued again, 0 to always queue
+    """
+
+    def __init__(self, seen_store=None, recrawl_after=0):
+        self.heap = [] # [priority, order, link] entries
+        self.indices = {} # link -> position in heap, for queued links
+        self.visited = set() # Links removed from the queue
+        self.order = 0 # Insertion counter used as tie-breaker
+        self.seen_store = seen_store
+        self.recrawl_after = recrawl_after
+
+    def size(self):
+        # Number of links within the queue at a given time
+        return len(self.heap)
+
+    def is_empty(self):
+        return len(self.heap) == 0
+
+    def next_up(self):
+        if self.is_empty():
+            return None
+        priority, _, link = self.heap[0]
+        return (priority, link)
+
+    def is_queued(self, link):
+        return link in self.indices
+
+    def is_visited(self, link):
+        return link in self.visited
+
+    def recently_crawled(self, link):
+        """
+        Last crawl of link, if an earlier run crawled it within recrawl_after seconds
+
+        Returns: (crawled_at, content_hash) (tuple), or None
+        """
+        if self.seen_store is None or self.recrawl_after <= 0:
+            return None
+        crawl = self.seen_store.get(link)
+        if crawl is None or time.time() - crawl[0] >= self.recrawl_after:
+            return None
+        return crawl
+
+    def seen(self, link):
+        """
+        True if link is queued or has been visited
+        """
+        return link in self.indices or link in self.visited
+
+    def insert(self, priority, link):
+        """
+        Add link to queue. Visited links are ignored; a queued link is moved
+        up if the new priority is lower.
+
+        Returns: boolean - True if link was newly added
+        """
+        if link in self.visited:
+            return False
+        position = self.indices.get(link)
+        if position is not None:
+            if priority < self.heap[position][0]:
+                self.heap[position][0] = priority
+                self._sift_up(position)
+            return False
+        self.heap.append([priority, self.order, link])
+        self.order += 1
+        self.indices[link] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+        return True
+
+    def remove_next(self):
+        """
+        Remove the next up link, mark it visited and return it
+
+        Returns: (priority, link) (tuple), or None if empty
+        """
+        if self.is_empty():
+            return None
+        priority, _, link = self.heap[0]
+        last = self.heap.pop()
+        del self.indices[link]
+        if self.heap:
+            self.heap[0] = last
+            self.indices[last[2]] = 0
+            self._sift_down(0)
+        self.visited.add(link)
+        return (priority, link)
+
+    def mark_visited(self, link):
+        """
+        Mark link visited without it being removed as next up (e.g. a page's
+        rel=canonical url, already covered by the page declaring it). A queued
+        link is dropped from the queue.
+        """
+        position = self.indices.pop(link, None)
+        if position is not None:
+            last = self.heap.pop()
+            if position < len(self.heap):
+                # Fill the gap with the last entry and restore heap order around it
+                self.heap[position] = last
+                self.indices[last[2]] = position
+                self._sift_down(position)
+                self._sift_up(self.indices[last[2]])
+        self.visited.add(link)
+
+    def _sift_up(self, position):
+        """
+        Move entry at position up until its parent is smaller
+        """
+        heap = self.heap
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if heap[parent] <= entry:
+                break
+            heap[position] = heap[parent]
+            self.indices[heap[position][2]] = position
+            position = parent
+        heap[position] = entry
+        self.indices[entry[2]] = position
+
+    def _sift_down(self, position):
+        """
+        Move entry at position down until both children are larger
+        """
+        heap = self.heap
+        entry = heap[position]
+        end = len(heap)
+        while True:
+            child = 2 * position + 1
+            if child >= end:
+                break
+            if child + 1 < end and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[position] = heap[child]
+            self.indices[heap[position][2]] = position
+            position = child
+        heap[position] = entry
+        self.indices[entry[2]] = position
+
+    def verify(self):
+        """
+        Check heap order and index consistency (used by tests)
+        """
+        for position, entry in enumerate(self.heap):
+            if self.indices[entry[2]] != position:
+                return False
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self.heap) and self.heap[child] < entry:
+                    return False
+        return len(self.indices) == len(self.heap)
@@ -0,0 +1,120 @@
+import threading
+from . import config
+
+from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+from langdetect.lang_detect_exception import LangDetectException
+
+
+LANGUAGE_SAMPLE_WORDS = config.LANGUAGE_SAMPLE_WORDS # Max words of a page run through the detector
+CHECK_PAGE_LANGUAGE = config.CHECK_PAGE_LANGUAGE # Skip non-English subpages, not just non-English sites
+LANGUAGE_SEED = 0 # Detector seed, so a page always gets the same verdict
+SAMPLE_SLICES = 4 # Sample is taken from this many evenly spaced runs of words
+
+
+def declared_language(lang):
+    """
+    Primary language of an <html lang> attribute or Content-Language value
+    (e.g. "en-US" -> "en"). A header listing several languages only counts
+    if they all share one primary language.
+
+    Inputs: lang (string)
+    Returns: string - lowercase language code, "" if none declared
+    """
+    languages = {tag.strip().split("-")[0].split("_")[0].lower() for tag in lang.split(",") if tag.strip()}
+    return languages.pop() if len(languages) == 1 else ""
+
+
+def sample_words(words, size=LANGUAGE_SAMPLE_WORDS):
+    """
+    Bounded sample of a page's words: evenly spaced runs across the page,
+    so headers and menus at the top do not decide the verdict alone
+
+    Inputs: words (list) - page text; (optional) size (int)
+    Returns: list of words
+    """
+    if len(words) <= size:
+        return words
+    run = max(1, size // SAMPLE_SLICES)
+    step = (len(words) - run) / (SAMPLE_SLICES - 1)
+    sample = []
+    for index in range(SAMPLE_SLICES):
+        start = int(index * step)
+        sample.extend(words[start:start + run])
+    return sample
+
+
+class LanguageGate:
+    """
+    Decide whether sites and pages are in English. A page's declared
+    language (<html lang> or Content-Language) is trusted when present;
+    otherwise a seeded langdetect detector runs on a bounded sample of its
+    words. Verdicts for sites are cached by domain. Shared by all threads in
+    the process.
+
+    Inputs:
+    (optional) sample_size (int): Max words run through the detector
+    """
+
+    def __init__(self, sample_size=LANGUAGE_SAMPLE_WORDS):
+        self.sample_size = sample_size
+        self.factory = None # Detector profiles, loaded on first detection
+        self.site_languages = {} # domain -> language of root page
+        self.lock = threading.Lock()
+
+
+    def detect(self, words):
+        """
+        Language of a sample of words, by langdetect with a fixed seed
+
+        Inputs: words (list)
+        Returns: string - language code, "" if the words have no letters
+        """
+        with self.lock:
+            if self.factory is None:
+                factory = DetectorFactory()
+                factory.load_profile(PROFILES_DIRECTORY)
+                factory.set_seed(LANGUAGE_SEED)
+                self.factory = factory
+        detector = self.factory.create()
+        detector.append(" ".join(sample_words(words, self.sample_size)))
+        try:
+            return detector.detect()
+        except LangDetectException:
+            return "" # Empty page, or no letters to go on
+
+
+    def page_language(self, page):
+        """
+        Language of a page: declared, else detected from its text
+
+        Inputs: page (dict) - see thread.page_result()
+        Returns: string - language code, "" if unknown
+        """
+        return declared_language(page.get("lang") or "") or self.detect(page["text"])
+
+
+    def is_english(self, page):
+        """
+        True if a page is English. Pages whose language cannot be told
+        (e.g. no text) are given the benefit of the doubt.
+        """
+        return self.page_language(page) in ("en", "")
+
+
+    def site_is_english(self, domain, page):
+        """
+        True if a site is English, judged by its root page. The verdict is
+        cached for the domain.
+
+        Inputs: domain (string) - site's home domain; page (dict) - root page
+        """
+        with self.lock:
+            language = self.site_languages.get(domain)
+        if language is None:
+            language = self.page_language(page)
+            with self.lock:
+                self.site_languages[domain] = language
+        return language in ("en", "")
+
+
+LANGUAGE_GATE = LanguageGate()
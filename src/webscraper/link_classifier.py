@@ -0,0 +1,216 @@
+import time
+import random
+import threading
+import posixpath
+import requests
+from . import config
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+
+
+CACHE_TTL = config.LINK_CACHE_TTL # Seconds a cached verdict stays valid
+PROBE_TIMEOUT = 5 # Seconds to wait on a HEAD/ranged GET
+PROBE_WORKERS = 8 # Concurrent probes per classifier
+PATTERN_MIN_SAMPLES = 3 # Agreeing probes needed before a path pattern verdict is trusted
+URL_CACHE_SIZE = 65536 # Url verdicts kept, least recently used evicted first
+PATTERN_CACHE_SIZE = 8192 # Path pattern verdicts kept, least recently used evicted first
+
+# Any other file extension (.pdf, .zip, .png, ...) is treated as a download
+PAGE_EXTENSIONS = {"", ".html", ".htm", ".shtml", ".xhtml", ".php", ".asp", ".aspx", ".jsp", ".cfm"}
+
+
+def path_pattern(link):
+    """
+    Group a link with its siblings: host plus parent directory of the path
+    (e.g. https://site.com/blog/post-1 -> site.com/blog/*)
+    """
+    parse = urlparse(link)
+    return parse.netloc.lower() + posixpath.dirname(parse.path.rstrip("/")) + "/*"
+
+
+def rule_verdict(link):
+    """
+    Classify a link from its path alone.
+
+    Inputs: link (string) - A url
+    Returns: True if a page, False if a download, None if a request is needed
+    """
+    path = urlparse(link).path
+    segments = [segment.lower() for segment in path.split("/") if segment]
+    extension = posixpath.splitext(segments[-1])[1] if segments else ""
+    if extension not in PAGE_EXTENSIONS:
+        return False
+    return None # Including /downloads/ style paths, which are often ordinary pages
+
+
+def headers_verdict(headers):
+    """
+    Classify a response from its headers: attachments and binary streams
+    are downloads
+    """
+    content_disposition = headers.get('Content-Disposition', '')
+    content_type = headers.get('Content-Type', '')
+    return not ("attachment" in content_disposition or "octet-stream" in content_type)
+
+
+class LinkClassifier:
+    """
+    Decide whether links are pages or file downloads. Links are classified
+    by extension/path rules first; remaining links are probed with HEAD (or a
+    one-byte ranged GET when HEAD is refused) through a shared connection
+    pool, concurrently for a batch of links. Verdicts are cached per url and
+    per path pattern for ttl seconds, in caches of bounded size.
+
+    Inputs:
+    (optional) ttl (int): Seconds a cached verdict stays valid
+    (optional) workers (int): Number of concurrent probes
+    (optional) url_cache_size, pattern_cache_size (int): Max entries per cache
+    """
+
+    def __init__(self, ttl=CACHE_TTL, workers=PROBE_WORKERS, url_cache_size=URL_CACHE_SIZE,
+                 pattern_cache_size=PATTERN_CACHE_SIZE):
+        self.ttl = ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = random.choice(config.USER_AGENTS)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.url_cache = OrderedDict() # url -> (verdict, expiry), least recently used first
+        self.pattern_cache = OrderedDict() # path pattern -> [page probes, download probes, expiry]
+        self.url_cache_size = url_cache_size
+        self.pattern_cache_size = pattern_cache_size
+        self.lock = threading.Lock()
+        self.probes = 0 # Number of network probes made
+
+
+    def cached_verdict(self, link):
+        """
+        Look up a verdict for link in the url and path pattern caches
+
+        Returns: True/False, or None if nothing valid is cached
+        """
+        now = time.time()
+        pattern = path_pattern(link)
+        with self.lock:
+            entry = self.url_cache.get(link)
+            if entry is not None:
+                verdict, expiry = entry
+                if expiry > now:
+                    self.url_cache.move_to_end(link)
+                    return verdict
+                del self.url_cache[link]
+            entry = self.pattern_cache.get(pattern)
+            if entry is not None:
+                pages, downloads, expiry = entry
+                if expiry <= now:
+                    del self.pattern_cache[pattern]
+                    return None
+                self.pattern_cache.move_to_end(pattern)
+                if pages >= PATTERN_MIN_SAMPLES and downloads == 0:
+                    return True
+                elif downloads >= PATTERN_MIN_SAMPLES and pages == 0:
+                    return False
+        return None
+
+
+    def record(self, link, verdict):
+        """
+        Cache a probed verdict for link and its path pattern. A pattern's
+        counts start over once expired, and each probe extends its expiry.
+        The least recently used entries are evicted when a cache is full.
+        """
+        now = time.time()
+        pattern = path_pattern(link)
+        with self.lock:
+            self.url_cache[link] = (verdict, now + self.ttl)
+            self.url_cache.move_to_end(link)
+            entry = self.pattern_cache.get(pattern)
+            if entry is None or entry[2] <= now:
+                entry = self.pattern_cache[pattern] = [0, 0, 0]
+            entry[0 if verdict else 1] += 1
+            entry[2] = now + self.ttl
+            self.pattern_cache.move_to_end(pattern)
+            while len(self.url_cache) > self.url_cache_size:
+                self.url_cache.popitem(last=False)
+            while len(self.pattern_cache) > self.pattern_cache_size:
+                self.pattern_cache.popitem(last=False)
+
+
+    def probe(self, link):
+        """
+        Request the headers of link and classify it. Network errors leave
+        the link classified as a page, as before.
+
+        Returns: boolean - True if link is a page
+        """
+        verdict = True
+        try:
+            response = self.session.head(link, allow_redirects=True, timeout=PROBE_TIMEOUT)
+            if response.status_code in (405, 501):
+                # HEAD refused: fetch a single byte instead of the whole body
+                response = self.session.get(link, headers={"Range": "bytes=0-0"},
+                                            stream=True, timeout=PROBE_TIMEOUT)
+                response.close()
+            verdict = headers_verdict(response.headers)
+        except requests.RequestException:
+            pass
+        with self.lock:
+            self.probes += 1
+        self.record(link, verdict)
+        return verdict
+
+
+    def is_page(self, link):
+        """
+        Classify a single link
+
+        Returns: boolean - True if link is a page, False if a download
+        """
+        verdict = rule_verdict(link)
+        if verdict is None:
+            verdict = self.cached_verdict(link)
+        if verdict is None:
+            verdict = self.probe(link)
+        return verdict
+
+
+    def filter_pages(self, links, limit=None):
+        """
+        Keep the links that are pages, probing unresolved links concurrently.
+        When limit is given, links are probed in batches only until limit
+        pages are found.
+
+        Inputs:
+        links (list) - urls to classify; (optional) limit (int)
+
+        Returns: pages (list) - links that are pages
+        """
+        pages = []
+        unresolved = []
+        for link in links:
+            verdict = rule_verdict(link)
+            if verdict is None:
+                verdict = self.cached_verdict(link)
+            if verdict is None:
+                unresolved.append(link)
+            elif verdict:
+                pages.append(link)
+        if limit is not None and len(pages) >= limit:
+            return pages[:limit]
+
+        batch_size = max(len(unresolved) if limit is None else limit - len(pages), 1)
+        for start in range(0, len(unresolved), batch_size):
+            batch = unresolved[start:start + batch_size]
+            for link, verdict in zip(batch, self.executor.map(self.probe, batch)):
+                if verdict:
+                    pages.append(link)
+            if limit is not None and len(pages) >= limit:
+                return pages[:limit]
+        return pages
+
+
+LINK_CLASSIFIER = LinkClassifier() # Shared by all threads in the process
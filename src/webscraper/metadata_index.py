@@ -0,0 +1,229 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+from . import config
+
+from .payload import read_payload
+
+
+METADATA_INDEX_PATH = config.METADATA_INDEX_PATH # SQLite file of site statuses and metadata history
+METADATA_SYNC_INTERVAL = config.METADATA_SYNC_INTERVAL # Seconds between batches of metadata uploads
+METADATA_PREFIX = "metadata/"
+STATUS_BUCKETS = {"fail": "fail", "timeout": "fail", "low_count": "low_count"} # Other statuses -> "success"
+SYNC_BATCH_SIZE = 100 # Sites uploaded per batch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    domain TEXT PRIMARY KEY,
+    bucket TEXT,               -- metadata/<bucket>/ directory the site's object is in (or goes to)
+    history TEXT NOT NULL,     -- JSON: date -> metadata
+    loaded INTEGER NOT NULL,   -- 1 if history includes the object already in S3
+    synced_bucket TEXT,        -- Directory of the object in S3, NULL if none
+    dirty INTEGER NOT NULL     -- 1 if S3 is behind the index
+);
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def status_bucket(status):
+    """
+    metadata/ directory of a site with a given status
+    """
+    return STATUS_BUCKETS.get(status, "success")
+
+
+def metadata_key(bucket_name, domain):
+    return f"{METADATA_PREFIX}{bucket_name}/{domain}.json"
+
+
+class MetadataIndex:
+    """
+    Local index of every site's metadata: domain -> metadata/ directory it
+    is filed under (success, fail or low_count) and its history (date ->
+    metadata). Lookups and updates are local SQLite reads and writes; S3 is
+    brought up to date in batches by sync(), which uploads each changed
+    site's object and deletes the copy in its old directory.
+
+    The index is seeded once from a listing of metadata/ in S3, so sites
+    filed by earlier runs keep their history: it is fetched and merged the
+    first time the site is synced, in the background.
+
+    Safe to share between threads.
+
+    Inputs:
+    (optional) path (string): SQLite file
+    """
+
+    def __init__(self, path=METADATA_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+
+    def bootstrap(self, bucket):
+        """
+        Seed the index from the metadata/ objects in S3, once per index file
+
+        Inputs: bucket - S3 bucket
+        Returns: int - number of sites found
+        """
+        with self.lock:
+            if self.connection.execute("SELECT 1 FROM settings WHERE name = 'bootstrapped'").fetchone():
+                return 0
+        rows = []
+        for summary in bucket.objects.filter(Prefix=METADATA_PREFIX):
+            parts = summary.key[len(METADATA_PREFIX):].split("/")
+            if len(parts) == 2 and parts[1].endswith(".json"):
+                rows.append((parts[1][:-len(".json")], parts[0]))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO sites VALUES (?, ?, '{}', 0, ?, 0)",
+                [(domain, bucket_name, bucket_name) for domain, bucket_name in rows])
+            self.connection.execute("INSERT OR REPLACE INTO settings VALUES ('bootstrapped', '1')")
+        return len(rows)
+
+
+    def lookup(self, domain):
+        """
+        Metadata of a site
+
+        Returns: (history, bucket) (tuple) - history (dict) known locally,
+        and the metadata/ directory the site is filed under (None if new)
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT history, bucket FROM sites WHERE domain = ?",
+                                          (domain,)).fetchone()
+        if row is None:
+            return ({}, None)
+        return (json.loads(row[0]), row[1])
+
+
+    def record(self, domain, formatted_date, metadata):
+        """
+        Add a crawl's metadata to a site's history and file the site by its
+        status. S3 is updated by the next sync().
+
+        Inputs:
+        domain (string); formatted_date (string) - date of crawl;
+        metadata (dict) - with "status"
+
+        Returns: (history, previous_bucket) (tuple) - previous_bucket is None for a new site
+        """
+        bucket_name = status_bucket(metadata["status"])
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT history, bucket FROM sites WHERE domain = ?",
+                                          (domain,)).fetchone()
+            history, previous = ({}, None) if row is None else (json.loads(row[0]), row[1])
+            history[formatted_date] = metadata
+            if row is None:
+                self.connection.execute("INSERT INTO sites VALUES (?, ?, ?, 1, NULL, 1)",
+                                        (domain, bucket_name, json.dumps(history)))
+            else:
+                self.connection.execute("UPDATE sites SET bucket = ?, history = ?, dirty = 1 WHERE domain = ?",
+                                        (bucket_name, json.dumps(history), domain))
+        return (history, previous)
+
+
+    def pending(self):
+        """
+        Number of sites whose metadata is not yet in S3
+        """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM sites WHERE dirty = 1").fetchone()[0]
+
+
+    def sync(self, bucket, batch_size=SYNC_BATCH_SIZE):
+        """
+        Upload changed sites' metadata to S3, batch by batch: merge in
+        history from S3 not seen yet, put the object in its directory and
+        delete the copy in the old one. A site that fails stays pending.
+
+        Inputs: bucket - S3 bucket; (optional) batch_size (int)
+
+        Returns: int - number of sites uploaded
+        """
+        uploaded = 0
+        failed = set()
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT domain, bucket, history, loaded, synced_bucket FROM sites WHERE dirty = 1 "
+                    f"AND domain NOT IN ({','.join('?' * len(failed))}) LIMIT ?",
+                    (*failed, batch_size)).fetchall()
+            if len(rows) == 0:
+                return uploaded
+            for domain, bucket_name, history_json, loaded, synced_bucket in rows:
+                try:
+                    earlier = {}
+                    if not loaded and synced_bucket is not None:
+                        # Filed by an earlier run: keep its history, newer entries win
+                        body = bucket.Object(metadata_key(synced_bucket, domain)).get()["Body"].read()
+                        earlier = read_payload(body) # Stored as JSON or JSON-encoded JSON
+                    history = dict(earlier, **json.loads(history_json))
+                    bucket.put_object(Body=json.dumps(history), Key=metadata_key(bucket_name, domain))
+                    if synced_bucket is not None and synced_bucket != bucket_name:
+                        bucket.Object(metadata_key(synced_bucket, domain)).delete() # Filed under new status
+                except Exception as e:
+                    logging.warning(f"metadata_index: sync of {domain} failed, retried later: {e}")
+                    failed.add(domain)
+                    continue
+                with self.lock, self.connection:
+                    # S3 now holds the object in bucket_name with the earlier history merged in,
+                    # whether or not record() changed the site during the upload
+                    current_json, current_bucket = self.connection.execute(
+                        "SELECT history, bucket FROM sites WHERE domain = ?", (domain,)).fetchone()
+                    changed = current_json != history_json or current_bucket != bucket_name
+                    self.connection.execute(
+                        "UPDATE sites SET history = ?, loaded = 1, synced_bucket = ?, dirty = ? WHERE domain = ?",
+                        (json.dumps(dict(earlier, **json.loads(current_json))), bucket_name, int(changed), domain))
+                uploaded += 1
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class MetadataSyncer(threading.Thread):
+    """
+    Background thread that syncs a MetadataIndex to S3 every interval
+    seconds, and once more when stopped
+
+    Inputs:
+    index (MetadataIndex); bucket - S3 bucket
+    (optional) interval (float): Seconds between syncs
+    """
+
+    def __init__(self, index, bucket, interval=METADATA_SYNC_INTERVAL):
+        super().__init__(daemon=True)
+        self.index = index
+        self.bucket = bucket
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sync()
+
+
+    def sync(self):
+        try:
+            self.index.sync(self.bucket)
+        except Exception as e:
+            logging.error(f"metadata_index: sync failed: {str(e)}")
+
+
+    def stop(self):
+        """
+        Stop syncing and upload whatever is still pending
+        """
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.sync()
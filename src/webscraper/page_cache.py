@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import logging
+import threading
+from . import config
+
+from .seen_store import content_hash
+
+
+INCREMENTAL = config.INCREMENTAL # Revalidate pages from the last crawl before fetching them
+PAGE_CACHE_DIR = config.PAGE_CACHE_DIR # Directory of per-site page cache files
+MAX_WORDS = config.MAX_WORDS_PER_PAGE
+
+
+def response_validators(headers):
+    """
+    Cache validators of an HTTP response
+
+    Inputs: headers (dict-like) - response headers
+    Returns: dict - "etag" and/or "last_modified", only those sent
+    """
+    validators = {}
+    if headers.get("ETag"):
+        validators["etag"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        validators["last_modified"] = headers["Last-Modified"]
+    return validators
+
+
+def conditional_headers(validators):
+    """
+    Request headers asking the server to answer 304 if a page is unchanged
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+class PageCache:
+    """
+    Pages of one site from its last crawl, for incremental recrawls: each
+    page's text, links, rel=canonical url, cache validators (ETag and
+    Last-Modified) and a hash of its text. ScannerThreads revalidate cached
+    pages with a conditional request before fetching them; unchanged pages
+    are served from the cache without a Chrome render.
+
+    The cache is loaded from <directory>/<domain>.json and rewritten by
+    save() with the pages scanned in this crawl, so it never holds pages
+    the site no longer links to. Shared by all threads scanning the site.
+
+    Inputs:
+    domain (string): Site's home domain
+    (optional) directory (string): Directory of cache files
+    """
+
+    def __init__(self, domain, directory=PAGE_CACHE_DIR):
+        self.path = os.path.join(directory, f"{domain}.json")
+        self.previous = {} # url -> entry from last crawl
+        self.pages = {} # url -> entry from this crawl
+        self.hits = 0 # Pages served from the cache after a 304, without a fetch or render
+        self.unchanged = 0 # Pages fetched or rendered again whose text had not changed
+        self.lookups = 0 # Pages scanned through the cache
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.previous = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"page_cache: unreadable cache {self.path}, starting empty: {e}")
+
+
+    def get(self, link):
+        """
+        Entry for link from the last crawl, or None. Counts a lookup.
+
+        Returns: dict with text, links, canonical, validators, hash, crawled_at
+        """
+        with self.lock:
+            self.lookups += 1
+            return self.previous.get(link)
+
+
+    def reuse(self, link):
+        """
+        Serve link from the last crawl after the server confirmed it is
+        unchanged (304 Not Modified)
+
+        Returns: page (dict) - see thread.page_result()
+        """
+        with self.lock:
+            entry = self.previous[link]
+            self.pages[link] = dict(entry, crawled_at=time.time())
+            self.hits += 1
+        return {"text": entry["text"], "links": entry["links"], "lang": "", "title": "",
+                "canonical": entry["canonical"], "validators": entry["validators"]}
+
+
+    def store(self, link, page):
+        """
+        Record a freshly fetched page. A page whose text hashes the same as
+        last crawl is counted as unchanged, not as a hit: it was still
+        fetched (the server ignored or could not be sent a conditional request).
+
+        Inputs: link (string); page (dict) - see thread.page_result()
+        Returns: page (dict), unchanged
+        """
+        text = page["text"][:MAX_WORDS]
+        page_hash = content_hash(text)
+        entry = {
+            "text": text,
+            "links": page["links"],
+            "canonical": page["canonical"],
+            "validators": page.get("validators") or {},
+            "hash": page_hash,
+            "crawled_at": time.time()
+        }
+        with self.lock:
+            previous = self.previous.get(link)
+            if previous is not None and previous["hash"] == page_hash:
+                self.unchanged += 1
+            self.pages[link] = entry
+        return page
+
+
+    def hit_rate(self):
+        """
+        Percent of pages scanned that were served from the cache
+        """
+        with self.lock:
+            return 0.0 if self.lookups == 0 else self.hits / self.lookups * 100
+
+
+    def save(self):
+        """
+        Replace the cache file with the pages scanned in this crawl
+        """
+        with self.lock:
+            pages = dict(self.pages)
+        if len(pages) == 0:
+            return # Nothing scanned (e.g. timed out), keep the last crawl
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(pages, f)
+        os.replace(temp_path, self.path) # Readers never see a partial file
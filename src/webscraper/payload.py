@@ -0,0 +1,234 @@
+import io
+import json
+import zlib
+from . import config
+
+
+CHUNK_SIZE = 65536 # Characters read, and bytes written or uploaded, at a time
+PAYLOAD_FORMAT = config.PAYLOAD_FORMAT # "legacy", "json" or "ndjson"
+PAYLOAD_VERSION = 2 # Stored in "json" and "ndjson" payloads; legacy payloads have none
+GZIP_MAGIC = b"\x1f\x8b"
+COMPRESSION_LEVEL = 6
+
+
+def json_string_pieces(chunks):
+    """
+    Encode the concatenation of chunks as a JSON string literal, piece by
+    piece. Escaping is per character, so the pieces join to exactly
+    json.dumps("".join(chunks)).
+
+    Inputs: chunks (iterable of strings)
+    Returns: generator of strings
+    """
+    yield '"'
+    for chunk in chunks:
+        if chunk:
+            yield json.dumps(chunk)[1:-1]
+    yield '"'
+
+
+def payload_pieces(fields, text_chunks, text_key="html"):
+    """
+    Encode a site payload piece by piece: the pieces join to exactly
+    json.dumps(dict(fields, html=text), indent=2), without the text ever
+    being held in one string.
+
+    Inputs:
+    fields (dict) - scalar fields written before the text (domain, date, ...);
+    text_chunks (iterable of strings) - the site text; (optional) text_key (string)
+
+    Returns: generator of strings
+    """
+    yield "{\n"
+    for key, value in fields.items():
+        yield f"  {json.dumps(key)}: {json.dumps(value)},\n"
+    yield f"  {json.dumps(text_key)}: "
+    yield from json_string_pieces(text_chunks)
+    yield "\n}"
+
+
+def double_encoded(pieces):
+    """
+    Encode a JSON document as a JSON string, the way scrape.py stores
+    objects in S3 (json.dumps of the json.dumps output), piece by piece
+    """
+    return json_string_pieces(pieces)
+
+
+def compact_pieces(fields, text_chunks, text_key="html"):
+    """
+    Encode a site payload as compact, single-encoded JSON piece by piece:
+    the pieces join to json.dumps(dict(fields, payload_version=2,
+    payload_format="json", html=text), separators=(",", ":"))
+
+    Returns: generator of strings
+    """
+    header = dict(fields, payload_version=PAYLOAD_VERSION, payload_format="json")
+    yield json.dumps(header, separators=(",", ":"))[:-1]
+    yield f",{json.dumps(text_key)}:"
+    yield from json_string_pieces(text_chunks)
+    yield "}"
+
+
+def ndjson_pieces(fields, text_chunks, text_key="html"):
+    """
+    Encode a site payload as NDJSON: a first line with the fields, then one
+    line per chunk of text ({"html": chunk}), so readers can stream the text
+
+    Returns: generator of strings
+    """
+    header = dict(fields, payload_version=PAYLOAD_VERSION, payload_format="ndjson")
+    yield json.dumps(header, separators=(",", ":")) + "\n"
+    for chunk in text_chunks:
+        if chunk:
+            yield json.dumps({text_key: chunk}, separators=(",", ":")) + "\n"
+
+
+def encoded_payload(fields, text_chunks, payload_format=PAYLOAD_FORMAT):
+    """
+    Pieces and S3 upload arguments of a site payload in a given format:
+    "legacy" is the original double-encoded, indented JSON, uncompressed;
+    "json" and "ndjson" are gzip-compressed
+
+    Inputs: fields (dict); text_chunks (iterable of strings); (optional) payload_format (string)
+    Returns: (pieces, compress, extra_args) (tuple) - see PieceReader; extra_args
+    are the upload's ExtraArgs (ContentType, ContentEncoding)
+    """
+    if payload_format == "legacy":
+        return (double_encoded(payload_pieces(fields, text_chunks)), False, {})
+    if payload_format == "json":
+        return (compact_pieces(fields, text_chunks), True,
+                {"ContentType": "application/json", "ContentEncoding": "gzip"})
+    if payload_format == "ndjson":
+        return (ndjson_pieces(fields, text_chunks), True,
+                {"ContentType": "application/x-ndjson", "ContentEncoding": "gzip"})
+    raise ValueError(f"unknown payload format: {payload_format}")
+
+
+def read_payload(body):
+    """
+    Decode a payload or JSON object read back from S3, in any format the
+    scraper has written: gzip-compressed or not, NDJSON, compact JSON, or
+    JSON encoded as a JSON string (legacy). Format markers are removed, so
+    every format reads back as the same dict.
+
+    Inputs: body (bytes)
+    Returns: dict (or other JSON value)
+    """
+    if body[:2] == GZIP_MAGIC:
+        body = zlib.decompress(body, 31)
+    text = body.decode("utf-8")
+    first_line, _, rest = text.partition("\n")
+    try:
+        header = json.loads(first_line)
+    except ValueError:
+        header = None
+    if isinstance(header, dict) and header.get("payload_format") == "ndjson":
+        data = header
+        for line in rest.splitlines():
+            if line:
+                for key, value in json.loads(line).items():
+                    data[key] = data.get(key, "") + value
+    else:
+        data = json.loads(text)
+        if isinstance(data, str):
+            data = json.loads(data) # Legacy: JSON document encoded as a JSON string
+    if isinstance(data, dict):
+        data.pop("payload_version", None)
+        data.pop("payload_format", None)
+    return data
+
+
+def gzipped(blocks, level=COMPRESSION_LEVEL):
+    """
+    Gzip-compress a stream of byte blocks
+
+    Returns: generator of bytes
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31: gzip header and trailer
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def buffered(pieces, size=CHUNK_SIZE):
+    """
+    Join small string pieces into UTF-8 blocks of about size bytes
+
+    Returns: generator of bytes
+    """
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def read_text_chunks(path, size=CHUNK_SIZE):
+    """
+    Read a text file chunk by chunk; a missing file reads as empty
+
+    Returns: generator of strings
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    return
+                yield chunk
+    except FileNotFoundError:
+        return
+
+
+def write_payload(f, pieces):
+    """
+    Write encoded pieces to a binary file object
+
+    Inputs: f (binary file); pieces (iterable of strings)
+    Returns: int - bytes written
+    """
+    written = 0
+    for block in buffered(pieces):
+        f.write(block)
+        written += len(block)
+    return written
+
+
+class PieceReader(io.RawIOBase):
+    """
+    Read-only binary file object over encoded pieces, so a payload can be
+    handed to an upload (e.g. Bucket.upload_fileobj) as a stream
+
+    Inputs:
+    pieces (iterable of strings)
+    (optional) compress (boolean): Gzip-compress the stream
+    """
+
+    def __init__(self, pieces, compress=False):
+        self.blocks = buffered(pieces)
+        if compress:
+            self.blocks = gzipped(self.blocks)
+        self.pending = memoryview(b"") # Part of the current block not yet read
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            try:
+                self.pending = memoryview(next(self.blocks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
@@ -1,16 +1,90 @@
+import os
+import re
 import sys
+import string
 from . import utils as ut
 import nltk
-# from nltk.corpus import stopwords
 
-#STOP_WORDS = set(stopwords.words('english'))
+from nltk.stem import PorterStemmer
+
+# NLTK's English stopword list, kept here so no corpus download is needed
+STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves he
+him his himself she she's her hers herself it it's its itself they them their theirs themselves what
+which who whom this that that'll these those am is are was were be been being have has had having do
+does did doing a an the and but if or because as until while of at by for with about against between
+into through during before after above below to from up down in out on off over under again further
+then once here there when where why how all any both each few more most other some such no nor not
+only own same so than too very s t can will just don don't should should've now d ll m o re ve y ain
+aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't
+ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't weren weren't
+won won't wouldn wouldn't
+""".split())
+
+PUNCTUATION = string.punctuation + "\u201c\u201d\u2018\u2019\u00ab\u00bb\u2013\u2014\u2026\u2022\u00b7"
+WORD_JOINERS = "-/'\u2019\u2013\u2014" # Replaced by a space, splitting the words they join; other punctuation is deleted
+PUNCTUATION_TABLE = str.maketrans({char: (" " if char in WORD_JOINERS else None) for char in PUNCTUATION})
+NUMBER_RE = re.compile(r"(?<!\S)[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?(?!\S)") # Words float() accepts
+STEM_CACHE_SIZE = 262144 # Tokens normalized and memoized per process
+BLOCK_SIZE = 1 << 20 # Characters of a text file normalized at a time
+
+STEMMER = PorterStemmer()
+
+
+class NormalizedWords(dict):
+    """
+    Lowercased, punctuation-free token -> its stem, or "" for stop words and
+    numbers. Each distinct token is checked and stemmed once; after that a
+    word costs one dict lookup. Holds at most STEM_CACHE_SIZE tokens, later
+    ones are normalized without being stored. The only stem cache: every
+    stemming path in this module goes through it.
+    """
+
+    def __missing__(self, word):
+        # Tokens only left as a number once punctuation is gone, e.g. "(12)", take the same NUMBER_RE test
+        normalized = "" if word in STOP_WORDS or NUMBER_RE.fullmatch(word) else STEMMER.stem(word)
+        if len(self) < STEM_CACHE_SIZE:
+            self[word] = normalized
+        return normalized
+
+
+NORMALIZED_WORDS = NormalizedWords()
+
+
+def strip_numbers(words):
+    """
+    Remove numbers from a page with one regex pass over the whole page,
+    instead of utils.is_number() per word
+
+    Inputs: words (list) - page text
+    Returns: list of words
+    """
+    return NUMBER_RE.sub(" ", " ".join(words)).split()
+
+
+def clean_page(words):
+    """
+    Normalize a page for analysis: strip numbers (as strip_numbers() does,
+    before punctuation can split or merge them), lowercase, strip
+    punctuation, drop stop words and reduce words to their stems. Each step
+    runs over the whole page at once.
+
+    Inputs: words (list) - page text
+    Returns: list of words
+    """
+    text = NUMBER_RE.sub(" ", " ".join(words)).lower().translate(PUNCTUATION_TABLE)
+    return list(filter(None, map(NORMALIZED_WORDS.__getitem__, text.split())))
+
 
 class Processor:
     def __init__(self, queue):#,# results_file):
         self.queue = queue
      #   self.results_file = results_file
         self.stop_word_count = 0
-    
+        self.word_count = 0
+        self.page_count = 0
+        self.result_file_names = []
+   
     def print_text(self):
         queue = self.queue
         with open(self.results_file, 'w') as file:
@@ -23,53 +97,104 @@ class Processor:
                    # else:
                     #    self.stop_word_count += 1
         file.close()
-        
-    def get_text(self):
-        result = ''
-        queue = self.queue
+       
+    def iter_text(self):
+        """
+        Site text one page at a time: every word followed by a space, as
+        get_text() returns it, without building the whole string
+        """
         if self.queue.english == False:
-            result += "Non english site detected"
-        else:
-            for page in queue.text:
-                for word in page:
-                   # if word not in STOP_WORDS:
-                    result += word
-                    result += " "
-                   # else:
-                    #    self.stop_word_count += 1
-        return result
+            yield "Non english site detected"
+            return
+        for page in self.queue.text:
+            if len(page) != 0:
+                yield " ".join(page) + " "
+
+    def get_text(self):
+        return "".join(self.iter_text())
+
+    def write_text(self, filename):
+        """
+        Stream site text to a file, one page at a time
+        """
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as file:
+            for chunk in self.iter_text():
+                file.write(chunk)
 
     def print_text_without_numbers(self, filename):
         queue = self.queue
         with open(filename, 'w') as file:
             for page in queue.text:
-                for word in page:
-                    if not ut.is_number(word):
-                        file.write(word + " ")
+                words = strip_numbers(page)
+                if len(words) != 0:
+                    file.write(" ".join(words) + " ")
 
-    
-    
+   
+   
     def run_processes(self):
         self.update_word_count()
-    
+        self.update_page_count()
+        self.update_stop_word_count()
+   
     def update_word_count(self):
-        raise NotImplementedError
-    
+        self.word_count = self.queue.text.word_count()
+        return self.word_count
+   
     def update_page_count(self):
-        raise NotImplementedError
-    
-    def clean_file(filename):
-        # strip puctuation, strip flllers, merge stem words
-        raise NotImplementedError
-         
-    def strip_punctuation(filename):
-        raise NotImplementedError
+        self.page_count = self.queue.text.page_count()
+        return self.page_count
+
+    def update_stop_word_count(self):
+        # Checked once per distinct word, on the token ids
+        self.stop_word_count = self.queue.text.count_matching(lambda word: word.lower() in STOP_WORDS)
+        return self.stop_word_count
     
-    def strip_filler_words(filename):
-        raise NotImplementedError
+    def clean_pages(self):
+        """
+        Normalized text of each page, see clean_page()
+        """
+        for page in self.queue.text:
+            yield clean_page(page)
+   
+    def clean_file(self, filename, output=None):
+        """
+        Normalize a text file written by write_text(), block by block: strip
+        punctuation, numbers and filler words, and merge words to their stems
     
-    def replace_stem_words(filename):
-        raise NotImplementedError
+        Inputs: filename (string); (optional) output (string) - defaults to
+        rewriting filename
+        """
+        output = output or filename
+        temp_file = output + ".tmp"
+        with open(filename, encoding='utf-8') as source, open(temp_file, 'w', encoding='utf-8') as target:
+            carry = "" # Word cut at the end of the previous block
+            while True:
+                block = source.read(BLOCK_SIZE)
+                if not block:
+                    break
+                block = carry + block
+                cut = block.rfind(" ") + 1
+                carry = block[cut:]
+                words = clean_page(block[:cut].split())
+                if len(words) != 0:
+                    target.write(" ".join(words) + " ")
+            words = clean_page(carry.split())
+            if len(words) != 0:
+                target.write(" ".join(words) + " ")
+        os.replace(temp_file, output)
         
+    def strip_punctuation(self, words):
+        return " ".join(words).translate(PUNCTUATION_TABLE).split()
+   
+    def strip_filler_words(self, words):
+        kept = [word for word in words if word.lower() not in STOP_WORDS]
+        self.stop_word_count += len(words) - len(kept)
+        return kept
+   
+    def replace_stem_words(self, words):
+        # Stop words and numbers normalize to "", so only those are stemmed outside the cache
+        return [NORMALIZED_WORDS[word] or STEMMER.stem(word) for word in map(str.lower, words)]
+       
     def add_result_file(self, filename):
         self.result_file_names.append(filename)
@@ -0,0 +1,185 @@
+import os
+import csv
+import time
+import logging
+import threading
+from . import config
+
+from collections import deque
+
+
+SAMPLE_INTERVAL = config.SAMPLE_INTERVAL # Seconds between samples
+SAMPLE_BUFFER_SIZE = config.SAMPLE_BUFFER_SIZE # Samples kept in the ring buffer
+CHROME_PROCESS_NAMES = ("chrome", "chromedriver", "chromium") # Prefixes of /proc/<pid>/status Name
+
+
+def read_cpu_times():
+    """
+    Read aggregate CPU times from /proc/stat
+
+    Returns: (busy, total) (tuple) - jiffies spent busy and in total
+    """
+    with open("/proc/stat") as f:
+        fields = [int(value) for value in f.readline().split()[1:]]
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0) # idle + iowait
+    total = sum(fields[:8]) # Guest time is already counted in user/nice
+    return (total - idle, total)
+
+
+def read_meminfo():
+    """
+    Read /proc/meminfo
+
+    Returns: dict - field name -> kB
+    """
+    meminfo = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            meminfo[key] = int(value.split()[0])
+    return meminfo
+
+
+def memory_percent():
+    """
+    Percent of system RAM in use, from /proc/meminfo
+
+    Returns: float
+    """
+    meminfo = read_meminfo()
+    available = meminfo.get("MemAvailable", meminfo["MemFree"])
+    return (meminfo["MemTotal"] - available) / meminfo["MemTotal"] * 100.0
+
+
+def available_memory_mb():
+    """
+    Memory available to new processes, from /proc/meminfo
+
+    Returns: float - megabytes
+    """
+    meminfo = read_meminfo()
+    return meminfo.get("MemAvailable", meminfo["MemFree"]) / 1024.0
+
+
+def chrome_rss_mb():
+    """
+    Total resident memory of all Chrome and chromedriver processes
+
+    Returns: float - megabytes
+    """
+    total_kb = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                name = f.readline().split(":", 1)[1].strip()
+                if not name.startswith(CHROME_PROCESS_NAMES):
+                    continue
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, IndexError, ValueError):
+            continue # Process exited while being read
+    return total_kb / 1024.0
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Background thread that samples CPU, RAM and Chrome memory from /proc
+    every interval seconds into a ring buffer. Replaces the per-page mpstat/free
+    subprocesses, so scanning threads never block on measurement.
+
+    Samples are (timestamp, ram %, cpu %, chrome rss MB, pages being scanned).
+
+    Inputs:
+    (optional) interval (float): Seconds between samples
+    (optional) capacity (int): Number of samples kept
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, capacity=SAMPLE_BUFFER_SIZE):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = deque(maxlen=capacity) # Ring buffer of samples
+        self.active_pages = {} # link -> number of threads scanning it
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.last_cpu = None # (busy, total) at previous sample
+
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+
+    def stop(self):
+        self.stop_event.set()
+
+
+    def sample(self):
+        """
+        Take one sample and append it to the ring buffer
+        """
+        try:
+            busy, total = read_cpu_times()
+            cpu = 0.0
+            if self.last_cpu is not None and total > self.last_cpu[1]:
+                cpu = (busy - self.last_cpu[0]) / (total - self.last_cpu[1]) * 100.0
+            self.last_cpu = (busy, total)
+            ram = memory_percent()
+            chrome = chrome_rss_mb()
+        except (OSError, KeyError, ValueError) as e:
+            logging.warning(f"resource_monitor: unable to sample /proc: {e}")
+            return
+        with self.lock:
+            pages = " ".join(self.active_pages)
+            self.samples.append((time.time(), round(ram, 2), round(cpu, 2), round(chrome, 1), pages))
+
+
+    def page_started(self, link):
+        with self.lock:
+            self.active_pages[link] = self.active_pages.get(link, 0) + 1
+
+
+    def page_finished(self, link):
+        with self.lock:
+            count = self.active_pages.get(link, 0) - 1
+            if count > 0:
+                self.active_pages[link] = count
+            else:
+                self.active_pages.pop(link, None)
+
+
+    def samples_since(self, start_time):
+        """
+        Samples taken at or after start_time
+
+        Returns: list of sample tuples
+        """
+        with self.lock:
+            return [sample for sample in self.samples if sample[0] >= start_time]
+
+
+    def latest(self):
+        """
+        Most recent sample, or None if no sample has been taken
+        """
+        with self.lock:
+            return self.samples[-1] if self.samples else None
+
+
+    def write_csv(self, path, start_time=0):
+        """
+        Write samples taken since start_time to a cpu_ram CSV. Rows keep the
+        original headerless ram, cpu, links columns, with the sample time
+        and Chrome RSS (MB) appended after them.
+
+        Inputs: path (string); (optional) start_time (float)
+        Returns: None
+        """
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            for sample_time, ram, cpu, chrome, pages in self.samples_since(start_time):
+                writer.writerow([ram, cpu, pages, sample_time, chrome])
@@ -10,10 +10,26 @@ from . import config
 import time
 import logging
 import requests
+import threading
 import subprocess
+import multiprocessing as mp
+from . import utils as ut
 
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
 from .processor import Processor
 from .smart_queue import SmartQueue
+from .driver_pool import DriverPool
+from .resource_monitor import ResourceSampler, available_memory_mb
+from .payload import PieceReader, encoded_payload, read_text_chunks
+from .seen_store import SeenStore, SEEN_STORE_ENABLED
+from .spill import PageSpill, spill_path
+from .success_rate import SuccessRateCounter, claim_slot, shard_name, write_summary
+from .metadata_index import MetadataIndex, MetadataSyncer
+from .uploader import shared_uploader
+from .sqs_consumer import SQSConsumer
+from .backends import s3_bucket, sqs_queue
 
 logging.basicConfig(filename='warn.log', level=logging.WARN)
 
@@ -27,103 +43,435 @@ BUCKET_NAME = config.BUCKET_NAME
 
 RETRY_CODES = config.RETRY_CODES
 
-def get_message():
+NUM_PROCESSES = config.NUM_PROCESSES # Max sites crawled at once
+PROCESS_MEMORY_MB = config.PROCESS_MEMORY_MB # Memory reserved per worker process
+
+# Set in worker processes by init_worker()
+WORKER_DRIVER_POOL = None
+WORKER_SAMPLER = None
+WORKER_SEEN_STORE = None
+
+def update_success_rate(status, counter):
     """
-    Take message (link) from SQS queue and return it
+    Count a site towards the scraper success rate. Counts are kept in
+    memory and uploaded to this process's shard in S3 by the counter.
+
+    Inputs: status (string) - "success", "fail" or "bad"; counter (SuccessRateCounter)
     """
-    sqs = SQS_SESSION.resource('sqs')
-    sqs_queue = sqs.get_queue_by_name(QueueName = QUEUE_NAME)
+    counter.add(status)
 
-    for message in sqs_queue.receive_messages(MessageAttributeNames=['All']):
-        return message
 
+def retry(code):
+    """
+    Determine if link should be retried
+    """
+    if (int(code) >= 500) or (int(code) in RETRY_CODES):
+      return True
+    return False
 
-def get_metadata(domain, metadata):
+
+def max_processes():
     """
-    Load existing metadata for given link from S3
+    Number of sites to crawl at once: num_processes from params.json, reduced
+    so each worker has process_memory_mb of available memory
     """
-    current_datetime = datetime.datetime.now()
-    formatted_date = current_datetime.strftime("%Y-%m-%d")
-    s3 = S3_SESSION.resource('s3')
     try:
-        # Object found in success directory
-        object = s3.Object(BUCKET_NAME, ('metadata/success' + domain + '.json'))
-        data = object.get()
-        json_string = json.loads(json.loads(data['Body'].read().decode('utf-8')))
-        json_string[formatted_date] = metadata
-        return (json_string, 'success')
-    except:
-        try:
-        # Object found in low_count directory
-            object = s3.Object(BUCKET_NAME, ('metadata/failure' + domain + '.json'))
-            data = object.get()
-            json_string = json.loads(json.loads(data['Body'].read().decode('utf-8')))
-            json_string[formatted_date] = metadata
-            return (json_string, 'fail')
-        except:
-            try:
-            # Object found in failure directory
-                object = s3.Object(BUCKET_NAME, ('metadata/low_count' + domain + '.json'))
-                data = object.get()
-                json_string = json.loads(json.loads(data['Body'].read().decode('utf-8')))
-                json_string[formatted_date] = metadata
-                return (json_string, 'low_count')
-            except:
-                json_string = {formatted_date: metadata}
-                return (json_string, None)
+        memory_limit = int(available_memory_mb() // PROCESS_MEMORY_MB)
+    except (OSError, KeyError, ValueError):
+        memory_limit = NUM_PROCESSES # /proc not readable, trust params.json
+    return max(1, min(NUM_PROCESSES, memory_limit))
+
+
+def init_worker():
+    """
+    Set up a worker process: each worker owns its own drivers and sampler,
+    released when the worker exits. The seen-url store files are shared by
+    all workers.
+    """
+    global WORKER_DRIVER_POOL, WORKER_SAMPLER, WORKER_SEEN_STORE
+    WORKER_DRIVER_POOL = DriverPool()
+    WORKER_SAMPLER = ResourceSampler()
+    WORKER_SAMPLER.start()
+    Finalize(None, WORKER_DRIVER_POOL.close, exitpriority=10)
+    Finalize(None, WORKER_SAMPLER.stop, exitpriority=10)
+    if SEEN_STORE_ENABLED:
+        WORKER_SEEN_STORE = SeenStore()
+        Finalize(None, WORKER_SEEN_STORE.close, exitpriority=10)
+
+
+def new_executor(num_processes):
+    """
+    Pool of worker processes, each crawling one site at a time with its own
+    drivers (see init_worker())
+    """
+    return ProcessPoolExecutor(max_workers=num_processes, mp_context=mp.get_context("spawn"),
+                               initializer=init_worker)
+
+
+def replace_executor(executor, num_processes):
+    """
+    New worker pool for one that broke: once a worker dies (e.g. killed for
+    memory along with its Chrome), its pool fails every site given to it
+
+    Returns: ProcessPoolExecutor
+    """
+    logging.error("worker process died, starting a new worker pool")
+    executor.shutdown(wait=False)
+    return new_executor(num_processes)
+
+
+def release_site(url, message, pool_error):
+    """
+    Put a site whose worker pool broke back on the queue, to be crawled
+    later, rather than record it as an error (which deletes its message)
+    """
+    logging.error(f"{url} not crawled, worker pool broken: {str(pool_error)}")
+    if message is not None:
+        message.release()
+
+
+def new_result(url):
+    """
+    Result of a site before it is crawled, see crawl_site()
+    """
+    return {
+        "url": url,
+        "root": url,
+        "home_domain": ut.extract_link_domain(url),
+        "code": "-1",
+        "timeout": False,
+        "total_words": 0,
+        "text_file": None,
+        "spill_file": None,
+        "duration": 0,
+        "cache_hits": 0,
+        "cache_unchanged": 0,
+        "cache_lookups": 0,
+        "error": None
+    }
+
+
+def crawl_site(url, driver_pool=None, sampler=None, seen_store=None, spill_file=None):
+    """
+    Crawl a single site and return everything the parent process needs for
+    S3/SQS bookkeeping. Runs in a worker process, or inline when crawling one
+    site at a time.
+
+    Inputs:
+    url (string) - root url of site; (optional) driver_pool (DriverPool),
+    sampler (ResourceSampler), seen_store (SeenStore) - default to the worker's own;
+    (optional) spill_file (string) - where pages are written as scanned, see spill.spill_path()
+
+    Returns: result (dict) - site text is in the file at result["text_file"]
+    """
+    result = new_result(url)
+    try:    
+        response = requests.get(url)
+        result["code"] = response.status_code
+    # Mark as SQS Error
+    except Exception as e:
+        result["code"] = "-1"
+
+    driver_pool = driver_pool or WORKER_DRIVER_POOL
+    link_start_time = time.time() # Begin timer
+    try:
+        # Initialize scrape of root url 
+        queue = SmartQueue(url, driver_pool=driver_pool, sampler=sampler or WORKER_SAMPLER,
+                           seen_store=seen_store or WORKER_SEEN_STORE, spill_file=spill_file)
+        queue.run_all() # Scrape entire site
+        result["root"] = queue.root
+        result["home_domain"] = queue.home_domain
+        result["timeout"] = queue.timeout
+        result["total_words"] = queue.total_words
+        if queue.page_cache is not None:
+            result["cache_hits"] = queue.page_cache.hits
+            result["cache_unchanged"] = queue.page_cache.unchanged
+            result["cache_lookups"] = queue.page_cache.lookups
+
+        # Write site text to disk, streamed to S3 by the parent process
+        p = Processor(queue) # Reads pages back from the spill file one at a time
+        result["duration"] = time.time() - link_start_time
+        p.write_text(queue.text_file)
+        result["text_file"] = queue.text_file
+        result["spill_file"] = queue.spill_file
+    # Error in Smart_Queue
+    except Exception as scraper_error:
+        result["error"] = str(scraper_error)
+        # Drivers may be left in a bad state, start fresh ones for next site
+        driver_pool.drain()
+    return result
+
+
+def recover_site(url, spill_file):
+    """
+    Result for a site whose worker process died mid-crawl, built from the
+    pages it had written to its spill file. The crawl is recorded as timed
+    out, so the pages are uploaded as partial data.
+
+    Inputs: url (string) - root url of site; spill_file (string) - given to crawl_site()
+    Returns: result (dict), or None if no text was spilled
+    """
+    spill = PageSpill(spill_file, resume=True)
+    if spill.word_count() == 0:
+        remove_text_file({"spill_file": spill_file}) # Empty pages only, nothing to keep
+        return None
+    result = new_result(url)
+    result["timeout"] = True
+    result["total_words"] = spill.word_count()
+    result["spill_file"] = spill.path
+    result["text_file"] = os.path.splitext(spill.path)[0] + ".txt"
+    with open(result["text_file"], 'w', encoding='utf-8') as f:
+        for page in spill:
+            if len(page) != 0:
+                f.write(" ".join(page) + " ")
+    return result
+
+
+class SiteUploads:
+    """
+    Uploads queued for one site. Its SQS message is deleted once every one
+    of them has succeeded; if any is given up, the message is released
+    instead, so the site is crawled again rather than lost.
+
+    Inputs: message (SQS message or None) - None in test mode
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self.pending = 0 # Uploads not finished yet
+        self.failed = False # True if any upload was given up
+        self.closed = False # True once no more uploads will be tracked
+        self.lock = threading.Lock()
+
+
+    def track(self):
+        """
+        Count an upload of the site
+
+        Returns: function - on_done callback for the Uploader
+        """
+        with self.lock:
+            self.pending += 1
+        return self.upload_done
 
 
-def update_success_rate(status):
+    def upload_done(self, succeeded):
+        with self.lock:
+            self.pending -= 1
+            self.failed = self.failed or not succeeded
+            finished = self.closed and self.pending == 0
+        if finished:
+            self.finish()
+
+
+    def close(self):
+        """
+        Mark every upload of the site queued; the message is settled once they finish
+        """
+        with self.lock:
+            self.closed = True
+            finished = self.pending == 0
+        if finished:
+            self.finish()
+
+
+    def finish(self):
+        if self.message is None:
+            return
+        if self.failed:
+            logging.error("uploads failed, site message released for a later crawl")
+            self.message.release()
+        else:
+            self.message.delete()
+
+
+def record_site(result, message, uploader, stats, formatted_datetime, test_mode):
     """
-    Update scraper success rate data in S3
+    Upload a crawled site's data, metadata and error reports to S3, update
+    run statistics, and remove its message from SQS once the uploads have
+    succeeded (see SiteUploads). Runs in the parent process.
+
+    Inputs:
+    result (dict) - from crawl_site(); message (SQS message or None) - deleted in a batch, see SQSConsumer;
+    uploader (Uploader) - S3 uploads are queued on it; stats (dict) - run statistics, updated in place;
+    formatted_datetime (string); test_mode (boolean)
     """
-    num_success = 0
-    num_fail = 0
-    num_bad = 0
+    url = result["url"]
+    code = result["code"]
+    home_domain = result["home_domain"]
+    uploads = SiteUploads(None if test_mode else message)
+    stats["cache_hits"] += result["cache_hits"]
+    stats["cache_unchanged"] += result["cache_unchanged"]
+    stats["cache_lookups"] += result["cache_lookups"]
+    if result["error"] is not None:
+        scraper_error = result["error"]
+        print(scraper_error)
+        stats["error_file"].write(scraper_error)
+        stats["check_files"].add(url)
+        error_data = {
+                "url": url,
+                "date": formatted_datetime
+        }
+
+        # Log error in S3
+        json_error_data = json.dumps(error_data, indent = 2)
+        uploader.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/error_links/' + home_domain + '.json'),
+                            on_done = uploads.track())
+        uploads.close() # remove bad link from queue once it is saved in bucket
+        print("scrape.py encountered error (1):", scraper_error)
+        return
 
-    if status == "success":
-        num_success = 1
-    elif status == "fail":
-        num_fail = 1
+    status = "success"
+    # Update statuses after scrape
+    if result["timeout"]:
+        status = "timeout"
+    stats["word_counts"][result["root"]] = result["total_words"]
+    if result["total_words"] < 500:
+        stats["check_files"].add(result["root"])
+    link_duration = result["duration"]
+    
+    # Main data JSON, streamed from the site's text file with "html" last
+    data = {
+            "domain": result["root"],
+            "date": formatted_datetime,
+            "duration": link_duration,
+            "count": result["total_words"]
+    }
+    # Error JSON
+    error_data = {
+                "url": url,
+                "date": formatted_datetime,
+                "duration": link_duration,
+                "response_code": code
+    }
+# Case 1: No words found 
+    if result["total_words"] == 0:
+        status = "fail"
+        json_error_data = json.dumps(error_data, indent = 2)
+        if (int(code) < 200) or (int(code) > 299):
+            stats["num_bad"] += 1 # bad link
+            update_success_rate("bad", stats["success_counter"])
+        else:
+            stats["num_fail"] += 1
+            update_success_rate("fail", stats["success_counter"])
+
+# Case 1a: Code is worth retrying
+        if retry(code):
+          uploader.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/redirects/' + home_domain + 'json'), on_done = uploads.track())
+# Case 1b: Code is not worth retrying
+        else:
+          uploader.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/error_links/' + home_domain + '.json'), on_done = uploads.track())
+# Case 2: < 500 words found 
+    elif result["total_words"] < 500:
+        if (result["total_words"] < 200):
+            stats["num_fail"] += 1
+            update_success_rate("fail", stats["success_counter"])
+        else:
+            stats["num_success"] += 1
+            update_success_rate("success", stats["success_counter"])
+        status = "low_count"
+        upload_site_data(uploader, data, result, 'flagged_links/low_count/' + home_domain + '.json', uploads.track())
+    elif status == "timeout":
+        stats["num_fail"] += 1
+        update_success_rate("fail", stats["success_counter"])
+        json_error_data = json.dumps(error_data, indent = 2)
+        uploader.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/timeout/' + home_domain + '.json'), on_done = uploads.track())
+        # Pages scanned before the timeout (or worker crash), from the spill file
+        if result["text_file"] is not None:
+            upload_site_data(uploader, data, result, 'flagged_links/partial/' + home_domain + '.json', uploads.track())
     else:
-        num_bad = 1
-
-    s3 = S3_SESSION.resource('s3')
-    object = s3.Object(BUCKET_NAME, ('success_rate/success-fail.json'))
-
-    s3_resource = S3_SESSION.resource('s3')
-    bucket = s3_resource.Bucket(BUCKET_NAME)
-
-    data = object.get()
-    json_string = json.loads(json.loads(data['Body'].read().decode('utf-8')))
-    success = int(json_string["success"]) + num_success
-    fail = int(json_string["fail"]) + num_fail
-    bad = int(json_string["bad_site"]) + num_bad
-    rate = (success/(success + fail)) * 100
-    rate_string = str(rate) + "%"
-    new_data = {
-        "success": success,
-        "fail": fail,
-        "bad_site": bad,
-        "rate": rate_string
+# Case 3: Successful link       
+        stats["num_success"] += 1
+        update_success_rate("success", stats["success_counter"])
+        upload_site_data(uploader, data, result, 'html_data/' + home_domain + '.json', uploads.track())
+    uploads.close()
+    
+    
+    metadata = {
+            "domain": result["root"],
+            "response_code": code,
+            "word_count": result["total_words"],
+            "duration": link_duration,
+            "status": status
     }
-    json_data = json.dumps(new_data, indent = 2)
-    bucket.put_object(Body = json.dumps(json_data), Key = ('success_rate/success-fail.json'))
+# Record metadata           
+    if not test_mode:
+        if status == "timeout":
+            stats["num_timeouts"] += 1
+        # Filed under metadata/fail, low_count or success by the local index; moved in S3 by its syncer
+        formatted_date = datetime.datetime.now().strftime("%Y-%m-%d")
+        stats["metadata_index"].record(home_domain, formatted_date, metadata)
 
 
-def retry(code):
+def upload_site_data(uploader, data, result, key, on_done=None):
     """
-    Determine if link should be retried
+    Queue a site's data JSON for upload to S3, in the payload_format from
+    params.json (see payload.encoded_payload(); payload.read_payload() reads
+    every format). The text is streamed from the site's text file and 
+    encoded block by block instead of being held in memory as several full 
+    copies. The text and spill files are deleted once the upload is done.
+
+    Inputs:
+    uploader (Uploader); data (dict) - fields written before "html";
+    result (dict) - from crawl_site(), site text is in result["text_file"]; key (string);
+    (optional) on_done (function) - called with the upload's outcome, see Uploader.submit()
     """
-    if (int(code) >= 500) or (int(code) in RETRY_CODES):
-      return True
-    return False
+    text_file = result["text_file"]
+
+    def upload(client, bucket_name):
+        # Encoded afresh on each attempt
+        pieces, compress, extra_args = encoded_payload(data, read_text_chunks(text_file))
+        client.upload_fileobj(PieceReader(pieces, compress), bucket_name, key, ExtraArgs=extra_args or None)
+
+    def done(succeeded):
+        remove_text_file(result, uploaded=True)
+        if on_done is not None:
+            on_done(succeeded)
+
+    result["uploading"] = True
+    uploader.submit(key, upload, on_done=done)
+
+
+def remove_text_file(result, uploaded=False):
+    """
+    Delete a site's text and spill files, unless an upload still reads them
+    (it deletes them when done)
+
+    Inputs: result (dict) - from crawl_site(); (optional) uploaded (boolean) - True once uploaded
+    """
+    if result.get("uploading") and not uploaded:
+        return
+    for key in ["text_file", "spill_file"]:
+        if result.get(key):
+            try:
+                os.remove(result[key])
+            except OSError:
+                pass
+
+
+def record_sqs_error(sqs_error, url, message, uploader, formatted_datetime, test_mode):
+    """
+    Log an error that happened while fetching or dispatching a site
+    """
+    logging.error(f"An error with sqs occurred at {formatted_datetime}: {str(sqs_error)}\n\n\n\n\n", exc_info=True)
+    error_data = {
+            "url": url,
+            "date": formatted_datetime
+    }
+    # procedures here to kill the process, recover server
+    json_error_data = json.dumps(error_data, indent = 2)
+    uploads = SiteUploads(message if (len(url) > 0) and (not test_mode) else None)
+    uploader.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/error_links/' + ut.extract_link_domain(url) + '.json'),
+                        on_done = uploads.track())
+    uploads.close()
 
 
 def main(sqs_name, number_links, test_mode=False, test_url=None):
     """
     Main process. Run scraper on given number of links from SQS, as
-    specified by standard input
+    specified by standard input. Up to num_processes sites are crawled at
+    once in worker processes; the main process handles all S3/SQS 
+    bookkeeping.
     """
     # Create loggers for standard output and error
     start_time = time.time()
@@ -145,219 +493,160 @@ def main(sqs_name, number_links, test_mode=False, test_url=None):
     master_file = os.path.join(os.getcwd(), subdirectory_name, "master.csv")
     
     # Data tracking
-    word_counts = {}
-    check_files = set()
-    num_success = 0
-    num_fail = 0
-    num_bad = 0
-    num_timeouts = 0
+    stats = {
+        "word_counts": {},
+        "check_files": set(),
+        "num_success": 0,
+        "num_fail": 0,
+        "num_bad": 0,
+        "num_timeouts": 0,
+        "cache_hits": 0,
+        "cache_unchanged": 0,
+        "cache_lookups": 0
+    }
+    test_root = test_url
 
-    # Initalize AWS Services
-    sqs = SQS_SESSION.resource('sqs')
-    sqs_queue = sqs.get_queue_by_name(QueueName = QUEUE_NAME)
-    s3 = S3_SESSION.resource('s3')
-    bucket = s3.Bucket(BUCKET_NAME)
+    # Initalize AWS Services (or their local stand-ins, see storage_backend and queue_backend)
+    bucket = s3_bucket(BUCKET_NAME)
+    uploader = shared_uploader() # Uploads run in the background while sites are crawled
+    # Messages received in batches, kept hidden while their sites are crawled
+    consumer = None if test_mode else SQSConsumer(sqs_queue(QUEUE_NAME))
+    slot, slot_lock = claim_slot() # Success-rate shard of this host and slot, held while running
+    stats["success_counter"] = SuccessRateCounter(bucket, shard_name(slot))
+    stats["metadata_index"] = MetadataIndex()
+    try:
+        stats["metadata_index"].bootstrap(bucket) # First run only: learn where earlier runs filed sites
+    except Exception as e:
+        logging.error(f"metadata index not seeded from S3: {str(e)}")
+    metadata_syncer = MetadataSyncer(stats["metadata_index"], bucket)
+    metadata_syncer.start()
+
+    num_processes = max_processes()
+    executor = None
+    driver_pool = None
+    sampler = None
+    seen_store = None
+    if num_processes > 1:
+        executor = new_executor(num_processes)
+    else:
+        # Chrome drivers and CPU/RAM sampler shared by all sites in this process
+        driver_pool = DriverPool()
+        driver_pool.warm()
+        sampler = ResourceSampler()
+        sampler.start()
+        if SEEN_STORE_ENABLED:
+            seen_store = SeenStore()
+    in_flight = {} # Future -> (url, SQS message, worker pool, spill file) for sites being crawled by workers
 
 
     try:
         # Open logging files
         with open(process_file, 'w') as log_file:
             with open(error_file, 'w') as error_file:
+                stats["error_file"] = error_file
                 link_count = 0
-                # Scrape until specified number of links scanned
-                while(link_count < number_links):
-                    url = ''
-                    message = None
-                    status = "success"
-                    # Fetch and clean link
-                    try:
-                        if test_mode:
-                            url = test_url
-                        else:
-                            message = get_message()
-                            #url = 'http://' + message.message_attributes['domain']['StringValue']
-                            url = 'https://www.clicktime.com/'
-                        try:    
-                            response = requests.get(url)
-                            code = response.status_code
-                        # Mark as SQS Error
-                        except Exception as e:
-                            code = "-1"
-                        
-                        # Local master file of all links scanned
-                        f = open(master_file, "w")
-                        f.write(url + ',')
-                        f.close
-                        link_start_time = time.time() # Begin timer
-                        link_count += 1
+                queue_empty = False # True once a long poll of SQS returns no message
+                # Scrape until specified number of links scanned, or the queue runs dry
+                while ((link_count < number_links) and not queue_empty) or in_flight:
+                    # Hand out sites until every worker is busy
+                    while (link_count < number_links) and (not queue_empty) and (len(in_flight) < num_processes):
+                        url = ''
+                        message = None
+                        # Fetch and clean link
                         try:
-                            # Initialize scrape of root url 
-                            queue = SmartQueue(url)
-
-                            queue.run_all() # Scrape entire site
-                            # Update statuses after scrape
-                            if queue.timeout:
-                                status = "timeout"
-                            word_counts[queue.root] = queue.total_words
-                            if queue.total_words < 500:
-                                check_files.add(queue.root)
-                            
-                            # Load site text 
-                            p = Processor(queue) 
-                            link_end_time = time.time()
-                            link_duration = link_end_time - link_start_time
-                            text = p.get_text()
-                            
-                            # Main data JSON
-                            data = {
-                                    "domain": queue.root,
-                                    "date": formatted_datetime,
-                                    "duration": link_duration,
-                                    "count": queue.total_words, 
-                                    "html": text
-                            }
-                            # Error JSON
-                            error_data = {
-                                        "url": url,
-                                        "date": formatted_datetime,
-                                        "duration": link_duration,
-                                        "response_code": code
-                            }
-                            json_data = json.dumps(data, indent = 2)
-# Case 1: No words found 
-                            if queue.total_words == 0:
-                                status = "fail"
-                                json_error_data = json.dumps(error_data, indent = 2)
-                                if (int(code) < 200) or (int(code) > 299):
-                                    num_bad += 1 # bad link
-                                    update_success_rate("bad")
-                                else:
-                                    num_fail += 1
-                                    update_success_rate("fail")
-                            
-    # Case 1a: Code is worth retrying
-                                if retry(code):
-                                  bucket.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/redirects/' + queue.home_domain + 'json'))
-    # Case 1b: Code is not worth retrying
-                                else:
-                                  bucket.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/error_links/' + queue.home_domain + '.json'))
-# Case 2: < 500 words found 
-                            elif queue.total_words < 500:
-                                if (queue.total_words < 200):
-                                    num_fail += 1
-                                    update_success_rate("fail")
-                                else:
-                                    num_success += 1
-                                    update_success_rate("success")
-                                status = "low_count"
-                                bucket.put_object(Body = json.dumps(json_data), Key = ('flagged_links/low_count/' + queue.home_domain + '.json'))
-                            elif status == "timeout":
-                                num_fail += 1
-                                update_success_rate("fail")
-                                bucket.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/timeout/' + queue.home_domain + '.json'))
+                            if test_mode:
+                                url = test_url
                             else:
-# Case 3: Successful link       
-                                num_success += 1
-                                update_success_rate("success")
-                                bucket.put_object(Body = json.dumps(json_data), Key = ('html_data/' + queue.home_domain + '.json'))
-                            if not test_mode:
-                                message.delete()
+                                message = consumer.get(limit=number_links - link_count)
+                                if message is None:
+                                    # Nothing arrived during the long poll: finish the sites in flight and stop
+                                    queue_empty = True
+                                    break
+                                url = 'http://' + message.message_attributes['domain']['StringValue']
                             
-                            
-                            metadata = {
-                                    "domain": queue.root,
-                                    "response_code": code,
-                                    "word_count": queue.total_words,
-                                    "duration": link_duration,
-                                    "status": status
-                            }
-# Upload metadata           
-                            if not test_mode:
-                                json_string, current_bucket = get_metadata(queue.home_domain, metadata)
-    # Add metadata to metadata/fail, remove from previous bucket if necessary
-
-                                # Update appropriate S3 directories with error and metadata
-                                if status == "fail":
-                                    bucket.put_object(Body = json.dumps(json_string), Key = (f'metadata/fail/{queue.home_domain}.json'))
-                                    if (current_bucket != "fail") and (current_bucket is not None):
-                                        s3.Object(BUCKET_NAME, (f'metadata/{current_bucket}/{queue.home_domain}.json')).delete()
-                                if status == "low_count":
-                                    bucket.put_object(Body = json.dumps(json_string), Key = (f'metadata/low_count/{queue.home_domain}.json'))
-                                    if (current_bucket != "low_count") and (current_bucket is not None):
-                                        s3.Object(BUCKET_NAME, (f'metadata/{current_bucket}/{queue.home_domain}.json')).delete()
-                                if status == "timeout":
-                                    num_timeouts += 1
-                                    bucket.put_object(Body = json.dumps(json_string), Key = (f'metadata/fail/{queue.home_domain}.json'))
-                                    if (current_bucket != "fail") and (current_bucket is not None):
-                                        s3.Object(BUCKET_NAME, (f'metadata/{current_bucket}/{queue.home_domain}.json')).delete()
-                                else:
-                                    bucket.put_object(Body = json.dumps(json_string), Key = (f'metadata/success/{queue.home_domain}.json'))
-                                    if (current_bucket != "success") and (current_bucket is not None):
-                                        s3.Object(BUCKET_NAME, (f'metadata/{current_bucket}/{queue.home_domain}.json')).delete()
-                                try:
-                                    # Site complete, kill all lingering processes
-                                    subprocess.run(["killall", "chrome"], check=True)
-                                    print("scrape.py inner exception: Chrome processes terminated successfully.")
-                                except Exception as e:
-                                    print("No chrome processes to kill (line 266)")
-                            
-                        # Error in Smart_Queue
-                        except Exception as scraper_error:
-                            print(scraper_error)
-                            error_file.write(str(scraper_error))
-                            check_files.add(url)
-                            error_data = {
-                                    "url": url,
-                                    "date": formatted_datetime
-                            }
-
-                            # Log error in S3
-                            json_error_data = json.dumps(error_data, indent = 2)
-                            bucket.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/error_links/' + queue.home_domain + '.json'))
-                            if not test_mode:
-                                message.delete() # remove bad link from queue, but save it in bucket
+                            # Local master file of all links scanned
+                            f = open(master_file, "w")
+                            f.write(url + ',')
+                            f.close
+                            link_count += 1
+                            if executor is None:
+                                result = crawl_site(url, driver_pool, sampler, seen_store)
+                                test_root = result["root"]
+                                record_site(result, message, uploader, stats, formatted_datetime, test_mode)
+                                remove_text_file(result)
+                            else:
+                                spill_file = spill_path(url) # Known here in case the worker dies
+                                future = executor.submit(crawl_site, url, spill_file=spill_file)
+                                in_flight[future] = (url, message, executor, spill_file)
+
+                        # A worker died and broke the pool: not the site's fault, crawl it later
+                        except BrokenProcessPool as pool_error:
+                            release_site(url, message, pool_error)
+                            executor = replace_executor(executor, num_processes)
+                        
+                        # Handle SQS error
+                        except Exception as sqs_error:
+                            record_sqs_error(sqs_error, url, message, uploader, formatted_datetime, test_mode)
+                            if driver_pool is not None:
+                                driver_pool.drain()
+
+                    # Record sites as workers finish them
+                    if in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            url, message, pool, spill_file = in_flight.pop(future)
                             try:
-                                subprocess.run(["killall", "chrome"], check=True)
-                                print("scrape.py inner exception: Chrome processes terminated successfully.")
-                            except Exception as e:
-                                print("No chrome processes to kill (line 281)")
-                            print("scrape.py encountered error (1):", scraper_error)
-                    
-                    # Handle SQS error
-                    except Exception as sqs_error:
-                        logging.error(f"An error with sqs occurred at {formatted_datetime}: {str(sqs_error)}\n\n\n\n\n", exc_info=True)
-                        error_data = {
-                                "url": url,
-                                "date": formatted_datetime
-                        }
-                        # procedures here to kill the process, recover server
-                        json_error_data = json.dumps(error_data, indent = 2)
-                        bucket.put_object(Body = json.dumps(json_error_data), Key = ('flagged_links/error_links/' + queue.home_domain + '.json'))
-                        if (len(url) > 0) and (message is not None) and (not test_mode):
-                            message.delete()
-                        try:
-                            subprocess.run(["killall", "chrome"], check=True)
-                            print("scrape.py inner exception: Chrome processes terminated successfully.")
-                        except Exception as e:
-                            print("No chrome processes to kill (line 298)")
+                                try:
+                                    result = future.result()
+                                except Exception as worker_error:
+                                    if isinstance(worker_error, BrokenProcessPool) and pool is executor:
+                                        executor = replace_executor(executor, num_processes)
+                                    # Worker died mid-crawl: keep the pages it spilled to disk
+                                    result = recover_site(url, spill_file)
+                                    if result is None:
+                                        raise worker_error
+                                test_root = result["root"]
+                                record_site(result, message, uploader, stats, formatted_datetime, test_mode)
+                                remove_text_file(result)
+                            except BrokenProcessPool as pool_error:
+                                release_site(url, message, pool_error) # Died before spilling a page
+                            except Exception as sqs_error:
+                                record_sqs_error(sqs_error, url, message, uploader, formatted_datetime, test_mode)
 
             
+            word_counts = stats["word_counts"]
+            check_files = stats["check_files"]
+            num_success = stats["num_success"]
+            num_fail = stats["num_fail"]
+            num_bad = stats["num_bad"]
+            num_timeouts = stats["num_timeouts"]
+            # Pages served from the cache without a fetch or render, after a 304 (incremental mode)
+            cache_hit_rate = 0.0
+            unchanged_rate = 0.0 # Pages fetched again, found unchanged
+            if stats["cache_lookups"] > 0:
+                cache_hit_rate = stats["cache_hits"] / stats["cache_lookups"] * 100
+                unchanged_rate = stats["cache_unchanged"] / stats["cache_lookups"] * 100
+
             # Update process data
             end_time = time.time()
             elapsed_time = end_time - start_time
 
-            rate = (num_success/(num_success + num_fail)) * 100
+            # Runs that found the queue empty have no sites to average over
+            rate = 0.0 if num_success + num_fail == 0 else (num_success/(num_success + num_fail)) * 100
+            avg_link_duration = elapsed_time / max(link_count, 1)
             rate_string = str(rate) + "%"
 
             # Local data tracking
             with open(process_file, 'w') as p:
                 p.write(f"Script completed in {elapsed_time:.2f} seconds for {link_count} links\n")
-                p.write(f"Average time per link: {(elapsed_time/link_count):.2f} seconds\n")
+                p.write(f"Average time per link: {avg_link_duration:.2f} seconds\n")
                 p.write("Success " + str(num_success) + "\n")
                 p.write("Fail " + str(num_fail) + "\n")
                 p.write("Bad Links " + str(num_bad) + "\n")
                 p.write("Rate: " + str(rate) + "\n")
                 p.write(f"Number of timeouts: {num_timeouts}")
+                p.write(f"\nCache hit rate: {cache_hit_rate:.1f}% of {stats['cache_lookups']} pages\n")
+                p.write(f"Unchanged after refetch: {unchanged_rate:.1f}%\n")
                 p.write("Links to check:\n")
                 if len(check_files) == 0:
                     p.write((f"No files to check\n"))
@@ -373,20 +662,24 @@ def main(sqs_name, number_links, test_mode=False, test_url=None):
             time_data = {
                 "num_links": link_count,
                 "total_duration": elapsed_time,
-                "avg_link_duration": (elapsed_time/link_count)
+                "avg_link_duration": avg_link_duration,
+                "cache_hit_rate": cache_hit_rate,
+                "cache_unchanged_rate": unchanged_rate
             }
             num_threads = config.NUM_THREADS
-            bucket.put_object(Body = json.dumps(time_data), Key = (f'thread_data/{num_threads}thread/duration/{formatted_datetime}.json'))
+            uploader.put_object(Body = json.dumps(time_data), Key = (f'thread_data/{num_threads}thread/duration/{formatted_datetime}.json'))
 
             if not test_mode:
                 # Output process data to terminal
                 print(f"Script completed in {elapsed_time:.2f} seconds for {link_count} links")
-                print(f"Average time per link: {(elapsed_time/link_count):.2f} seconds")
+                print(f"Average time per link: {avg_link_duration:.2f} seconds")
                 print("Success", num_success)
                 print("Fail", num_fail)
                 print("Bad Links", num_bad)
                 print("Rate:", rate)
                 print(f"Number of timeouts: {num_timeouts}")
+                print(f"Cache hit rate: {cache_hit_rate:.1f}% of {stats['cache_lookups']} pages")
+                print(f"Unchanged after refetch: {unchanged_rate:.1f}%")
                 print(f"Links to check:")
                 if len(check_files) == 0:
                     print(f"No files to check")
@@ -401,9 +694,31 @@ def main(sqs_name, number_links, test_mode=False, test_url=None):
     except Exception as e:
         logging.error(f"An error occurred at {formatted_datetime}: {str(e)}", exc_info=True)
         subprocess.run(["killall", "chrome"], check=True)
+    finally:
+        metadata_syncer.stop() # Uploads metadata still pending
+        stats["metadata_index"].close()
+        # Counts since the last interval upload, then the merged rate of all processes
+        if stats["success_counter"].flush():
+            try:
+                write_summary(bucket)
+            except Exception as e:
+                logging.error(f"success rate summary not written: {str(e)}")
+        slot_lock.close()
+        if executor is not None:
+            executor.shutdown()
+        else:
+            driver_pool.close()
+            sampler.stop()
+            if seen_store is not None:
+                seen_store.close()
+        uploader.flush() # Uploads queued for the last sites, which settle their SQS messages
+        if consumer is not None:
+            consumer.close() # Deletes still batched, unused messages back to the queue
+        if uploader.failed > 0:
+            logging.error(f"{uploader.failed} S3 uploads failed after retries")
 
     if test_mode:
-        return word_counts[queue.root], elapsed_time
+        return word_counts[test_root], elapsed_time
 
 # Fetch command line arguments        
 if __name__ == "__main__":
@@ -0,0 +1,234 @@
+import os
+import math
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import logging
+import threading
+from . import config
+
+from contextlib import contextmanager
+
+
+SEEN_STORE_PATH = config.SEEN_STORE_PATH # File prefix of the store, "" to disable
+SEEN_STORE_CAPACITY = config.SEEN_STORE_CAPACITY # Max urls stored, fixes file sizes
+# The store is only read to serve recent crawls from the page cache, so it is only kept when that can happen
+SEEN_STORE_ENABLED = bool(SEEN_STORE_PATH) and config.RECRAWL_AFTER > 0 and config.INCREMENTAL
+MAX_LOAD = 0.75 # Table slots per stored url = 1 / MAX_LOAD
+BLOOM_ERROR_RATE = 0.01 # False positive rate of the Bloom filter at capacity
+
+HEADER = struct.Struct("<8sQQ") # magic, capacity, number of urls stored
+RECORD = struct.Struct("<QIQ") # url key (0 = empty slot), last crawl (epoch seconds), content hash
+MAGIC = b"SEENURL1"
+
+
+def url_key(url):
+    """
+    64-bit hash of a url, its key in the table (never 0, which marks an
+    empty slot)
+    """
+    return struct.unpack("<Q", hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest())[0] or 1
+
+
+def content_hash(text):
+    """
+    64-bit hash of a page's text
+
+    Inputs: text (list) - words on page
+    Returns: int
+    """
+    return struct.unpack("<Q", hashlib.blake2b(" ".join(text).encode("utf-8"), digest_size=8).digest())[0]
+
+
+def open_mapped(path, size):
+    """
+    Open (creating if needed) a file of exactly size bytes and map it.
+    New files are sparse, so unused space takes no disk or memory.
+
+    Returns: (file, mmap) (tuple)
+    """
+    f = open(path, "a+b")
+    if os.fstat(f.fileno()).st_size != size:
+        f.truncate(size)
+    return (f, mmap.mmap(f.fileno(), size))
+
+
+class BloomFilter:
+    """
+    Bit array in a memory-mapped file, sized for capacity entries at
+    BLOOM_ERROR_RATE false positives
+
+    Inputs:
+    path (string): Bit array file; capacity (int): Number of entries
+    """
+
+    def __init__(self, path, capacity):
+        self.num_bits = max(64, int(-capacity * math.log(BLOOM_ERROR_RATE) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.size = (self.num_bits + 7) // 8
+        existed = os.path.exists(path)
+        self.is_new = not existed or os.path.getsize(path) != self.size
+        self.file, self.bits = open_mapped(path, self.size)
+        if existed and self.is_new:
+            self.bits[:] = bytes(self.size) # Resized: stale bits would be meaningless
+
+
+    def positions(self, key):
+        """
+        Bit positions of a 64-bit key, by double hashing with its two halves
+        """
+        first, second = key & 0xFFFFFFFF, (key >> 32) | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+
+    def might_contain(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+    def close(self):
+        self.bits.close()
+        self.file.close()
+
+
+class SeenStore:
+    """
+    On-disk record of every url crawled, kept across runs: url (canonical
+    form) -> last crawl time and hash of the page text. Urls are stored as
+    64-bit keys in a fixed-size open-addressing table in a memory-mapped file
+    (<path>.table), with a Bloom filter (<path>.bloom) in front so lookups of
+    unseen urls never touch the table. Both files are sized by capacity when
+    created, so memory use stays fixed however many urls are stored.
+
+    Safe to share between threads, and between processes through file locks,
+    so all worker processes can use one store.
+
+    Inputs:
+    (optional) path (string): File prefix of the store
+    (optional) capacity (int): Max urls stored; an existing store keeps its own capacity
+    """
+
+    def __init__(self, path=SEEN_STORE_PATH, capacity=SEEN_STORE_CAPACITY):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        table_path = path + ".table"
+        if os.path.exists(table_path) and os.path.getsize(table_path) >= HEADER.size:
+            with open(table_path, "rb") as f:
+                magic, stored_capacity, _ = HEADER.unpack(f.read(HEADER.size))
+            if magic == MAGIC:
+                capacity = stored_capacity
+        self.capacity = capacity
+        self.slots = math.ceil(capacity / MAX_LOAD)
+        self.file, self.table = open_mapped(table_path, HEADER.size + self.slots * RECORD.size)
+        self.lock = threading.Lock() # flock does not exclude threads sharing the file
+        self.full_warned = False
+
+        with self.locked(fcntl.LOCK_EX):
+            if HEADER.unpack_from(self.table, 0)[0] != MAGIC:
+                HEADER.pack_into(self.table, 0, MAGIC, capacity, 0)
+            self.bloom = BloomFilter(path + ".bloom", capacity)
+            if self.bloom.is_new and len(self) > 0:
+                self.rebuild_bloom()
+
+
+    @contextmanager
+    def locked(self, operation):
+        """
+        Hold the thread lock and a file lock (fcntl.LOCK_SH or LOCK_EX) on the table
+        """
+        with self.lock:
+            fcntl.flock(self.file.fileno(), operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+
+    def find(self, key):
+        """
+        Linear probe for key from its home slot
+
+        Returns: (offset, record) (tuple) - record is None if key is absent,
+        offset is then the empty slot where it would go (None if table is full)
+        """
+        slot = key % self.slots
+        for _ in range(self.slots):
+            offset = HEADER.size + slot * RECORD.size
+            record = RECORD.unpack_from(self.table, offset)
+            if record[0] == key:
+                return (offset, record)
+            if record[0] == 0:
+                return (offset, None)
+            slot = (slot + 1) % self.slots
+        return (None, None)
+
+
+    def get(self, url):
+        """
+        Last crawl of url
+
+        Returns: (crawled_at, content_hash) (tuple), or None if never crawled
+        """
+        key = url_key(url)
+        if not self.bloom.might_contain(key):
+            return None
+        with self.locked(fcntl.LOCK_SH):
+            _, record = self.find(key)
+        return None if record is None else record[1:]
+
+
+    def record(self, url, page_hash, crawled_at=None):
+        """
+        Store a crawl of url, replacing any earlier one
+
+        Inputs:
+        url (string); page_hash (int) - content_hash() of page text;
+        (optional) crawled_at (float) - defaults to now
+
+        Returns: boolean - False if the store is full and url was not stored
+        """
+        key = url_key(url)
+        crawled_at = int(time.time() if crawled_at is None else crawled_at)
+        with self.locked(fcntl.LOCK_EX):
+            offset, record = self.find(key)
+            if record is None:
+                _, capacity, count = HEADER.unpack_from(self.table, 0)
+                if offset is None or count >= capacity:
+                    if not self.full_warned:
+                        logging.warning(f"seen_store: store is full ({capacity} urls), new urls are not recorded")
+                        self.full_warned = True
+                    return False
+                HEADER.pack_into(self.table, 0, MAGIC, capacity, count + 1)
+                self.bloom.add(key)
+            RECORD.pack_into(self.table, offset, key, crawled_at, page_hash)
+        return True
+
+
+    def rebuild_bloom(self):
+        """
+        Refill the Bloom filter from the table, after its file was lost or
+        created. Called with the table locked.
+        """
+        with memoryview(self.table) as view:
+            for key, _, _ in RECORD.iter_unpack(view[HEADER.size:HEADER.size + self.slots * RECORD.size]):
+                if key != 0:
+                    self.bloom.add(key)
+
+
+    def __len__(self):
+        return HEADER.unpack_from(self.table, 0)[2]
+
+
+    def close(self):
+        self.table.flush()
+        self.table.close()
+        self.file.close()
+        self.bloom.close()
@@ -0,0 +1,121 @@
+import struct
+import hashlib
+from . import config
+
+from collections import Counter
+from functools import lru_cache
+
+
+NEAR_DUPLICATE_DISTANCE = config.NEAR_DUPLICATE_DISTANCE # Max differing bits for near-duplicate pages, -1 to disable
+FINGERPRINT_BITS = 64
+MIN_WORDS = 20 # Pages with fewer words are too short to fingerprint reliably
+SHINGLE_SIZE = 3 # Words per shingle: runs of words, not single words, are what pages are compared on
+TOKEN_CACHE_SIZE = 262144 # Shingle hashes memoized per process, mostly site boilerplate repeated across pages
+BYTES_WITH_BIT = [[byte for byte in range(256) if byte >> bit & 1] for bit in range(8)]
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def token_hash(token):
+    """
+    Stable 64-bit hash of a shingle (not Python's hash(), which changes per process)
+    """
+    return struct.unpack("<Q", hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest())[0]
+
+
+def fingerprint(words):
+    """
+    SimHash of a page: each bit is set if most of the page's shingles (runs
+    of SHINGLE_SIZE words, weighted by count) have that bit set in their
+    hash. Pages sharing most of their text get fingerprints differing in few
+    bits. Shingles keep word order, so distinct pages drawing on the same
+    vocabulary, or sharing navigation and footer text, stay far apart.
+
+    Inputs: words (list) - page text
+    Returns: int - 64-bit fingerprint, or None if the page is too short
+    """
+    if len(words) < MIN_WORDS:
+        return None
+    # Tally shingle counts per byte value of each hash byte, then expand to bits:
+    # 8 additions per shingle instead of 64
+    words = [word.lower() for word in words]
+    shingles = Counter(" ".join(words[start:start + SHINGLE_SIZE])
+                       for start in range(len(words) - SHINGLE_SIZE + 1))
+    byte_counts = [[0] * 256 for _ in range(FINGERPRINT_BITS // 8)]
+    total = 0
+    for shingle, count in shingles.items():
+        value = token_hash(shingle)
+        total += count
+        for counts in byte_counts:
+            counts[value & 0xFF] += count
+            value >>= 8
+    result = 0
+    for index, counts in enumerate(byte_counts):
+        for bit in range(8):
+            weight = sum(counts[byte] for byte in BYTES_WITH_BIT[bit])
+            if 2 * weight > total:
+                result |= 1 << (index * 8 + bit)
+    return result
+
+
+def hamming(a, b):
+    """
+    Number of bits that differ between two fingerprints
+    """
+    return bin(a ^ b).count("1")
+
+
+class FingerprintIndex:
+    """
+    Fingerprints of one site's pages, searchable for near-duplicates. A
+    fingerprint is split into distance + 1 bands; two fingerprints within
+    distance bits of each other must agree on at least one band, so only
+    fingerprints sharing a band are compared.
+
+    Inputs:
+    (optional) distance (int): Max differing bits for pages to be near-duplicates
+    """
+
+    def __init__(self, distance=NEAR_DUPLICATE_DISTANCE):
+        self.distance = distance
+        num_bands = distance + 1
+        width, extra = divmod(FINGERPRINT_BITS, num_bands)
+        self.bands = [] # (shift, mask) of each band
+        shift = 0
+        for band in range(num_bands):
+            band_width = width + (1 if band < extra else 0)
+            self.bands.append((shift, (1 << band_width) - 1))
+            shift += band_width
+        self.tables = [{} for _ in self.bands] # band value -> fingerprints
+        self.size = 0
+
+
+    def find(self, value):
+        """
+        A stored fingerprint within distance bits of value
+
+        Returns: int, or None if value has no near-duplicate
+        """
+        for (shift, mask), table in zip(self.bands, self.tables):
+            for candidate in table.get((value >> shift) & mask, ()):
+                if hamming(candidate, value) <= self.distance:
+                    return candidate
+        return None
+
+
+    def add(self, value):
+        for (shift, mask), table in zip(self.bands, self.tables):
+            table.setdefault((value >> shift) & mask, []).append(value)
+        self.size += 1
+
+
+    def is_duplicate(self, value):
+        """
+        True if value is a near-duplicate of a stored fingerprint; otherwise
+        value is stored. None (page too short to fingerprint) is never a duplicate.
+        """
+        if value is None:
+            return False
+        if self.find(value) is not None:
+            return True
+        self.add(value)
+        return False
@@ -1,7 +1,6 @@
 import selenium
 import time
 import random
-import tldextract
 import nltk
 import threading
 from . import utils as ut
@@ -10,59 +9,42 @@ import multiprocessing as mp
 import tracemalloc
 import subprocess
 import datetime
-import signal
 import logging
 import boto3
 from . import config
-from contextlib import contextmanager
 
 ###
-from .minheap import MinHeap
-from .thread import ScannerThread
+from .frontier import Frontier
+from .canonicalize import canonical_url
+from .thread import ScannerThread, extract_page, load_page
+from .deadline import Deadline, TimeoutException
+from .driver_pool import DriverPool
+from .resource_monitor import ResourceSampler, memory_percent
+from .seen_store import SeenStore, SEEN_STORE_ENABLED, content_hash
+from .page_cache import PageCache, INCREMENTAL
+from .simhash import FingerprintIndex, fingerprint, hamming, NEAR_DUPLICATE_DISTANCE
+from .token_store import TokenStore
+from .spill import PageSpill, SPILL_PAGES, spill_path
+from .language import LANGUAGE_GATE
+from .uploader import shared_uploader
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from urllib.parse import urlparse
 
 
 # CONFIGURE AWS PROFILE USING config.py #
 S3_PROFILE = config.S3_PROFILE
 S3_SESSION = config.S3_SESSION
 BUCKET_NAME = config.BUCKET_NAME
-S3_RESOURCE = S3_SESSION.resource('s3')
-BUCKET = S3_RESOURCE.Bucket(BUCKET_NAME)
 
 # CONFIGURE LOGGING TO TIMEOUT.LOG
 logging.basicConfig(filename='timeout.log', level=logging.WARN)
 
 
-class TimeoutException(Exception):
-    """
-    Class used to create a timeout signal below
-    """
-    pass
-
-@contextmanager
-def time_limit(seconds):
-    """
-    Enforces a time limit with a signal interrupt. Used to raise "TimeoutException"
-    if process exceeds a time threshold. Used to limit time spent on each link/site
-
-    Inputs:
-    seconds (int): Timeout threshold in seconds
-
-    Raises: TimeoutExcecption
+JOIN_GRACE = 10 # Seconds past the deadline to wait for threads to finish their page
+CANONICAL_DISTANCE = max(NEAR_DUPLICATE_DISTANCE, 3) # Max SimHash bits a page may differ from its canonical page and be dropped
 
-    Returns: None
-    """
-    def signal_handler(signum, frame):
-        raise TimeoutException("Timed out!")
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
-        
 
 class SmartQueue:
     """
@@ -71,23 +53,45 @@ class SmartQueue:
     with ChromeDrivers to scan the site by adding all new links found for each page
     in the site. 
 
-    The class uses a MinHeap FIFO queue structure to order and prioritize new pages to 
+    The class uses a Frontier priority queue to order and prioritize new pages to 
     visit. Threads access the queue using a mutex locking system on the queue
 
     SmartQueue tracks CPU/RAM performance data while scanning, and uploads this data
-    continually to S3 bucket. The class enforces a timeout limit using  TimeoutException 
-    created above to ensure scraper does not spend too much time on site
+    continually to S3 bucket. The class enforces a timeout limit using a Deadline
+    shared by all threads to ensure scraper does not spend too much time on site.
+    Text from pages scanned before the deadline is kept.
 
     Inputs:
     root (str): A url to a webpage (preferably home page) to begin scanning from. 
     (optional) num_threads (int): Number of threads to be deployed on site
     (optional) max_links (int): Maximum number of pages to visit within site
+    (optional) driver_pool (DriverPool): Process-wide pool to lease Chrome drivers 
+    from. A private pool is created (and closed after the scan) if none is given
+    (optional) sampler (ResourceSampler): Running process-wide CPU/RAM sampler. 
+    A private sampler is started (and stopped after the scan) if none is given
+    (optional) seen_store (SeenStore): Process-wide store of urls crawled by earlier
+    runs. A private store is opened (and closed after the scan) if none is given
+    and the store is enabled (see seen_store.SEEN_STORE_ENABLED)
+    (optional) uploader (Uploader): Background S3 uploader, defaults to the process-wide one
+    (optional) spill_file (str): File for the text of pages as they are scanned, a new one
+    if not given (see spill.spill_path()); the site's text file is written next to it
     """
     
-    def __init__(self, root, num_threads=config.NUM_THREADS, max_links=config.MAX_PAGES):
+    def __init__(self, root, num_threads=config.NUM_THREADS, max_links=config.MAX_PAGES, driver_pool=None,
+                 sampler=None, seen_store=None, uploader=None, spill_file=None):
         # Setup
-        self.queue = MinHeap(max_links + 20) # MinHeap class acts as queue
+        self.owns_seen_store = seen_store is None and SEEN_STORE_ENABLED
+        self.seen_store = SeenStore() if self.owns_seen_store else seen_store
+        self.uploader = uploader # Process-wide uploader is used if None
+        self.queue = Frontier(self.seen_store, config.RECRAWL_AFTER) # Frontier priority queue acts as queue
+        self.page_cache = None # Pages from last crawl of site, loaded once home domain is known (incremental mode)
+        self.fingerprints = None # SimHash of each page scanned, to detect near-duplicate pages
+        if NEAR_DUPLICATE_DISTANCE >= 0:
+            self.fingerprints = FingerprintIndex(NEAR_DUPLICATE_DISTANCE)
+        self.page_fingerprints = {} # Url -> SimHash of the page scanned for it (or standing in for it)
         self.root = root # Root url
+        self.root_link = root # Canonical url of root page, once loaded
+        self.scheme = None # Scheme the root page was served with; links are folded into it
         self.redirect = False # True if root url redirects to new url
         self.home_domain = '' # Root url, or redirected root url
         self.max_links = max_links # Limit number of links to be visited
@@ -96,16 +100,23 @@ class SmartQueue:
         self.original_links = [] # Links found on root URL
         self.new_link_count = 0 # Number of additional links found through scan
         self.num_threads = num_threads # Specified number of threads
+        self.owns_driver_pool = driver_pool is None
+        self.driver_pool = DriverPool(num_threads + 1) if self.owns_driver_pool else driver_pool
+        self.owns_sampler = sampler is None
+        self.sampler = ResourceSampler() if self.owns_sampler else sampler
         self.scanner_threads = self.generate_threads() # ScannerThread objects
         self.queue_lock = threading.Lock() # Lock for accesing links from queue
+        self.queue_ready = threading.Condition(self.queue_lock) # Signals new links or finished pages
+        self.in_flight = 0 # Number of pages currently being scanned by threads
         self.english = True # Site is in English if True
         self.complete = False # True when site scan has een completed 
         self.timeout_limit = config.SITE_TIME_LIMIT # Time limit to scan entire site (sec)
+        self.deadline = None # Deadline for entire site, set when scan starts
 
         # Data collection
         self.total_words = 0 
         self.pages_visited = 0
-        self.text = []
+        self.duplicate_pages = 0 # Pages dropped as (near-)duplicates of pages already scanned
         self.timeout = False # True if website exceeds timeout limit
         self.start_time = None # Time at which scanning starts
 
@@ -118,6 +129,9 @@ class SmartQueue:
         directory_path = os.path.join(os.getcwd(), subdirectory_name, formatted_date)
         self.error_file = os.path.join(directory_path, "errors", f"{formatted_datetime}.txt")
         self.cpu_file = os.path.join(directory_path, "cpu_ram", f"{formatted_datetime}.csv")
+        self.spill_file = spill_file or spill_path(root) # Pages as scanned, one file per crawl
+        self.text_file = os.path.splitext(self.spill_file)[0] + ".txt" # Site text for upload
+        self.text = PageSpill(self.spill_file) if SPILL_PAGES else TokenStore() # Text of each page
         self.formatted_datetime = formatted_datetime
 
 
@@ -134,48 +148,57 @@ class SmartQueue:
         Calls: generate_links(), populate_queue(), visit_all_links()
         """
         self.start_time = time.time()
+        self.deadline = Deadline(self.timeout_limit)
+        if self.owns_sampler:
+            self.sampler.start()
         try:
             # Outputs for debugging/progress tracking
             print(f"Starting new link: {self.root}")
-            command = "free | grep Mem | awk '{print $3/$2 * 100.0}'"
-            output = subprocess.check_output(command, shell=True)
             print(f"Initial memory check for {self.root} (%RAM):")
-            print(output.decode('utf-8'))
+            print(memory_percent())
 
             links = self.generate_links() # Generate all links from root url
             if self.timeout:
-                # Scan has timed out - kill lingering processes and return
-                subprocess.run(["killall", "chrome"], check=True)
-                print("smart_queue: Chrome processes terminated successfully.")
+                # Scan has timed out - root page driver was discarded by generate_links
                 return
 
             # If no links generated, end, investigate further
             if len(self.original_links) == 0: 
                 print("No links found, please investigate")
                 print(f"Final memory check for {self.root} (%RAM):")
-                print(output.decode('utf-8'))
+                print(memory_percent())
                 return
                 
             self.populate_queue(links) # Add root links to queue
             self.visit_all_links() # Visit root links, find new ones, continue recursively through site
+            if self.page_cache is not None:
+                self.page_cache.save() # Cached plus fresh pages, for the next crawl
 
             # Outputs for debugging/progress tracking
             print(f"Final memory check for {self.root} (%RAM):")
-            print(output.decode('utf-8'))
+            print(memory_percent())
 
-
-            # Send performance data to S3
+            # Send performance data to S3, from samples taken during this scan
+            self.sampler.write_csv(self.cpu_file, self.start_time)
             with open(self.cpu_file, 'rb') as f:
                 csv_data = f.read()
             # Upload the CSV
             bucket_key = 'thread_data/' + str(self.num_threads) + 'thread/cpu_ram/' + self.formatted_datetime + '.csv'
-            BUCKET.put_object(Body = csv_data, Key = (bucket_key))
+            (self.uploader or shared_uploader()).put_object(Body = csv_data, Key = (bucket_key)) # Sent in the background
 
         # Exception occurred
         except Exception as e:
             print("smart_queue: exception in run_all()")
             with open(self.error_file, "w") as f:
                 f.write(str(e) + "\n")
+        finally:
+            if self.owns_driver_pool:
+                self.driver_pool.close()
+            if self.owns_sampler:
+                self.sampler.stop()
+            if self.owns_seen_store:
+                self.seen_store.close()
+            self.text.close() # Pages written so far stay readable
 
 
     def generate_links(self):
@@ -189,56 +212,74 @@ class SmartQueue:
 
         Updates: 
         self.home_domain, self.redirect, self.original_links, 
-        self.original_link_count
+        self.original_link_count, self.scheme, self.root_link, self.page_cache
 
         Calls: 
-        utils.create_driver(), english_site(), utils.extract_link_domain(),
-        utils.clean_link()
+        DriverPool.acquire(), thread.load_page(), thread.extract_page(), english_site(), 
+        canonical(), utils.extract_link_domain(), utils.filter_links()
         """
 
         links = [] # List to store links
+        lease = None
+        failed = False # True if driver must be discarded rather than reused
+        if self.deadline is None:
+            self.deadline = Deadline(self.timeout_limit)
+        root_deadline = self.deadline.child(config.INITIAL_SCAN_TIME_LIMIT)
         try:
-            with(time_limit(config.INITIAL_SCAN_TIME_LIMIT)):
-                links.append(self.root)
-                driver, header_index = ut.create_driver() # Create a driver for linux operation
-                driver.get(self.root) # Visit root url
-
-                # Ensure site is English
-                if not self.english_site(driver):
-                    self.english = False
-                    print("Non-english site detected")
-                    home_domain = ut.extract_link_domain(driver.current_url)
-                    self.home_domain = home_domain
-                    return
-                
-                # Begin scanning, or find errors
-                try:
-                    # Create list of all link elements, and search for redirects
-                    results = driver.find_elements(By.TAG_NAME, "a") 
-                    home_domain = ut.extract_link_domain(driver.current_url)
-                    root_domain = ut.extract_link_domain(self.root)
-                    # Check for redirect - root url domain != driver domain
-                    if home_domain != root_domain:
-                        self.redirect = True
-                    self.home_domain = home_domain # Update home_domain attribute
-
-                    # Iterate through all result elements and extract href link
-                    for element in results:
-                        link = element.get_attribute("href") # Get link from element
-                        link_domain = ut.extract_link_domain(link) # Get domain from link
-                        if ut.passes_link_conditions(link) and (self.home_domain == link_domain):
-                            # Is a valid, non-external link
-                          #  print("new link found")
-                            links.append(ut.clean_link(link)) # Update links
-                # Process any errors
-                except Exception as e:
-                    print("error in smart_queue (line 179)", e)
-                    with open(self.error_file, "w") as f:
-                        f.write(str(e) + "\n")
+            lease = self.driver_pool.acquire() # Lease a warmed driver
+            driver = lease.driver
+            loaded = load_page(driver, self.root, root_deadline) # Visit root url
+            lease.pages += 1
+            page = extract_page(driver) # Text, links and metadata in one round-trip
+            if not loaded and len(page["links"]) == 0:
+                # Root page timed out before any links rendered
+                raise TimeoutException("Timed out!")
+
+            # Links on site are folded into the scheme the root page was served with
+            scheme = urlparse(driver.current_url).scheme
+            if scheme in ("http", "https"):
+                self.scheme = scheme
+                self.root_link = self.canonical(driver.current_url)
+            links.append(self.root_link)
+
+            # Ensure site is English
+            if not self.english_site(page, ut.extract_link_domain(driver.current_url)):
+                self.english = False
+                print("Non-english site detected")
+                home_domain = ut.extract_link_domain(driver.current_url)
+                self.home_domain = home_domain
+                return
+            
+            # Begin scanning, or find errors
+            try:
+                # Search for redirects
+                home_domain = ut.extract_link_domain(driver.current_url)
+                root_domain = ut.extract_link_domain(self.root)
+                # Check for redirect - root url domain != driver domain
+                if home_domain != root_domain:
+                    self.redirect = True
+                self.home_domain = home_domain # Update home_domain attribute
+                if INCREMENTAL:
+                    self.page_cache = PageCache(home_domain)
+
+                # Keep valid, non-external links found on page
+                links.extend(ut.filter_links(page["links"], self.unseen_links))
+            # Process any errors
+            except Exception as e:
+                print("error in smart_queue (line 179)", e)
+                with open(self.error_file, "w") as f:
+                    f.write(str(e) + "\n")
         except TimeoutException:
             print("The function timed out!")
             logging.error("The function timed out! - link generation")
             self.timeout = True
+            failed = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if lease is not None:
+                self.driver_pool.release(lease, failed)
                 
         result = list(set(links)) # Remove duplicates from list
         self.original_link_count = len(result)
@@ -265,7 +306,7 @@ class SmartQueue:
         queue = self.queue
         priority = 1
         for link in links:
-            if link == self.root:
+            if link == self.root_link:
                 queue.insert(0, link)
             else:
                 queue.insert(priority, link)
@@ -284,44 +325,48 @@ class SmartQueue:
         Updates: None (calls run_thread)
         Calls: run_thread
         """
-        start_time = self.start_time
-
-        try:
-            with(time_limit(config.SITE_TIME_LIMIT)):
-                for scanner_thread in self.scanner_threads:
-                    scanner_thread.thread = threading.Thread(target=self.run_thread, args=(scanner_thread,))
-                    scanner_thread.thread.start()
-        # The following commented-out section uses # for each line.
-                while time.time() - start_time < self.timeout_limit:
-                    if self.complete:
-                        break
-                    time.sleep(1)  # Sleep to prevent a busy loop
-        # # If timeout is reached, signal threads to stop
-                if time.time() - start_time >= self.timeout_limit:
-                    self.timeout = True
-                    for scanner_thread in self.scanner_threads:
-                        scanner_thread.driver.quit()
-                        logging.error("timeout - via innner logic in thread")
-                        return
-        except TimeoutException:
-            print("The function timed out! - TimeoutException in thread \n")
-            logging.error("The function timed out! - TimeoutException in thread \n")
-            self.timeout = True
+        if self.deadline is None:
+            self.deadline = Deadline(self.timeout_limit)
+        deadline = self.deadline
 
         for scanner_thread in self.scanner_threads:
-            scanner_thread.thread.join()
-            scanner_thread.driver.quit()
+            scanner_thread.page_cache = self.page_cache # Unchanged pages served from cache if set
+            scanner_thread.recently_crawled = self.queue.recently_crawled # Recent crawls served from cache
+            scanner_thread.running = True
+            scanner_thread.abandoned = False
+            scanner_thread.thread = threading.Thread(target=self.run_thread, args=(scanner_thread,))
+            scanner_thread.thread.start()
+        with self.queue_ready:
+            # Woken by threads as pages finish, until complete or out of time
+            self.queue_ready.wait_for(lambda: self.complete, timeout=deadline.remaining())
+            if not self.complete:
+                # Deadline reached: threads finish their current page, then stop
+                print("The function timed out! - deadline reached in thread \n")
+                logging.error("timeout - via innner logic in thread")
+                self.timeout = True
+                self.queue_ready.notify_all() # Release threads waiting for links
 
-        command = "free | grep Mem | awk '{print $3/$2 * 100.0}'"
-        output = subprocess.check_output(command, shell=True)
+        for scanner_thread in self.scanner_threads:
+            # Page loads are bounded by the deadline, so threads end shortly after it
+            scanner_thread.thread.join(timeout=deadline.remaining() + JOIN_GRACE)
+            with self.queue_ready:
+                # Thread stuck mid-page still uses its driver and session: it releases them itself
+                # when its page returns (see run_thread)
+                scanner_thread.abandoned = scanner_thread.running
+            if not scanner_thread.abandoned:
+                scanner_thread.quit()
 
     def run_thread(self, scanner_thread):
         """
-        Scan a single link. A single link is removed from the queue and given
-        to a scanner thread, which then processes the text and all links 
-        within a given link. The queue is updated with new links and data.
+        Scan links until the site is complete. A single link is removed from 
+        the queue and given to a scanner thread, which then processes the text 
+        and all links within a given link. The queue is updated with new links 
+        and data.
 
-        Locking system ensures only one link taken at a time
+        The lock only guards the queue and result bookkeeping; pages are 
+        scanned with the lock released so threads run concurrently. A thread
+        that finds the queue empty waits while other threads are still 
+        scanning, since they may discover new links.
 
         Inputs: 
         scanner_thread (ScannerThread object)
@@ -329,40 +374,87 @@ class SmartQueue:
         Returns: None
 
         Updates: 
-        self.queue, self.visited_links, self.text, self.pages_visited
+        self.queue, self.visited_links, self.text, self.pages_visited,
+        self.in_flight, self.complete, self.duplicate_pages,
+        scanner_thread.running
 
         Calls: 
         SmartQueue.is_empty(), SmartQueue.remove_next(), 
-        continue_link_gathering(), process_new_links()
+        continue_link_gathering(), process_new_links(), duplicate_of_canonical(),
+        simhash.fingerprint(), FingerprintIndex.is_duplicate()
         """
 
         while True:
             new_links = []
             text = []
 
-            with self.queue_lock: # Acquire lock to prevent duplicate link access
-                if self.queue.is_empty():
+            with self.queue_ready: # Acquire lock to prevent duplicate link access
+                while self.queue.is_empty() and self.in_flight > 0 and not self.deadline.expired():
+                    self.queue_ready.wait(timeout=self.deadline.remaining()) # Another thread may still add links
+                if self.deadline.expired():
+                    self.timeout = True
+                if self.queue.is_empty() or self.timeout:
                     self.complete = True
+                    self.queue_ready.notify_all() # Wake waiting threads so they exit
                     break # No more links to visit; end loop
                 _, link = self.queue.remove_next()  # Unpack link from queue
-                # Scan page with a scanning thread, unpack resulting text and links
-                try:
-                    text, new_links = scanner_thread.scan_page(link, self.continue_link_gathering(), self.cpu_file)
-                except Exception as e:
-                    print("error in smart queue")
-                    print(e)
-                    with open(self.error_file, "w") as f:
-                        f.write(str(e) + "\n")
-            # Outside of loop, release lock and process results of link
-            if len(new_links) != 0: 
-                # Process newly acquired links and add them to queue
-                self.process_new_links(new_links) 
-            
-            # Update data
-            self.text.append(text) # Add new text to array
-            self.total_words += len(text) # Update word count
-            self.pages_visited += 1 # Update page visit count
-            self.visited_links.append(link) # Update visited links array
+                continue_link_gathering = self.continue_link_gathering()
+                self.in_flight += 1
+
+            # Scan page with lock released, unpack resulting text and links
+            self.sampler.page_started(link)
+            canonical = ""
+            try:
+                text, new_links, canonical = scanner_thread.scan_page(link, continue_link_gathering,
+                                                                      self.unseen_links, self.deadline)
+                if self.seen_store is not None and self.queue.recently_crawled(link) is None:
+                    # Remembered by later runs; a recent crawl keeps its time, so it is refetched once it expires
+                    self.seen_store.record(link, content_hash(text))
+            except Exception as e:
+                print("error in smart queue")
+                print(e)
+                with open(self.error_file, "w") as f:
+                    f.write(str(e) + "\n")
+            self.sampler.page_finished(link)
+            honor_canonical = bool(canonical) and config.HONOR_CANONICAL
+            page_fingerprint = None
+            if self.fingerprints is not None or honor_canonical:
+                page_fingerprint = fingerprint(text)
+
+            with self.queue_ready:
+                if honor_canonical and self.duplicate_of_canonical(link, canonical, page_fingerprint):
+                    # Same page as one already scanned, under another url: drop its text, but
+                    # follow its links in case the canonical tag is wrong about more than the text
+                    text = []
+                    self.duplicate_pages += 1
+                elif self.fingerprints is not None and self.fingerprints.is_duplicate(page_fingerprint):
+                    # Near-identical text to a page already scanned: keep neither its text nor its links
+                    text = []
+                    new_links = []
+                    self.duplicate_pages += 1
+                if page_fingerprint is not None:
+                    self.page_fingerprints.setdefault(link, page_fingerprint) # Compared with pages naming it canonical
+
+                if len(new_links) != 0: 
+                    # Process newly acquired links and add them to queue
+                    self.process_new_links(new_links) 
+
+                # Update data
+                self.text.append(text, link) # Add new text to array (or spill file)
+                self.total_words += len(text) # Update word count
+                self.pages_visited += 1 # Update page visit count
+                self.visited_links.append(link) # Update visited links array
+                self.in_flight -= 1
+                self.queue_ready.notify_all()
+
+        with self.queue_ready:
+            scanner_thread.running = False
+            abandoned = scanner_thread.abandoned
+        if abandoned:
+            # visit_all_links stopped waiting for this thread: its driver overran the deadline, so
+            # it is not reused
+            scanner_thread.release_driver(failed=True)
+            scanner_thread.quit()
 
 
     def process_new_links(self, new_links):
@@ -377,26 +469,87 @@ class SmartQueue:
         Updates: Queue
 
         Calls: 
-        utils.extract_link_domain(), utils.link_in_queue(), SmartQueue.insert()
+        canonical(), utils.extract_link_domains(), 
+        Frontier.insert()
         """
 
         home_domain = self.home_domain # Home domain to check for external links
         # Below comments can be used to limit number of new links gathered per page
         count = 0 ## simple limit of new links per page 
-        for link in new_links:
+        new_links = [self.canonical(link) for link in new_links]
+        for link, link_domain in zip(new_links, ut.extract_link_domains(new_links)):
             if count > config.NEW_LINKS_PER_PAGE:
                 break
-            link_domain = ut.extract_link_domain(link)
-            if (home_domain == link_domain) and (link not in self.queue.visited) \
-            and not (ut.link_in_queue(link, self.queue)):
-                # Is a valid, non-external link not in queue or visited
+            if (home_domain == link_domain) and not self.queue.is_visited(link):
+                # Is a valid, non-external link not visited
                 directory_rank = ut.num_slashes(link) # Prioritize link by subdirectory (number of slashes)
                 priority = self.queue.size() + 1 + (100 * directory_rank) # Score by directory rank
-                self.queue.insert(priority, link) # Insert link into queue with score
-                count += 1 # Used to limit number of links
+                # Insert link into queue with score; a queued link only moves up if score is lower
+                if self.queue.insert(priority, link):
+                    count += 1 # Used to limit number of links
         self.new_link_count += count
 
 
+    def unseen_links(self, links):
+        """
+        Narrow links found on a page to those that could still be queued, so
+        visited, queued and external links are never requested. Passed to 
+        threads as the keep filter for utils.filter_links().
+
+        Inputs: links (list) - canonical links from a page
+        Returns: list of same-site links not visited or in queue, in the site's scheme
+        Updates: None
+        Calls: canonical(), utils.extract_link_domains(), Frontier.seen()
+        """
+        links = list(dict.fromkeys(self.canonical(link) for link in links))
+        domains = ut.extract_link_domains(links)
+        with self.queue_lock:
+            return [link for link, domain in zip(links, domains)
+                    if domain == self.home_domain and not self.queue.seen(link)]
+
+
+    def canonical(self, link):
+        """
+        Canonical form of a link on this site: links are folded into the 
+        scheme the root page was served with, so http:// and https:// 
+        variants of a page are queued once.
+
+        Inputs: link (string) - A url
+        Returns: string - canonical url
+        Updates: None
+        Calls: canonicalize.canonical_url()
+        """
+        return canonical_url(link, self.scheme)
+
+
+    def duplicate_of_canonical(self, link, canonical, page_fingerprint):
+        """
+        Honor a scanned page's rel=canonical url. The canonical url is marked
+        visited so it is never scanned itself, and the page stands in for it.
+        If it was already visited, the page is a duplicate only if its text
+        is a SimHash near-match of the page scanned for that url: sites that
+        point every page's canonical at the home page keep their subpages.
+        Must be called with queue_lock held.
+
+        Inputs: 
+        link (string) - scanned url; canonical (string) - its rel=canonical url;
+        page_fingerprint (int) - SimHash of the page's text
+
+        Returns: boolean - True if page duplicates a page already scanned
+        Updates: self.queue, self.page_fingerprints
+        Calls: canonical(), utils.extract_link_domain(), Frontier.mark_visited(), simhash.hamming()
+        """
+        canonical = self.canonical(canonical)
+        if ut.extract_link_domain(canonical) != self.home_domain:
+            return False
+        if canonical == link or not self.queue.is_visited(canonical):
+            self.queue.mark_visited(canonical)
+            self.page_fingerprints.setdefault(canonical, page_fingerprint)
+            return False
+        scanned = self.page_fingerprints.get(canonical) # None if scanned before this run
+        return scanned is not None and hamming(scanned, page_fingerprint) <= CANONICAL_DISTANCE
+
+
     def continue_link_gathering(self):
         """
         Simple boolean function to determine if more links should be gathered.
@@ -426,23 +579,23 @@ class SmartQueue:
 
         threads = []
         for n in range(self.num_threads):
-            threads.append(ScannerThread())
+            threads.append(ScannerThread(driver_pool=self.driver_pool))
         return threads
     
 
-    def english_site(self, driver):
+    def english_site(self, page, domain):
         """
-        Check if site is English
+        Check if site is English: trusts the root page's declared language,
+        else detects it from a sample of its words. Verdict is cached per domain.
 
-        Inputs: driver (WebDriver with inputted url)
+        Inputs: page (dict) - root page, see thread.page_result(); domain (string)
         Returns: boolean - True if site is English
         Updates: None
-        Calls: None
+        Calls: LanguageGate.site_is_english()
         """
         result = True
         try:
-            text = driver.find_element(By.XPATH, "html/body").text
-            result = ut.is_english(text)
+            result = LANGUAGE_GATE.site_is_english(domain, page)
         except Exception as e:
              with open(self.error_file, "w") as f:
                 f.write(str(e) + "\n")
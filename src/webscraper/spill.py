@@ -0,0 +1,184 @@
+import os
+import json
+import logging
+import uuid
+import datetime
+import threading
+from . import utils as ut
+from . import config
+
+
+SPILL_PAGES = config.SPILL_PAGES # Append page text to a file as pages are scanned, rather than keep it in memory
+
+
+def spill_path(root):
+    """
+    New spill file for one crawl of a site, in scraper_results/<today>/results.
+    Each call names a different file, so crawls of sites sharing a registered
+    domain never share one; the process that chose the path finds the pages
+    there even if the crawl runs past midnight or the root redirects.
+
+    Inputs: root (string) - root url of site
+    Returns: string
+    """
+    date = datetime.datetime.now().strftime("%Y-%m-%d")
+    name = f"{ut.extract_link_domain(root)}-{uuid.uuid4().hex[:12]}.ndjson"
+    return os.path.join(os.getcwd(), "scraper_results", date, "results", name)
+
+
+def read_spill(path):
+    """
+    Page records of a spill file, read line by line. A last line cut short
+    by a crash is skipped.
+
+    Returns: generator of dicts with url, count and text
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logging.warning(f"spill: skipped incomplete record in {path}")
+    except FileNotFoundError:
+        return
+
+
+class PageSpill:
+    """
+    Text of a site's pages in an append-only NDJSON file, one line per page
+    scanned: {"url": ..., "count": number of words, "text": [words]}. Each
+    line is flushed as it is written, so memory stays flat however large
+    the site is, and the pages scanned so far survive a timeout or a crash
+    of the worker process.
+
+    Reads like the list of pages it replaces: iterating reads the file
+    lazily, yielding each page as a list of words. Word and page counts are
+    kept as pages are appended.
+
+    Inputs:
+    path (string): Spill file
+    (optional) resume (boolean): Keep an existing file and append to it,
+    e.g. to read back the pages of a crashed crawl; otherwise the file is
+    started empty
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lengths = [] # Number of words on each page
+        self.lock = threading.Lock()
+        self.file = None # Opened by the first append
+        self.opened = False # True once the file was opened for this crawl
+        self.closed = False # True once closed; later appends are dropped
+        self.mode = "w"
+        if resume:
+            self.lengths = [record["count"] for record in read_spill(path)]
+            self.drop_incomplete_line()
+            self.mode = "a"
+
+
+    def drop_incomplete_line(self):
+        """
+        Cut a last line left unfinished by a crash, so appended records start
+        on a line of their own
+        """
+        try:
+            with open(self.path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+
+    def append(self, words, link=""):
+        """
+        Write a page to the file
+
+        Inputs: words (list) - page text; (optional) link (string) - url of page
+        Returns: None
+        """
+        line = json.dumps({"url": link, "count": len(words), "text": words}) + "\n"
+        with self.lock:
+            if self.closed:
+                # A thread that overran the site deadline; the site's text is already final
+                logging.warning(f"spill: page {link} dropped, {self.path} already closed")
+                return
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, self.mode, encoding="utf-8")
+                self.opened = True
+            self.file.write(line)
+            self.file.flush()
+            self.lengths.append(len(words))
+
+
+    def records(self):
+        """
+        Page records written so far, see read_spill()
+        """
+        if not self.opened and self.mode == "w":
+            return iter(()) # Nothing appended yet; any file on disk is from an earlier crawl
+        return read_spill(self.path)
+
+
+    def __iter__(self):
+        for record in self.records():
+            yield record["text"]
+
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+    def page_lengths(self):
+        """
+        Number of words on each page
+
+        Returns: list of ints
+        """
+        return list(self.lengths)
+
+
+    def word_count(self):
+        """
+        Number of words on all pages
+        """
+        return sum(self.lengths)
+
+
+    def page_count(self):
+        """
+        Number of pages with text; duplicate and failed pages are stored empty
+        """
+        return sum(1 for length in self.lengths if length != 0)
+
+
+    def count_matching(self, predicate):
+        """
+        Number of words on all pages for which predicate(word) is true,
+        reading the file once. The predicate is called once per distinct word.
+
+        Inputs: predicate (function) - word -> boolean
+        Returns: int
+        """
+        matches = {} # word -> predicate(word)
+        count = 0
+        for page in self:
+            for word in page:
+                match = matches.get(word)
+                if match is None:
+                    match = matches[word] = bool(predicate(word))
+                count += match
+        return count
+
+
+    def close(self):
+        """
+        Close the file; pages written stay readable, later appends are dropped
+        """
+        with self.lock:
+            self.closed = True
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,193 @@
+import logging
+import threading
+from . import config
+
+from collections import deque
+
+
+SQS_BATCH_SIZE = config.SQS_BATCH_SIZE # Messages received per call, at most 10
+SQS_WAIT_TIME = config.SQS_WAIT_TIME # Seconds a receive long-polls for messages
+SQS_VISIBILITY_TIMEOUT = config.SQS_VISIBILITY_TIMEOUT # Seconds a held message stays hidden from other consumers
+MAX_BATCH = 10 # SQS limit on messages per receive, delete or visibility batch
+
+
+def batches(items, size=MAX_BATCH):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ConsumedMessage:
+    """
+    SQS message held by an SQSConsumer. Reads like the boto3 Message it
+    wraps; delete() queues it for a batched delete instead of deleting it
+    right away.
+    """
+
+    def __init__(self, consumer, message):
+        self.consumer = consumer
+        self.message = message
+
+    def __getattr__(self, name):
+        return getattr(self.message, name) # body, message_attributes, receipt_handle, ...
+
+    def delete(self):
+        self.consumer.delete(self)
+
+    def release(self):
+        self.consumer.release(self)
+
+
+class SQSConsumer:
+    """
+    Reads site messages from an SQS queue: resolves the queue once, receives
+    up to 10 messages per call with long polling and buffers them locally.
+    While messages are held (buffered or being crawled), a heartbeat thread
+    extends their visibility timeout, so a site crawled past the timeout is
+    never handed to another consumer. Deletes are sent in batches.
+
+    Inputs:
+    queue - boto3 SQS Queue (or a stand-in with the same methods)
+    (optional) batch_size (int), wait_time (int), visibility_timeout (int) - see params
+    (optional) heartbeat_interval (float): Seconds between visibility extensions, a third of the timeout by default
+    """
+
+    def __init__(self, queue, batch_size=SQS_BATCH_SIZE, wait_time=SQS_WAIT_TIME,
+                 visibility_timeout=SQS_VISIBILITY_TIMEOUT, heartbeat_interval=None):
+        self.queue = queue
+        self.batch_size = min(batch_size, MAX_BATCH)
+        self.wait_time = wait_time
+        self.visibility_timeout = visibility_timeout
+        self.buffer = deque() # Received messages not handed out yet
+        self.held = {} # receipt handle -> message, for buffered and handed out messages
+        self.pending_deletes = [] # Messages done with, deleted in batches
+        self.lock = threading.Lock()
+        self.heartbeat = Heartbeat(self, heartbeat_interval or visibility_timeout / 3)
+        self.heartbeat.start()
+
+
+    def get(self, limit=MAX_BATCH):
+        """
+        Next message, receiving a batch if none are buffered. No more than
+        limit messages are received, so messages the caller will not get to
+        stay available to other consumers.
+
+        Inputs: (optional) limit (int) - messages the caller still wants
+        Returns: ConsumedMessage, or None if the queue stayed empty for wait_time
+        """
+        with self.lock:
+            if self.buffer:
+                return self.buffer.popleft()
+        messages = self.queue.receive_messages(MessageAttributeNames=['All'],
+                                               MaxNumberOfMessages=max(1, min(self.batch_size, limit)),
+                                               WaitTimeSeconds=self.wait_time,
+                                               VisibilityTimeout=self.visibility_timeout)
+        with self.lock:
+            for message in messages:
+                consumed = ConsumedMessage(self, message)
+                self.held[message.receipt_handle] = consumed
+                self.buffer.append(consumed)
+            return self.buffer.popleft() if self.buffer else None
+
+
+    def delete(self, message):
+        """
+        Mark a message done; it is deleted with the next full batch or flush()
+        """
+        with self.lock:
+            self.held.pop(message.receipt_handle, None)
+            self.pending_deletes.append(message)
+            full = len(self.pending_deletes) >= MAX_BATCH
+        if full:
+            self.flush()
+
+
+    def release(self, message):
+        """
+        Give up a message without deleting it: heartbeats stop and it is made
+        visible again at once, so the site is crawled again (by any consumer)
+        """
+        with self.lock:
+            self.held.pop(message.receipt_handle, None)
+        self.change_visibility([message], 0, "could not release message")
+
+
+    def flush(self):
+        """
+        Delete all messages marked done
+        """
+        with self.lock:
+            messages, self.pending_deletes = self.pending_deletes, []
+        for batch in batches(messages):
+            entries = [{"Id": str(n), "ReceiptHandle": message.receipt_handle} for n, message in enumerate(batch)]
+            try:
+                response = self.queue.delete_messages(Entries=entries)
+                for failure in response.get("Failed", []):
+                    logging.warning(f"sqs_consumer: delete failed: {failure}")
+            except Exception as e:
+                logging.error(f"sqs_consumer: batch delete failed, messages will be redelivered: {e}")
+
+
+    def extend_visibility(self):
+        """
+        Push back the visibility timeout of every held message. Called by
+        the heartbeat thread.
+        """
+        with self.lock:
+            messages = list(self.held.values())
+        self.change_visibility(messages, self.visibility_timeout, "visibility heartbeat failed")
+
+
+    def change_visibility(self, messages, timeout, error):
+        """
+        Set the visibility timeout of messages, in batches
+        """
+        for batch in batches(messages):
+            entries = [{"Id": str(n), "ReceiptHandle": message.receipt_handle, "VisibilityTimeout": timeout}
+                       for n, message in enumerate(batch)]
+            try:
+                self.queue.change_message_visibility_batch(Entries=entries)
+            except Exception as e:
+                logging.warning(f"sqs_consumer: {error}: {e}")
+
+
+    def close(self):
+        """
+        Stop the heartbeat, delete messages marked done and hand buffered
+        messages back to the queue (visibility 0) for other consumers
+        """
+        self.heartbeat.stop()
+        self.flush()
+        with self.lock:
+            unused = list(self.buffer)
+            self.buffer.clear()
+            for message in unused:
+                self.held.pop(message.receipt_handle, None)
+        self.change_visibility(unused, 0, "could not release buffered messages")
+
+
+class Heartbeat(threading.Thread):
+    """
+    Background thread extending the visibility of a consumer's held
+    messages every interval seconds, and sending pending deletes
+
+    Inputs:
+    consumer (SQSConsumer); interval (float): Seconds between heartbeats
+    """
+
+    def __init__(self, consumer, interval):
+        super().__init__(daemon=True)
+        self.consumer = consumer
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.consumer.extend_visibility()
+            self.consumer.flush()
+
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
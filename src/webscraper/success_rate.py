@@ -0,0 +1,200 @@
+import os
+import json
+import fcntl
+import time
+import socket
+import logging
+import threading
+from . import config
+
+from .payload import read_payload
+
+
+SUCCESS_RATE_FLUSH_INTERVAL = config.SUCCESS_RATE_FLUSH_INTERVAL # Seconds between shard uploads
+SUCCESS_RATE_KEY = "success_rate/success-fail.json" # Totals written by earlier versions, no longer updated
+SHARD_PREFIX = "success_rate/shards/" # One object per host and scraper slot
+SLOT_DIRECTORY = "success_rate" # Local lock files of the slots claimed by running scrapers
+SUMMARY_KEY = "success_rate/summary.json" # Merged totals, rewritten when a process finishes
+
+
+def encode(data):
+    """
+    S3 object body for data, double-encoded like every JSON object the scraper stores
+    """
+    return json.dumps(json.dumps(data, indent=2))
+
+
+def rate_data(success, fail, bad):
+    """
+    Counts in the format of success_rate/success-fail.json
+
+    Returns: dict
+    """
+    rate = 0.0 if success + fail == 0 else success / (success + fail) * 100
+    return {
+        "success": success,
+        "fail": fail,
+        "bad_site": bad,
+        "rate": str(rate) + "%"
+    }
+
+
+def claim_slot(directory=SLOT_DIRECTORY):
+    """
+    Claim the lowest slot number no other running scraper on this host
+    holds, with a lock on a local file. The slot is held until the returned
+    file is closed (or the process exits).
+
+    Returns: (slot, lock_file) (tuple) - slot (int)
+    """
+    os.makedirs(directory, exist_ok=True)
+    slot = 0
+    while True:
+        lock_file = open(os.path.join(directory, f"slot-{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return (slot, lock_file)
+        except OSError:
+            lock_file.close() # Held by another scraper
+            slot += 1
+
+
+def shard_name(slot):
+    """
+    Name of a shard: stable per host and slot, so each run continues the
+    totals of the last run in its slot instead of adding a shard
+    """
+    return f"{socket.gethostname()}-{slot}"
+
+
+def missing(error):
+    """
+    True if an S3 get failed because the object does not exist
+    """
+    if isinstance(error, (KeyError, FileNotFoundError)):
+        return True
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("NoSuchKey", "404")
+
+
+class SuccessRateCounter:
+    """
+    Success/fail/bad-site counts of one scraper process, kept in memory and
+    uploaded to S3 on an interval and at shutdown. Each running process
+    writes its totals to its own shard object (success_rate/shards/<shard>.json),
+    so concurrent processes never lose counts; read_success_rate() merges
+    the shards. Shards are named by host and slot (see claim_slot()), so
+    their number stays bounded: a run first reads its shard's totals from
+    earlier runs and adds to them.
+
+    Inputs:
+    bucket - S3 bucket; shard (string): Shard name, see shard_name()
+    (optional) flush_interval (float): Seconds between uploads, 0 to upload on every count
+    """
+
+    def __init__(self, bucket, shard, flush_interval=SUCCESS_RATE_FLUSH_INTERVAL):
+        self.bucket = bucket
+        self.key = f"{SHARD_PREFIX}{shard}.json"
+        self.flush_interval = flush_interval
+        self.counts = {"success": 0, "fail": 0, "bad": 0} # This run's counts
+        self.earlier = None # Shard totals from earlier runs, None until read
+        self.dirty = False # True if counts changed since last upload
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+        self.load()
+
+
+    def add(self, status):
+        """
+        Count a site, uploading the shard if flush_interval has passed
+
+        Inputs: status (string) - "success", "fail" or "bad"
+        """
+        with self.lock:
+            self.counts[status if status in self.counts else "bad"] += 1
+            self.dirty = True
+            due = time.time() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+
+    def load(self):
+        """
+        Read the shard's totals from earlier runs. Until they are read, the
+        shard is not uploaded, so a failed read never overwrites them.
+
+        Returns: boolean - False if the shard could not be read
+        """
+        try:
+            data = read_payload(self.bucket.Object(self.key).get()["Body"].read())
+            earlier = {"success": int(data.get("success", 0)), "fail": int(data.get("fail", 0)),
+                       "bad": int(data.get("bad_site", 0))}
+        except Exception as e:
+            if not missing(e):
+                logging.warning(f"success_rate: could not read {self.key}, retried on next flush: {e}")
+                return False
+            earlier = {"success": 0, "fail": 0, "bad": 0} # First run in this slot
+        with self.lock:
+            self.earlier = earlier
+        return True
+
+
+    def flush(self):
+        """
+        Upload the shard's totals (earlier runs plus this one), if they
+        changed. Totals (not increments) are written, so a failed upload is
+        made good by the next one.
+
+        Returns: boolean - False if the upload failed
+        """
+        if self.earlier is None and not self.load():
+            return False
+        with self.lock:
+            if not self.dirty:
+                return True
+            totals = {status: self.earlier[status] + count for status, count in self.counts.items()}
+            body = encode(rate_data(totals["success"], totals["fail"], totals["bad"]))
+            self.dirty = False
+            self.last_flush = time.time()
+        try:
+            self.bucket.put_object(Body=body, Key=self.key)
+            return True
+        except Exception as e:
+            logging.warning(f"success_rate: upload of {self.key} failed, retried on next flush: {e}")
+            with self.lock:
+                self.dirty = True
+            return False
+
+
+def read_success_rate(bucket):
+    """
+    Scraper success rate over all processes: totals from the legacy
+    success-fail.json object plus every shard
+
+    Inputs: bucket - S3 bucket
+    Returns: dict - success, fail, bad_site and rate, as in success-fail.json
+    """
+    totals = {"success": 0, "fail": 0, "bad_site": 0}
+    keys = [SUCCESS_RATE_KEY] + [summary.key for summary in bucket.objects.filter(Prefix=SHARD_PREFIX)]
+    for key in keys:
+        try:
+            data = read_payload(bucket.Object(key).get()["Body"].read())
+        except Exception as e:
+            if key != SUCCESS_RATE_KEY:
+                logging.warning(f"success_rate: unreadable shard {key}: {e}")
+            continue
+        for field in totals:
+            totals[field] += int(data.get(field, 0))
+    return rate_data(totals["success"], totals["fail"], totals["bad_site"])
+
+
+def write_summary(bucket):
+    """
+    Store the merged success rate at success_rate/summary.json, for readers
+    of a single object
+
+    Returns: dict - see read_success_rate()
+    """
+    data = read_success_rate(bucket)
+    bucket.put_object(Body=encode(data), Key=SUMMARY_KEY)
+    return data
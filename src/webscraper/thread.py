@@ -1,101 +1,601 @@
+import re
 import time
 import os
+import codecs
 import sys
+import random
+import logging
+import threading
 import selenium
+import requests
 from . import utils as ut
 import datetime
 import csv
 from . import config
+from .driver_pool import DriverPool
+from .canonicalize import canonical_url
+from .page_cache import response_validators, conditional_headers
+from .language import LANGUAGE_GATE, CHECK_PAGE_LANGUAGE
 
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
+from selenium.common.exceptions import WebDriverException, TimeoutException as PageLoadTimeout
 
 
-MAX_WORDS = config.MAX_WORDS_PER_PAGE # Max number of words to read from a page 
+MAX_WORDS = config.MAX_WORDS_PER_PAGE # Max number of words to read from a page
+FETCH_MODE = config.FETCH_MODE # "auto", "static" or "chrome"
+
+STATIC_TIMEOUT = 10 # Seconds to wait on a raw HTML request
+CHROME_TIMEOUT = 60 # Max seconds to wait on a page render, lowered to fit the site deadline
+MIN_STATIC_WORDS = 50 # Pages with fewer words in raw HTML are treated as JS-rendered
+FRAMEWORK_MAX_WORDS = 200 # Framework shells with fewer words are treated as JS-rendered
+ESCALATE_CODES = {403, 429, 503} # Bot-protection responses worth retrying in Chrome
+SHELL_PAGES_FOR_CHROME = 3 # JS-app shells in a row before a domain goes straight to Chrome
+FRAMEWORK_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby", "svelte", "ember-app"}
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "head", "svg", "iframe"}
+CHARSET_SNIFF_BYTES = 4096 # Bytes of raw HTML searched for a <meta> charset
+META_CHARSET_RE = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+BOMS = [(codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+
+# Runs in the browser and returns everything scan_page needs in one WebDriver
+# round-trip. arguments[0] = max words, arguments[1] = gather links (boolean)
+EXTRACT_SCRIPT = """
+var maxWords = arguments[0];
+var gatherLinks = arguments[1];
+var body = document.body;
+var words = body ? body.innerText.split(/\\s+/).filter(function (w) { return w.length > 0; }) : [];
+var links = [];
+if (gatherLinks) {
+    var seen = {};
+    var anchors = document.getElementsByTagName("a");
+    for (var i = 0; i < anchors.length; i++) {
+        var href = anchors[i].href;
+        if (typeof href === "string" && href.length > 0 && !seen[href]) {
+            seen[href] = true;
+            links.push(href);
+        }
+    }
+}
+var canonical = document.querySelector("link[rel~='canonical']");
+var contentLanguage = document.querySelector("meta[http-equiv='content-language' i]");
+return {
+    text: words.slice(0, maxWords).join(" "),
+    links: links,
+    lang: document.documentElement.lang || (contentLanguage ? contentLanguage.content || "" : ""),
+    title: document.title || "",
+    canonical: canonical ? canonical.href : ""
+};
+"""
+
+
+def page_result(text, links, lang="", title="", canonical="", validators=None):
+    """
+    Build the page payload returned by the fetch engines
+
+    Inputs:
+    text (list) - page words; links (list) - resolved hrefs; (optional)
+    lang, title, canonical (string) - declared language (<html lang> or
+    Content-Language), <title> and rel=canonical;
+    (optional) validators (dict) - ETag/Last-Modified, see page_cache.response_validators()
+
+    Returns: dict
+    """
+    return {"text": text, "links": links, "lang": lang, "title": title, "canonical": canonical,
+            "validators": validators or {}}
+
+
+def load_page(driver, link, deadline=None):
+    """
+    Visit link in driver, bounded by the deadline through Chrome's page-load
+    and script timeouts. If the page is still loading when time runs out,
+    loading is stopped so whatever has rendered can still be read.
+
+    Inputs:
+    driver (WebDriver); link (string) - A url; (optional) deadline (Deadline)
+
+    Returns: boolean - True if the page finished loading
+    """
+    if deadline is not None:
+        timeout = deadline.timeout(CHROME_TIMEOUT)
+        driver.set_page_load_timeout(timeout)
+        driver.set_script_timeout(timeout)
+    try:
+        driver.get(link) # Visit url
+        return True
+    except PageLoadTimeout:
+        try:
+            driver.execute_script("window.stop();") # Keep partially loaded page
+        except WebDriverException:
+            pass
+        return False
+
+
+def extract_page(driver, max_words=MAX_WORDS, gather_links=True):
+    """
+    Read the text, links and metadata of the page loaded in driver with a
+    single injected script, so extraction cost does not grow with the number
+    of links. Falls back to reading elements one by one if the script fails.
+
+    Inputs:
+    driver (WebDriver) - driver with page loaded; (optional) max_words (int);
+    (optional) gather_links (boolean) - False to skip reading links
+
+    Returns: page (dict) - see page_result()
+    """
+    try:
+        page = driver.execute_script(EXTRACT_SCRIPT, max_words, gather_links)
+        return page_result(page["text"].split(), page["links"], page["lang"],
+                           page["title"], page["canonical"])
+    except Exception as e:
+        logging.warning(f"thread: extraction script failed, reading elements one by one: {e}")
+
+    text = ""
+    try:
+        text = driver.find_element(By.XPATH, "html/body").text
+    except Exception as e:
+        logging.warning(f"thread: could not read page body: {e}")
+
+    hrefs = []
+    if gather_links:
+        link_elements = []
+        try:
+            link_elements = driver.find_elements(By.TAG_NAME, "a")
+        except Exception as e:
+            logging.warning(f"thread: could not find page links: {e}")
+        for element in link_elements:
+            try:
+                hrefs.append(element.get_attribute("href"))
+            except Exception as e:
+                with open("link_errors.txt", 'w') as f:
+                    f.write(str(e))
+    return page_result(text.split()[:max_words], hrefs)
+
+
+def html_encoding(response):
+    """
+    Encoding of a page's raw HTML: byte order mark, then the Content-Type
+    charset, then a <meta> charset, then a guess from the bytes. Unlike
+    response.text, a text/html header without a charset does not mean
+    ISO-8859-1.
+
+    Inputs: response (Response)
+    Returns: string - codec name
+    """
+    content = response.content
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding
+    if "charset=" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        return response.encoding
+    match = META_CHARSET_RE.search(content[:CHARSET_SNIFF_BYTES])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass # Unknown charset name, guess instead
+    return response.apparent_encoding or "utf-8"
+
+
+def html_text(response):
+    """
+    A response's raw HTML decoded with html_encoding(); undecodable bytes are replaced
+    """
+    try:
+        return response.content.decode(html_encoding(response), errors="replace")
+    except LookupError:
+        return response.content.decode("utf-8", errors="replace")
+
+
+class PageParser(HTMLParser):
+    """
+    Extract visible body text and anchor hrefs from raw HTML, and record
+    the markers used to decide whether a page is rendered by JavaScript
+    (noscript warnings, empty framework root elements)
+    """
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url # Used to resolve relative hrefs
+        self.words = [] # Visible words in page body
+        self.hrefs = [] # Resolved anchor hrefs
+        self.skip_depth = 0 # > 0 while inside a tag whose text is not visible
+        self.lang = "" # <html lang> attribute, or <meta http-equiv=content-language>
+        self.title = "" # <title> text
+        self.canonical = "" # <link rel=canonical> href
+        self.in_title = False
+        self.in_noscript = False
+        self.noscript_js = False # True if a noscript block asks for JavaScript
+        self.framework_root = False # True if a framework mount point was found
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "base" and attrs.get("href"):
+            self.base_url = urljoin(self.base_url, attrs["href"])
+        elif tag == "a" and attrs.get("href"):
+            self.hrefs.append(urljoin(self.base_url, attrs["href"].strip()))
+        elif tag == "div" and attrs.get("id") in FRAMEWORK_ROOT_IDS:
+            self.framework_root = True
+        elif tag == "html":
+            self.lang = attrs.get("lang") or ""
+        elif tag == "meta" and (attrs.get("http-equiv") or "").lower() == "content-language":
+            self.lang = self.lang or attrs.get("content") or ""
+        elif tag == "title":
+            self.in_title = True
+        elif tag == "link" and "canonical" in (attrs.get("rel") or "").lower().split() and attrs.get("href"):
+            self.canonical = urljoin(self.base_url, attrs["href"].strip())
+        if tag == "noscript":
+            self.in_noscript = True
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        if tag == "noscript":
+            self.in_noscript = False
+        if tag in SKIPPED_TAGS and self.skip_depth > 0:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        if self.in_noscript and "javascript" in data.lower():
+            self.noscript_js = True
+        if self.skip_depth == 0:
+            self.words.extend(data.split())
+
+    def looks_js_rendered(self):
+        """
+        Decide if the raw HTML is a shell that needs a browser to render.
+
+        Inputs: None
+        Returns: boolean - True if page should be rendered with Chrome
+        """
+        if len(self.words) < MIN_STATIC_WORDS:
+            return True # Empty body
+        return self.looks_like_shell()
+
+    def looks_like_shell(self):
+        """
+        Decide if the raw HTML is a JavaScript app shell: a noscript warning
+        or framework root with little server-side text. Unlike a page that
+        is merely short, this says the site itself is rendered in the browser.
+
+        Returns: boolean
+        """
+        return (self.noscript_js or self.framework_root) and len(self.words) < FRAMEWORK_MAX_WORDS
+
+
+class StaticFetchEngine:
+    """
+    Fetch pages as raw HTML over a pooled HTTP session. Returns None from
+    fetch() when the page has to be escalated to Chrome.
+    """
+
+    def __init__(self, pool_size=config.NUM_THREADS):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = random.choice(ut.USER_AGENTS)
+
+    def fetch(self, link, timeout=STATIC_TIMEOUT):
+        """
+        Fetch a page and extract its text and links from raw HTML.
+
+        Inputs: link (string) - A url; (optional) timeout (float) - seconds
+        Returns: page (dict) - see page_result(), or None if Chrome is required
+        """
+        return self.parse(self.request(link, timeout))
+
+    def request(self, link, timeout=STATIC_TIMEOUT, validators=None):
+        """
+        GET a page, conditionally if validators from an earlier crawl are given
+
+        Inputs: link (string) - A url; (optional) timeout (float) - seconds;
+        (optional) validators (dict) - see page_cache.response_validators()
+        Returns: response, or None on a network error
+        """
+        headers = conditional_headers(validators) if validators else None
+        try:
+            return self.session.get(link, timeout=timeout, headers=headers)
+        except requests.RequestException:
+            return None
+
+    def parse(self, response):
+        """
+        Extract text and links from a response's raw HTML
+
+        Inputs: response (Response or None) - from request()
+        Returns: page (dict) - see page_result(), or None if Chrome is required
+        """
+        return self.read(response)[0]
+
+    def read(self, response):
+        """
+        Like parse(), also telling whether the page is a JavaScript app shell
+
+        Inputs: response (Response or None) - from request()
+        Returns: (page, shell) (tuple) - page (dict or None), see parse();
+        shell (boolean) - True if the raw HTML is an app shell, see PageParser.looks_like_shell()
+        """
+        if response is None or response.status_code in ESCALATE_CODES:
+            return (None, False)
+        if "html" not in response.headers.get("Content-Type", "html"):
+            return (page_result([], []), False) # Not a page (download, image, etc.), nothing to read
+        parser = PageParser(response.url)
+        try:
+            parser.feed(html_text(response))
+            parser.close()
+        except Exception as e:
+            return (None, False)
+        if parser.looks_js_rendered():
+            return (None, parser.looks_like_shell())
+        lang = parser.lang or response.headers.get("Content-Language", "")
+        return (page_result(parser.words, parser.hrefs, lang, parser.title.strip(),
+                            parser.canonical, response_validators(response.headers)), False)
+
+    def validators(self, link, timeout=STATIC_TIMEOUT):
+        """
+        Cache validators of a page, from a HEAD request
+
+        Returns: dict - see page_cache.response_validators(), empty on error
+        """
+        try:
+            return response_validators(self.session.head(link, allow_redirects=True, timeout=timeout).headers)
+        except requests.RequestException:
+            return {}
+
+    def close(self):
+        self.session.close()
+
+
+class ChromeFetchEngine:
+    """
+    Fetch pages by fully rendering them in a headless Chrome driver
+    """
+
+    def __init__(self, scanner_thread):
+        self.scanner_thread = scanner_thread # Owner of the leased driver
+
+    def fetch(self, link, continue_link_gathering=True, deadline=None):
+        """
+        Render a page and read its body text, anchor hrefs and metadata.
+        A page cut short by the deadline is read as far as it rendered.
+
+        Inputs: link (string) - A url; continue_link_gathering (boolean) -
+        False to skip reading links; (optional) deadline (Deadline)
+        Returns: page (dict) - see page_result()
+        """
+        driver = self.scanner_thread.driver
+        try:
+            load_page(driver, link, deadline)
+        except WebDriverException:
+            self.scanner_thread.release_driver(failed=True) # Replace broken driver
+            raise
+        self.scanner_thread.lease.pages += 1
+        return extract_page(driver, MAX_WORDS, continue_link_gathering)
+
+
+class DomainFetchPolicy:
+    """
+    Remember, per domain, whether pages have to be rendered in Chrome.
+    Shared by all ScannerThreads in the process. A domain is sent straight
+    to Chrome only after SHELL_PAGES_FOR_CHROME of its pages in a row come
+    back as JavaScript app shells; a network error, rate limit or short
+    page escalates that page alone.
+    """
+
+    def __init__(self, shell_pages=SHELL_PAGES_FOR_CHROME):
+        self.shell_pages = shell_pages
+        self.chrome_domains = set() # Domains known to be JS-rendered
+        self.shell_streaks = {} # Domain -> app shells in a row from the static engine
+        self.lock = threading.Lock()
+
+    def needs_chrome(self, domain):
+        with self.lock:
+            return domain in self.chrome_domains
+
+    def record_page(self, domain, shell):
+        """
+        Count a page of domain read by the static engine
+
+        Inputs: domain (string); shell (boolean) - True if the page was an app shell
+        Returns: boolean - True if the domain now goes straight to Chrome
+        """
+        with self.lock:
+            if not shell:
+                self.shell_streaks.pop(domain, None) # Streak broken by a server-rendered page
+                return domain in self.chrome_domains
+            streak = self.shell_streaks.get(domain, 0) + 1
+            if streak >= self.shell_pages:
+                self.chrome_domains.add(domain)
+                self.shell_streaks.pop(domain, None)
+            else:
+                self.shell_streaks[domain] = streak
+            return domain in self.chrome_domains
+
+
+FETCH_POLICY = DomainFetchPolicy()
+
 
 class ScannerThread:
 
-    def __init__(self):
-        self.driver, _ = ut.create_driver() # Thread has own Linux-capable driver
+    def __init__(self, fetch_mode=FETCH_MODE, driver_pool=None):
+        self.owns_pool = driver_pool is None # Standalone threads get a private pool
+        self.driver_pool = DriverPool(size=1) if self.owns_pool else driver_pool
+        self.lease = None # PooledDriver leased on first use
+        self.fetch_mode = fetch_mode # "auto", "static" or "chrome"
+        self.static_engine = StaticFetchEngine()
+        self.chrome_engine = ChromeFetchEngine(self)
         self.total_word_count = 0 # Word count for specific thread
         self.word_counts = [] # Word count split by each visited link
-        self.thread = None # ScannerThread assigned Python thread object 
+        self.static_pages = 0 # Pages served without Chrome
+        self.chrome_pages = 0 # Pages rendered with Chrome
+        self.cached_pages = 0 # Pages served from the page cache
+        self.non_english_pages = 0 # Pages skipped as not English (check_page_language)
+        self.page_cache = None # Site's PageCache, set by SmartQueue for incremental recrawls
+        self.recently_crawled = None # Frontier.recently_crawled of the site, set by SmartQueue
+        self.thread = None # ScannerThread assigned Python thread object
+        self.running = False # True while the thread scans a site for SmartQueue
+        self.abandoned = False # True if SmartQueue stopped waiting for the thread; it cleans up itself
+
 
+    @property
+    def driver(self):
+        if self.lease is None:
+            self.lease = self.driver_pool.acquire()
+        elif self.lease.pages >= self.driver_pool.max_pages:
+            self.release_driver() # Recycle driver after page limit
+            self.lease = self.driver_pool.acquire()
+        return self.lease.driver
 
-    def scan_page(self, link, continue_link_gathering, cpu_file):
+
+    def release_driver(self, failed=False):
+        """
+        Return the thread's Chrome driver (if one was leased) to the pool
+
+        Inputs: (optional) failed (boolean) - True if driver is broken
+        """
+        if self.lease is not None:
+            self.driver_pool.release(self.lease, failed)
+            self.lease = None
+
+
+    def quit(self):
+        """
+        Release the thread's Chrome driver and HTTP pool
+        """
+        self.release_driver()
+        self.static_engine.close()
+        if self.owns_pool:
+            self.driver_pool.close()
+
+
+    def fetch(self, link, continue_link_gathering, deadline=None):
+        """
+        Fetch a page with the static engine when possible, escalating the
+        page to Chrome when it looks JS-rendered or is refused. A domain
+        whose pages keep coming back as app shells is sent straight to
+        Chrome (see DomainFetchPolicy).
+
+        With a page cache, a page crawled within recrawl_after is served
+        from the cache without a request, if the cache holds the text the
+        seen store recorded for it. Other pages from the last crawl are first
+        revalidated with a conditional request, and served from the cache if
+        unchanged.
+
+        Inputs:
+        link(string) - A url; continue_link_gathering(boolean);
+        (optional) deadline(Deadline) - bounds request and render time
+
+        Returns:
+        page (dict) - see page_result()
+        """
+        domain = ut.extract_link_domain(link)
+        timeout = STATIC_TIMEOUT if deadline is None else deadline.timeout(STATIC_TIMEOUT)
+        response = None # Response to the conditional request, reused below
+        if self.page_cache is not None:
+            cached = self.page_cache.get(link)
+            crawl = None if cached is None or self.recently_crawled is None else self.recently_crawled(link)
+            if crawl is not None and crawl[1] == cached["hash"]:
+                self.cached_pages += 1
+                return self.page_cache.reuse(link) # Crawled recently, not requested again
+            if cached is not None and cached["validators"]:
+                response = self.static_engine.request(link, timeout, cached["validators"])
+                if response is not None and response.status_code == 304:
+                    self.cached_pages += 1
+                    return self.page_cache.reuse(link) # Unchanged, no fetch or render needed
+
+        if self.fetch_mode != "chrome" and not FETCH_POLICY.needs_chrome(domain):
+            if response is None:
+                response = self.static_engine.request(link, timeout)
+            page, shell = self.static_engine.read(response)
+            if response is not None and response.status_code not in ESCALATE_CODES:
+                FETCH_POLICY.record_page(domain, shell) # Errors and rate limits say nothing about the site
+            if page is not None or self.fetch_mode == "static":
+                self.static_pages += 1
+                return self.cache_page(link, page if page is not None else page_result([], []))
+        self.chrome_pages += 1
+        page = self.chrome_engine.fetch(link, continue_link_gathering, deadline)
+        if self.page_cache is not None:
+            # Rendered pages have no response headers: take validators from the request above, or a HEAD
+            if response is not None and response.ok:
+                page["validators"] = response_validators(response.headers)
+            else:
+                page["validators"] = self.static_engine.validators(link, timeout)
+        return self.cache_page(link, page)
+
+
+    def cache_page(self, link, page):
+        """
+        Record a fetched page in the page cache, if there is one
+
+        Returns: page (dict)
+        """
+        if self.page_cache is None:
+            return page
+        return self.page_cache.store(link, page)
+
+
+    def scan_page(self, link, continue_link_gathering, keep=None, deadline=None):
         """
-        Scan the contents of a given link. Called by SmartQueue, which 
+        Scan the contents of a given link. Called by SmartQueue, which
         distributes links from queue 1 by 1 to ScannerThread objects.
 
-        Inputs: 
-        link(string) - A url; continue_link_gathering(boolean) - 
-        True if more links should be gathered, False if visited link limit hit
+        Inputs:
+        link(string) - A url; continue_link_gathering(boolean) -
+        True if more links should be gathered, False if visited link limit hit;
+        (optional) keep(function) - narrows found links to those worth
+        checking (e.g. unvisited, same-site links); (optional) deadline(Deadline) -
+        site deadline, partial page text is returned if it passes mid-page
 
-        Returns: 
-        (text, links) (tuple) - A tuple containing list of page text 
-        split by spaces, and all links from the page
+        Returns:
+        (text, links, canonical) (tuple) - A tuple containing list of page text
+        split by spaces, all links from the page, and the page's canonical
+        url (rel=canonical, "" if none declared)
 
         Updates:
-        self.total_word_count, self.word_counts
+        self.total_word_count, self.word_counts, self.non_english_pages
 
         Calls:
-        utils.passes_link_conditions(), utils.clean_link()
-        """
-        current_datetime = datetime.datetime.now()
-        formatted_date = current_datetime.strftime("%Y-%m-%d")
-        formatted_datetime = current_datetime.strftime("%Y-%m-%d_%H:%M:%S")
-
-        subdirectory_name = "scraper_results"
-        directory_path = os.path.join(os.getcwd(), subdirectory_name, formatted_date)
-       
-        
-        ram = ut.ram_check(link)
-        cpu = ut.cpu_check(link)
-
-        with open(cpu_file, 'a', newline='') as csvfile:
-            # Create a CSV writer object
-            writer = csv.writer(csvfile)
-            writer.writerow([ram, cpu, link])
-
-        # Returns text on page as list of single-word strings
-        driver = self.driver
-        driver.get(link) # Visit url
-        # Get text from url, limit by word count
-        text = ""
-        try:
-            text = driver.find_element(By.XPATH, "html/body").text 
-        except Exception as e:
-            print("error in thread.py : driver.find_element")
-        text = text.split()
+        ScannerThread.fetch(), utils.filter_links(), canonicalize.canonical_url(),
+        LanguageGate.is_english()
+        """
+        # Text on page as list of single-word strings, and raw hrefs
+        page = self.fetch(link, continue_link_gathering, deadline)
+        if deadline is not None and deadline.expired():
+            continue_link_gathering = False # Out of time, keep text but stop following links
+        text = page["text"]
+        hrefs = page["links"]
+        if CHECK_PAGE_LANGUAGE and not LANGUAGE_GATE.is_english(page):
+            # Skip non-English subpages, and the pages they link to (likely the same language)
+            self.non_english_pages += 1
+            text = []
+            hrefs = []
         if len(text) > MAX_WORDS:
             text = text[:MAX_WORDS]
 
         # Gather links from url, until halted by continue_link_gathering condition
         links = []
         if continue_link_gathering:
-            # Find all links, filter out visited and external links
-            link_elements = []
+            # Filter out visited, external and download links
             try:
-                link_elements = driver.find_elements(By.TAG_NAME, "a")
+                links = ut.filter_links(hrefs, keep, config.NEW_LINKS_PER_PAGE + 1)
+            # Handle exceptions
             except Exception as e:
-                print("thread.py: errror in find_elements (link)")
-            # Iterate through all link elements and find href link
-            for element in link_elements:
-                try:
-                    link = element.get_attribute("href")
-                    link_domain = ut.extract_link_domain(link)
-                    if ut.passes_link_conditions(link):
-                        links.append(ut.clean_link(link))
-                # Handle exceptions
-                except Exception as e:
-                    with open("link_errors.txt", 'w') as f:
-                        f.write(str(e))
-                    
-        # Split text string into list of single words
+                with open("link_errors.txt", 'w') as f:
+                    f.write(str(e))
+
         self.total_word_count += len(text) # Update total word count
         self.word_counts.append(len(text)) # Update page word count
-        
+
+        canonical = canonical_url(page["canonical"]) if page["canonical"] else ""
+
         ut.delete_pdf_files(config.ROOT_DIRECTORY)
-        # Return tuple of list of words and list of links (set to remove duplicates)
-        return (text, list(set(links)))
+        # Return tuple of list of words, list of links (set to remove duplicates) and canonical url
+        return (text, list(set(links)), canonical)
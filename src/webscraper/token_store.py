@@ -0,0 +1,152 @@
+from array import array
+from collections import Counter
+
+
+class TokenStore:
+    """
+    Text of a site's pages, stored compactly: each distinct word is kept
+    once in a vocabulary and given an integer id, and every page is a slice
+    of one contiguous array('I') of ids (4 bytes per word, against 50+ for
+    a str in a list). Pages are turned back into words only when read.
+
+    Iterating yields each page as a list of words, so the store reads like
+    the list of pages it replaces. Counts work on the ids directly.
+
+    Not thread-safe: SmartQueue adds pages with its queue lock held.
+    """
+
+    def __init__(self):
+        self.ids = {} # word -> id
+        self.words = [] # id -> word
+        self.tokens = array('I') # Ids of every page, back to back
+        self.offsets = array('Q', [0]) # Page i is tokens[offsets[i]:offsets[i + 1]]
+
+
+    @classmethod
+    def from_pages(cls, pages):
+        """
+        Store built from a list of pages (lists of words)
+        """
+        store = cls()
+        for page in pages:
+            store.append(page)
+        return store
+
+
+    def append(self, words, link=""):
+        """
+        Add a page
+
+        Inputs: words (list) - page text; (optional) link (string) - url of
+        page, not stored (accepted for the same interface as spill.PageSpill)
+
+        Returns: None
+        """
+        ids = self.ids
+        tokens = self.tokens
+        for word in words:
+            token = ids.get(word)
+            if token is None:
+                token = ids[word] = len(self.words)
+                self.words.append(word)
+            tokens.append(token)
+        self.offsets.append(len(tokens))
+
+
+    def page_ids(self, index):
+        """
+        Ids of a page's words
+
+        Returns: array('I')
+        """
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+
+    def page(self, index):
+        """
+        Words of a page
+
+        Returns: list of strings
+        """
+        words = self.words
+        return [words[token] for token in self.page_ids(index)]
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        return self.page(index)
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.page(index)
+
+
+    def page_lengths(self):
+        """
+        Number of words on each page
+
+        Returns: generator of ints
+        """
+        offsets = self.offsets
+        return (offsets[index + 1] - offsets[index] for index in range(len(self)))
+
+
+    def word_count(self):
+        """
+        Number of words on all pages
+        """
+        return len(self.tokens)
+
+
+    def page_count(self):
+        """
+        Number of pages with text; duplicate and failed pages are stored empty
+        """
+        return sum(1 for length in self.page_lengths() if length != 0)
+
+
+    def id_counts(self):
+        """
+        Occurrences of each word id on all pages
+
+        Returns: Counter - id -> count
+        """
+        return Counter(self.tokens)
+
+
+    def word_counts(self):
+        """
+        Occurrences of each word on all pages
+
+        Returns: dict - word -> count
+        """
+        words = self.words
+        return {words[token]: count for token, count in self.id_counts().items()}
+
+
+    def count_matching(self, predicate):
+        """
+        Number of words on all pages for which predicate(word) is true. The
+        predicate is called once per distinct word, not once per word.
+
+        Inputs: predicate (function) - word -> boolean
+        Returns: int
+        """
+        matching = {token for token, word in enumerate(self.words) if predicate(word)}
+        if len(matching) == 0:
+            return 0
+        return sum(count for token, count in self.id_counts().items() if token in matching)
+
+
+    def close(self):
+        """
+        Nothing to release; same interface as spill.PageSpill
+        """
@@ -0,0 +1,151 @@
+import time
+import queue
+import logging
+import threading
+from . import config
+
+from multiprocessing.util import Finalize
+from .backends import s3_client
+
+
+UPLOAD_WORKERS = config.UPLOAD_WORKERS # Threads uploading to S3 at once
+UPLOAD_QUEUE_SIZE = config.UPLOAD_QUEUE_SIZE # Uploads waiting before callers block
+UPLOAD_ATTEMPTS = 4 # Tries per upload before it is given up
+UPLOAD_BACKOFF = 0.5 # Seconds before the first retry, doubled for each further one
+
+SHARED_UPLOADER = None # Process-wide uploader, see shared_uploader()
+SHARED_LOCK = threading.Lock()
+
+
+class Uploader:
+    """
+    Background S3 upload stage: uploads are queued and sent by a pool of
+    threads sharing one boto3 client, so crawling continues while they run.
+    The queue is bounded; callers only block (backpressure) when it is full.
+    Failed uploads are retried with exponential backoff.
+
+    Jobs are functions called as job(client, bucket_name), so a streaming
+    body can be rebuilt for each attempt.
+
+    Inputs:
+    client - boto3 S3 client; bucket_name (string)
+    (optional) num_workers (int): Upload threads
+    (optional) queue_size (int): Max uploads waiting
+    """
+
+    def __init__(self, client, bucket_name, num_workers=UPLOAD_WORKERS, queue_size=UPLOAD_QUEUE_SIZE):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.uploaded = 0 # Uploads sent
+        self.failed = 0 # Uploads given up after UPLOAD_ATTEMPTS
+        self.blocked_time = 0.0 # Seconds callers waited on a full queue
+        self.closed = False
+        self.workers = [threading.Thread(target=self.run, daemon=True) for _ in range(num_workers)]
+        for worker in self.workers:
+            worker.start()
+
+
+    def submit(self, key, job, on_done=None):
+        """
+        Queue an upload, waiting if the queue is full
+
+        Inputs:
+        key (string) - S3 key, for logging; job (function) - job(client, bucket_name);
+        (optional) on_done (function) - called once the upload has succeeded
+        or been given up, as on_done(succeeded) with succeeded (boolean)
+        """
+        if self.closed:
+            raise RuntimeError("uploader is closed")
+        start = time.time()
+        self.jobs.put((key, job, on_done))
+        waited = time.time() - start
+        if waited > 0.01:
+            with self.lock:
+                self.blocked_time += waited
+
+
+    def put_object(self, Body, Key, on_done=None):
+        """
+        Queue a put_object, with the same arguments as Bucket.put_object
+        (and on_done, see submit())
+        """
+        self.submit(Key, lambda client, bucket_name: client.put_object(Bucket=bucket_name, Body=Body, Key=Key),
+                    on_done)
+
+
+    def run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                self.jobs.task_done()
+                return
+            key, job, on_done = item
+            succeeded = False
+            try:
+                succeeded = self.upload(key, job)
+            finally:
+                if on_done is not None:
+                    try:
+                        on_done(succeeded)
+                    except Exception as e:
+                        logging.error(f"uploader: callback for {key} failed: {e}")
+                self.jobs.task_done()
+
+
+    def upload(self, key, job):
+        """
+        Run an upload job, retrying with backoff
+
+        Returns: boolean - True if the upload succeeded
+        """
+        for attempt in range(UPLOAD_ATTEMPTS):
+            try:
+                job(self.client, self.bucket_name)
+                with self.lock:
+                    self.uploaded += 1
+                return True
+            except Exception as e:
+                if attempt + 1 == UPLOAD_ATTEMPTS:
+                    logging.error(f"uploader: gave up on {key} after {UPLOAD_ATTEMPTS} attempts: {e}")
+                    with self.lock:
+                        self.failed += 1
+                    return False
+                time.sleep(UPLOAD_BACKOFF * 2 ** attempt)
+
+
+    def flush(self):
+        """
+        Wait until every queued upload has finished
+        """
+        self.jobs.join()
+
+
+    def close(self):
+        """
+        Finish queued uploads, then stop the upload threads
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+def shared_uploader():
+    """
+    Uploader shared by everything in this process, created on first use
+    and closed (after finishing its uploads) when the process exits
+
+    Returns: Uploader
+    """
+    global SHARED_UPLOADER
+    with SHARED_LOCK:
+        if SHARED_UPLOADER is None:
+            client = s3_client(max_pool_connections=UPLOAD_WORKERS) # S3, or local files (storage_backend)
+            SHARED_UPLOADER = Uploader(client, config.BUCKET_NAME)
+            Finalize(None, SHARED_UPLOADER.close, exitpriority=10)
+        return SHARED_UPLOADER
@@ -1,4 +1,3 @@
-import tldextract
 import langdetect
 import logging
 import subprocess
@@ -6,6 +5,9 @@ import os
 import requests
 import random
 from . import config
+from .link_classifier import LINK_CLASSIFIER
+from .canonicalize import canonical_url
+from .domains import link_domain, link_domains
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -37,9 +39,15 @@ def is_link(href_str):
 
 def extract_link_domain(url):
     """
-    Extra domain from a url using tldextract
+    Extract domain from a url using the bundled public suffix list
     """
-    return tldextract.extract(url).registered_domain.lower()
+    return link_domain(url)
+
+def extract_link_domains(urls):
+    """
+    Batch version of extract_link_domain for a page's links
+    """
+    return link_domains(urls)
 
 def create_driver():
     """
@@ -101,13 +109,9 @@ def is_number(str):
     
 def link_in_queue(link_to_check, queue):
     """
-    Check if a link is currently in the MinHeap queue
+    Check if a link is currently in the MinHeap or Frontier queue
     """
-    queued_links = list(queue.indices.keys())
-    for link in queued_links:
-        if link_to_check == link:
-            return True
-    return False
+    return link_to_check in queue.indices
         
 def remove_anchor(link):
     """
@@ -123,25 +127,10 @@ def is_not_download(link):
     """
     Ensure that a link is not actually a file download. Check the path to ensure
     no file extension beside .html (ie. 'pdf', 'zip, etc.) is contained in link.
-    Further check by requesting link headers and checking content type and 
-    disposition.
+    Further check by requesting link headers (cached) and checking content type 
+    and disposition.
     """ 
-    parse = urlparse(link)
-    # Check if the path has a file extension that is not .html
-    if '.' in parse.path and '.html' not in parse.path:
-        return False
-
-    # Download not always evident by path: request headers to check further
-    try:
-        response = requests.get(link)
-        headers = response.headers
-        content_disposition = headers.get('Content-Disposition', '')
-        content_type = headers.get('Content-Type', '')
-        if "attachment" in content_disposition or "octet-stream" in content_type:
-            return False
-    except Exception as e:
-        pass
-    return True
+    return LINK_CLASSIFIER.is_page(link)
 
 def is_not_login(link):
     """
@@ -156,7 +145,30 @@ def passes_link_conditions(link):
     Check that a link can be added to queue and scanned by ensuring
     it is a valid link, is not a download, and is not a login page
     """
-    return is_link(link) and is_not_download(link) and is_not_login(link)
+    return is_link(link) and is_not_login(link) and is_not_download(link)
+
+
+def filter_links(links, keep=None, limit=None):
+    """
+    Batch version of passes_link_conditions for all links found on a page.
+    Links are canonicalized and deduplicated, narrowed with keep (e.g. to unvisited,
+    same-site links) so those are never requested, then checked for downloads 
+    concurrently.
+
+    Inputs:
+    links (list) - hrefs from a page; (optional) keep (function) - takes and 
+    returns a list of links; (optional) limit (int) - max links to return
+
+    Returns: list of canonical links
+    """
+    candidates = []
+    for link in links:
+        if is_link(link) and is_not_login(link):
+            candidates.append(canonical_url(link))
+    candidates = list(dict.fromkeys(candidates)) # Remove duplicates, keep order
+    if keep is not None:
+        candidates = keep(candidates)
+    return LINK_CLASSIFIER.filter_pages(candidates, limit)
 
 def remove_trailing_slash(path):
     """
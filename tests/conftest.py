@@ -0,0 +1,44 @@
+import io
+
+
+class FakeObject:
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+
+    def get(self):
+        if self.key not in self.bucket.store:
+            raise KeyError(self.key) # Missing objects only fail when read, as with S3
+        return {"Body": io.BytesIO(self.bucket.store[self.key].encode("utf-8"))}
+
+    def delete(self):
+        self.bucket.store.pop(self.key, None)
+        self.bucket.deletes += 1
+
+
+class FakeObjects:
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def filter(self, Prefix):
+        return [FakeObject(self.bucket, key) for key in sorted(self.bucket.store) if key.startswith(Prefix)]
+
+
+class FakeBucket:
+    """
+    Stand-in for an S3 Bucket resource, storing object bodies in a dict.
+    Shared by the tests of modules that read and write S3 objects.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.puts = 0
+        self.deletes = 0
+        self.objects = FakeObjects(self)
+
+    def put_object(self, Body, Key):
+        self.store[Key] = Body
+        self.puts += 1
+
+    def Object(self, key):
+        return FakeObject(self, key)
@@ -0,0 +1,79 @@
+import time
+import threading
+
+import pytest
+
+from src.webscraper.backends import LocalBucket, LocalClient, LocalQueue
+from src.webscraper.metadata_index import MetadataIndex
+from src.webscraper.payload import PieceReader, encoded_payload, read_payload
+from src.webscraper.sqs_consumer import SQSConsumer
+from src.webscraper.success_rate import SuccessRateCounter, read_success_rate
+
+
+def test_local_bucket_and_client_share_objects(tmp_path):
+    bucket = LocalBucket("results", root=str(tmp_path))
+    client = LocalClient(root=str(tmp_path))
+    bucket.put_object(Body='{"a": 1}', Key="metadata/success/a.com.json")
+    pieces, compress, extra_args = encoded_payload({"url": "b.com"}, iter(["one ", "two"]), "ndjson")
+    client.upload_fileobj(PieceReader(pieces, compress), "results", "html_data/b.com.json", ExtraArgs=extra_args)
+
+    assert [summary.key for summary in bucket.objects.filter(Prefix="metadata/")] == ["metadata/success/a.com.json"]
+    assert len(list(bucket.objects.all())) == 2
+    assert read_payload(bucket.Object("html_data/b.com.json").get()["Body"].read())["html"] == "one two"
+    assert client.get_object(Bucket="results", Key="metadata/success/a.com.json")["Body"].read() == b'{"a": 1}'
+
+    bucket.Object("metadata/success/a.com.json").delete()
+    bucket.Object("metadata/success/a.com.json").delete() # Missing objects delete quietly, as in S3
+    with pytest.raises(FileNotFoundError):
+        bucket.Object("metadata/success/a.com.json").get()
+    with pytest.raises(ValueError):
+        bucket.put_object(Body="x", Key="../outside.json")
+
+
+def test_local_bucket_runs_bookkeeping(tmp_path):
+    bucket = LocalBucket("results", root=str(tmp_path / "storage"))
+    counter = SuccessRateCounter(bucket, "host-1", flush_interval=0)
+    counter.add("success")
+    counter.add("fail")
+    assert read_success_rate(bucket)["rate"] == "50.0%"
+
+    index = MetadataIndex(str(tmp_path / "sites.sqlite3"))
+    index.record("a.com", "2026-01-01", {"status": "fail"})
+    assert index.sync(bucket) == 1
+    assert [summary.key for summary in bucket.objects.filter(Prefix="metadata/")] == ["metadata/fail/a.com.json"]
+    index.close()
+
+
+def test_local_queue_visibility_and_long_polling():
+    queue = LocalQueue()
+    queue.send_message(MessageBody="a.com", MessageAttributes={"domain": {"StringValue": "a.com", "DataType": "String"}})
+    first = queue.receive_messages(MessageAttributeNames=["All"], VisibilityTimeout=0.1)[0]
+    assert first.message_attributes["domain"]["StringValue"] == "a.com"
+    assert queue.receive_messages(MessageAttributeNames=["All"]) == [] # Hidden while being processed
+
+    time.sleep(0.15)
+    second = queue.receive_messages(MessageAttributeNames=["All"])[0] # Timed out: handed out again
+    assert second.message_id == first.message_id
+    assert queue.delete_messages(Entries=[{"Id": "0", "ReceiptHandle": first.receipt_handle}])["Failed"]
+    second.delete()
+    assert len(queue) == 0 and (queue.received, queue.deleted) == (2, 1)
+
+    # A long poll returns as soon as a message arrives
+    threading.Timer(0.05, queue.send_message, kwargs={"MessageBody": "b.com"}).start()
+    start = time.time()
+    assert [message.body for message in queue.receive_messages(WaitTimeSeconds=5)] == ["b.com"]
+    assert time.time() - start < 2
+
+
+def test_consumer_on_local_queue():
+    queue = LocalQueue()
+    for n in range(15):
+        queue.send_message(MessageBody=f"site{n}.com")
+    consumer = SQSConsumer(queue, wait_time=0, visibility_timeout=0.2, heartbeat_interval=0.05)
+    messages = [consumer.get() for _ in range(15)]
+    time.sleep(0.4) # Held past the visibility timeout, kept hidden by heartbeats
+    assert queue.receive_messages() == []
+    for message in messages:
+        message.delete()
+    consumer.close()
+    assert len(queue) == 0 and queue.received == 15
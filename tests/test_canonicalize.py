@@ -0,0 +1,45 @@
+from src.webscraper.canonicalize import canonical_url, is_tracking_param
+
+
+def test_variants_share_canonical_form():
+    variants = [
+        "https://www.site.com/about",
+        "https://WWW.Site.com/about/",
+        "HTTPS://www.site.com:443/about#team",
+        "https://www.site.com/about/index.html",
+        "https://www.site.com/about?utm_source=news&utm_medium=email",
+        "https://www.site.com/about;jsessionid=A1B2C3",
+    ]
+    assert {canonical_url(link) for link in variants} == {"https://www.site.com/about"}
+
+
+def test_query_sorted_and_kept():
+    assert canonical_url("https://site.com/list?page=2&sort=asc&gclid=x") == \
+        canonical_url("https://site.com/list?sort=asc&page=2")
+    assert canonical_url("https://site.com/list?page=2") != canonical_url("https://site.com/list?page=3")
+
+
+def test_query_encoding_kept():
+    assert canonical_url("https://site.com/find?q=a+b&path=/docs/x&flag") == \
+        "https://site.com/find?flag&path=/docs/x&q=a+b"
+    assert canonical_url("https://site.com/find?q=a%20b&&utm%5Fsource=x") == "https://site.com/find?q=a%20b"
+
+
+def test_scheme_folding_and_ports():
+    assert canonical_url("http://site.com/a", "https") == "https://site.com/a"
+    assert canonical_url("http://site.com:80/") == "http://site.com"
+    assert canonical_url("http://site.com:8080/a") == "http://site.com:8080/a"
+    assert canonical_url("mailto:someone@site.com") == "mailto:someone@site.com"
+
+
+def test_default_port_dropped_before_folding():
+    assert canonical_url("http://Site.com:80/a/", "https") == "https://site.com/a"
+    assert canonical_url("https://site.com:443/a", "http") == "http://site.com/a"
+    assert canonical_url("http://site.com:443/a", "https") == "http://site.com:443/a"
+    assert canonical_url("http://site.com:8080/a", "https") == "http://site.com:8080/a"
+
+
+def test_tracking_rules():
+    assert is_tracking_param("utm_campaign")
+    assert is_tracking_param("FBCLID")
+    assert not is_tracking_param("page")
@@ -0,0 +1,100 @@
+import time
+import threading
+
+import pytest
+
+from src.webscraper import smart_queue
+from src.webscraper.deadline import Deadline, TimeoutException
+from src.webscraper.seen_store import SeenStore
+from src.webscraper.smart_queue import SmartQueue
+from src.webscraper.token_store import TokenStore
+
+
+def test_deadline_expires():
+    deadline = Deadline(0.05)
+    assert not deadline.expired()
+    deadline.check() # Time left, no exception
+    time.sleep(0.06)
+    assert deadline.expired()
+    with pytest.raises(TimeoutException):
+        deadline.check()
+
+    cancelled = Deadline(60)
+    child = cancelled.child(60)
+    cancelled.cancel()
+    assert cancelled.expired() and child.expired() # Cancelling ends nested deadlines too
+
+
+def test_remaining_clamped():
+    assert Deadline(-5).remaining() == 0.0 # Never negative once expired
+    parent = Deadline(0.5)
+    assert parent.child(60).remaining() <= 0.5 # Never ends after its parent
+    assert 0 < parent.child(0.1).remaining() <= 0.1
+
+    assert Deadline(-5).timeout(30) == 1.0 # Drivers need at least 1 second
+    assert Deadline(600).timeout(30) == 30 # Capped for each blocking call
+    assert 4 < Deadline(5).timeout(30) <= 5
+
+
+class StuckScannerThread:
+    """
+    Stand-in for ScannerThread whose page load hangs until released
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.thread = None
+        self.released = []
+        self.quit_called = False
+
+    def scan_page(self, link, continue_link_gathering, keep=None, deadline=None):
+        self.release.wait(10) # Ignores the deadline, as a hung driver would
+        return ([], [], "")
+
+    def release_driver(self, failed=False):
+        self.released.append(failed)
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_stuck_thread_releases_its_driver_as_failed(tmp_path, monkeypatch):
+    monkeypatch.setattr(smart_queue, "JOIN_GRACE", 0.05)
+    seen_store = SeenStore(str(tmp_path / "urls"), capacity=1000)
+    queue = SmartQueue("https://site.com", num_threads=1, max_links=20, seen_store=seen_store)
+    queue.text = TokenStore()
+    stuck = StuckScannerThread()
+    queue.scanner_threads = [stuck]
+    queue.home_domain = "site.com"
+    queue.original_link_count = 1
+    queue.populate_queue(["https://site.com"])
+    queue.start_time = time.time()
+    queue.deadline = Deadline(0.1)
+
+    started = time.monotonic()
+    queue.visit_all_links()
+    assert time.monotonic() - started < 2 # Returned shortly after deadline and grace, not after the page
+    assert queue.timeout
+    # Driver and session still in use by the stuck page: left to the thread
+    assert stuck.abandoned and stuck.released == [] and not stuck.quit_called
+
+    stuck.release.set()
+    stuck.thread.join(5)
+    assert stuck.released == [True] and stuck.quit_called # Driver discarded, not reused; session closed
+    seen_store.close()
+
+
+def test_finished_threads_quit(tmp_path):
+    seen_store = SeenStore(str(tmp_path / "urls"), capacity=1000)
+    queue = SmartQueue("https://site.com", num_threads=1, max_links=20, seen_store=seen_store)
+    queue.text = TokenStore()
+    finished = StuckScannerThread()
+    finished.release.set()
+    queue.scanner_threads = [finished]
+    queue.home_domain = "site.com"
+    queue.original_link_count = 1
+    queue.populate_queue(["https://site.com"])
+    queue.start_time = time.time()
+    queue.visit_all_links()
+    assert not finished.abandoned and finished.released == [] and finished.quit_called
+    seen_store.close()
@@ -0,0 +1,24 @@
+from src.webscraper.domains import link_domain, link_domains, link_host, registered_domain
+
+
+def test_registered_domain_rules():
+    assert registered_domain("www.example.com") == "example.com"
+    assert registered_domain("a.b.example.co.uk") == "example.co.uk"
+    assert registered_domain("foo.bar.kawasaki.jp") == "foo.bar.kawasaki.jp" # *.kawasaki.jp
+    assert registered_domain("www.city.kawasaki.jp") == "city.kawasaki.jp" # !city.kawasaki.jp
+    assert registered_domain("co.uk") == ""
+    assert registered_domain("localhost") == ""
+    assert registered_domain("10.0.0.1") == ""
+
+
+def test_link_host():
+    assert link_host("HTTPS://user:pw@WWW.Example.com:8080/path?q=1#top") == "www.example.com"
+    assert link_host("www.example.com/path") == "www.example.com"
+    assert link_host("http://[::1]:80/") == ""
+
+
+def test_batch_matches_single():
+    links = ["https://www.example.com/a", "http://shop.example.com.au/b", "https://www.example.com/c",
+             "mailto:someone@example.org"]
+    assert link_domains(links) == [link_domain(link) for link in links]
+    assert link_domains(links) == ["example.com", "example.com.au", "example.com", "example.org"]
@@ -0,0 +1,119 @@
+from src.webscraper import driver_pool as driver_pool_module
+from src.webscraper.driver_pool import DriverPool
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class FakeDriver:
+    """
+    Stand-in for a Chrome WebDriver, recording resets and quits
+    """
+
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.broken_reset = False
+        self.window_handles = ["main"]
+        self.current = "main"
+        self.switch_to = FakeSwitchTo(self)
+        self.cookies_cleared = 0
+        self.quit_called = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise ConnectionError("chrome not reachable")
+        return 1 if script == "return 1" else "https://site.com"
+
+    def execute_cdp_cmd(self, command, args):
+        pass
+
+    def close(self):
+        self.window_handles.remove(self.current)
+
+    def delete_all_cookies(self):
+        if self.broken_reset:
+            raise ConnectionError("chrome not reachable")
+        self.cookies_cleared += 1
+
+    def get(self, url):
+        self.url = url
+
+    def quit(self):
+        self.quit_called = True
+
+
+def fake_pool(monkeypatch, **kwargs):
+    drivers = []
+
+    def create_driver():
+        drivers.append(FakeDriver(len(drivers)))
+        return (drivers[-1], 0)
+    monkeypatch.setattr(driver_pool_module.ut, "create_driver", create_driver)
+    return (DriverPool(**kwargs), drivers)
+
+
+def test_drivers_reset_and_reused(monkeypatch):
+    pool, drivers = fake_pool(monkeypatch, size=2, max_pages=10)
+    pool.warm()
+    assert len(drivers) == 2 and len(pool.idle) == 2
+
+    lease = pool.acquire()
+    lease.driver.window_handles.append("popup") # Left open by the site
+    lease.pages += 1
+    pool.release(lease)
+    assert lease.driver.window_handles == ["main"] and lease.driver.cookies_cleared == 1
+    assert lease.driver.url == "about:blank"
+    assert pool.acquire() is lease and pool.launched == 2 # Reused, no new Chrome
+
+
+def test_unhealthy_idle_driver_replaced_on_acquire(monkeypatch):
+    pool, drivers = fake_pool(monkeypatch, size=1)
+    pool.warm()
+    drivers[0].alive = False # Chrome died while idle
+    lease = pool.acquire()
+    assert lease.driver is drivers[1] and drivers[0].quit_called
+    assert (pool.launched, pool.recycled) == (2, 1)
+
+
+def test_recycled_after_max_pages_failure_or_failed_reset(monkeypatch):
+    pool, drivers = fake_pool(monkeypatch, size=2, max_pages=3)
+    worn = pool.acquire()
+    worn.pages = 3
+    pool.release(worn)
+    assert worn.driver.quit_called and worn.driver.cookies_cleared == 0 # Quit, not reset
+
+    failed = pool.acquire()
+    pool.release(failed, failed=True)
+    assert failed.driver.quit_called and pool.idle == []
+
+    unresettable = pool.acquire()
+    unresettable.driver.broken_reset = True
+    pool.release(unresettable)
+    assert unresettable.driver.quit_called and pool.idle == []
+    assert pool.acquire().driver is drivers[3] and pool.recycled == 3 # Replaced with a new driver
+
+
+def test_pool_keeps_at_most_size_idle(monkeypatch):
+    pool, drivers = fake_pool(monkeypatch, size=1)
+    leases = [pool.acquire(), pool.acquire()]
+    for lease in leases:
+        pool.release(lease)
+    assert [pooled.driver for pooled in pool.idle] == [drivers[0]] and drivers[1].quit_called
+
+
+def test_drain_and_close(monkeypatch):
+    pool, drivers = fake_pool(monkeypatch, size=2)
+    pool.warm()
+    pool.drain()
+    assert pool.idle == [] and all(driver.quit_called for driver in drivers)
+    assert pool.acquire().driver is drivers[2] # Still usable, starts drivers on demand
+
+    pool.warm()
+    pool.close()
+    assert pool.idle == [] and all(driver.quit_called for driver in drivers[3:])
@@ -0,0 +1,65 @@
+import random
+
+from src.webscraper.frontier import Frontier
+
+
+def test_remove_in_priority_order():
+    frontier = Frontier()
+    priorities = list(range(500))
+    random.Random(1).shuffle(priorities)
+    for priority in priorities:
+        frontier.insert(priority, f"https://site.com/{priority}")
+    assert frontier.verify()
+
+    removed = [frontier.remove_next()[0] for _ in range(500)]
+    assert removed == sorted(priorities)
+    assert frontier.is_empty()
+
+
+def test_ties_are_first_in_first_out():
+    frontier = Frontier()
+    for link in ["c", "a", "b"]:
+        frontier.insert(1, link)
+    assert [frontier.remove_next()[1] for _ in range(3)] == ["c", "a", "b"]
+
+
+def test_dedupe_and_visited():
+    frontier = Frontier()
+    assert frontier.insert(5, "a")
+    assert not frontier.insert(7, "a")
+    assert frontier.size() == 1
+
+    frontier.remove_next()
+    assert frontier.is_visited("a") and frontier.seen("a")
+    assert not frontier.insert(1, "a")
+    assert frontier.is_empty()
+
+
+def test_decrease_key():
+    frontier = Frontier()
+    for n in range(10):
+        frontier.insert(10 + n, f"link-{n}")
+    frontier.insert(1, "link-9")
+    assert frontier.verify()
+    assert frontier.next_up() == (1, "link-9")
+
+
+def test_grows_past_initial_size():
+    frontier = Frontier()
+    for n in range(5000):
+        frontier.insert(n % 97, f"link-{n}")
+    assert frontier.size() == 5000
+    assert frontier.verify()
+
+
+def test_mark_visited_drops_queued_link():
+    frontier = Frontier()
+    for priority in range(20):
+        frontier.insert(priority, str(priority))
+    frontier.mark_visited("3")
+    frontier.mark_visited("19")
+    frontier.mark_visited("new")
+    assert frontier.verify()
+    assert frontier.is_visited("3") and frontier.is_visited("new")
+    assert not frontier.insert(0, "3")
+    assert [frontier.remove_next()[1] for _ in range(18)] == [str(n) for n in range(20) if n not in (3, 19)]
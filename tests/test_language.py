@@ -0,0 +1,34 @@
+from src.webscraper.language import LanguageGate, declared_language, sample_words
+from src.webscraper.thread import page_result
+
+ENGLISH = ("The quick brown fox jumps over the lazy dog while the farmer watches from "
+           "the porch and wonders whether it will rain before the harvest is in").split()
+FRENCH = ("Le renard brun rapide saute par dessus le chien paresseux pendant que le "
+          "fermier regarde depuis le porche et se demande s'il pleuvra avant la récolte").split()
+
+
+def test_declared_language():
+    assert declared_language("en-US") == "en"
+    assert declared_language("fr_CA") == "fr"
+    assert declared_language("en-GB, en-US") == "en"
+    assert declared_language("en, fr") == "" # Ambiguous
+    assert declared_language("") == ""
+
+
+def test_sample_is_bounded():
+    words = [str(n) for n in range(1000)]
+    sample = sample_words(words, 100)
+    assert len(sample) == 100 and sample[0] == "0" and sample[-1] == "999"
+    assert sample_words(words[:10], 100) == words[:10]
+
+
+def test_gate():
+    gate = LanguageGate()
+    assert gate.is_english(page_result(ENGLISH, []))
+    assert not gate.is_english(page_result(FRENCH, []))
+    assert gate.is_english(page_result(FRENCH, [], lang="en-US")) # Declared language is trusted
+    assert gate.is_english(page_result([], [])) # Nothing to go on
+    assert [gate.detect(FRENCH) for _ in range(5)] == ["fr"] * 5 # Seeded, same verdict every time
+
+    assert not gate.site_is_english("site.fr", page_result(FRENCH, []))
+    assert not gate.site_is_english("site.fr", page_result(ENGLISH, [])) # Cached for the domain
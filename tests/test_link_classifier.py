@@ -0,0 +1,77 @@
+import pytest
+
+from src.webscraper.link_classifier import LinkClassifier, rule_verdict, path_pattern
+
+
+class OfflineClassifier(LinkClassifier):
+    """
+    LinkClassifier with probes answered from a dict instead of the network
+    """
+
+    def __init__(self, answers, **kwargs):
+        super().__init__(ttl=60, workers=2, **kwargs)
+        self.answers = answers
+        self.probed = []
+
+    def probe(self, link):
+        self.probed.append(link)
+        verdict = self.answers.get(link, True)
+        self.record(link, verdict)
+        return verdict
+
+
+def test_rule_verdict():
+    assert rule_verdict("https://site.com/files/report.pdf") is False
+    assert rule_verdict("https://site.com/downloads/latest") is None # Probed: often an ordinary page
+    assert rule_verdict("https://site.com/support/downloads") is None
+    assert rule_verdict("https://site.com/about") is None
+    assert rule_verdict("https://site.com/about/index.html") is None
+
+
+def test_path_pattern():
+    assert path_pattern("https://Site.com/blog/post-1") == "site.com/blog/*"
+    assert path_pattern("https://site.com/blog/post-2/") == "site.com/blog/*"
+
+
+def test_filter_pages_uses_rules_and_cache():
+    classifier = OfflineClassifier({"https://site.com/get-file": False})
+    links = ["https://site.com/a.zip", "https://site.com/about", "https://site.com/get-file"]
+
+    assert classifier.filter_pages(links) == ["https://site.com/about"]
+    assert classifier.probed == ["https://site.com/about", "https://site.com/get-file"]
+
+    classifier.filter_pages(links)
+    assert len(classifier.probed) == 2 # Second pass answered from cache
+
+
+def test_filter_pages_limit_stops_probing():
+    classifier = OfflineClassifier({})
+    links = [f"https://site.com/page-{n}/x" for n in range(10)]
+
+    assert len(classifier.filter_pages(links, limit=3)) == 3
+    assert len(classifier.probed) == 3
+
+
+def test_pattern_cache():
+    classifier = OfflineClassifier({})
+    classifier.filter_pages([f"https://site.com/blog/post-{n}" for n in range(3)])
+
+    assert classifier.cached_verdict("https://site.com/blog/post-99") is True
+
+
+def test_download_paths_probed():
+    classifier = OfflineClassifier({"https://site.com/downloads/setup": False})
+    links = ["https://site.com/downloads", "https://site.com/downloads/setup"]
+    assert classifier.filter_pages(links) == ["https://site.com/downloads"]
+    assert classifier.probed == links
+
+
+def test_caches_bounded():
+    classifier = OfflineClassifier({}, url_cache_size=4, pattern_cache_size=2)
+    classifier.filter_pages(["https://site.com/keep/x"])
+    for n in range(10):
+        classifier.filter_pages([f"https://site.com/dir-{n}/page"])
+        classifier.cached_verdict("https://site.com/keep/x") # Recently used entries survive
+    assert len(classifier.url_cache) == 4 and len(classifier.pattern_cache) == 2
+    assert "https://site.com/keep/x" in classifier.url_cache
+    assert "https://site.com/dir-0/page" not in classifier.url_cache
@@ -0,0 +1,83 @@
+import json
+
+from conftest import FakeBucket
+from src.webscraper.metadata_index import MetadataIndex, MetadataSyncer
+
+
+def metadata(status):
+    return {"domain": "https://site.com", "response_code": 200, "word_count": 10, "duration": 1.0,
+            "status": status}
+
+
+def test_status_moves_synced_in_batches(tmp_path):
+    bucket = FakeBucket()
+    index = MetadataIndex(str(tmp_path / "sites.sqlite3"))
+    assert index.lookup("site.com") == ({}, None)
+
+    assert index.record("site.com", "2024-01-01", metadata("low_count")) == \
+        ({"2024-01-01": metadata("low_count")}, None)
+    history, previous = index.record("site.com", "2024-01-02", metadata("timeout"))
+    assert previous == "low_count" and index.lookup("site.com") == (history, "fail")
+    assert bucket.puts + bucket.deletes == 0 and index.pending() == 1 # Nothing sent to S3 yet
+
+    assert index.sync(bucket) == 1
+    assert json.loads(bucket.store["metadata/fail/site.com.json"]) == history
+    assert index.pending() == 0
+
+    index.record("site.com", "2024-01-03", metadata("success"))
+    syncer = MetadataSyncer(index, bucket, interval=3600)
+    syncer.start()
+    syncer.stop() # Final sync on shutdown
+    assert sorted(bucket.store) == ["metadata/success/site.com.json"] # Moved out of fail
+    index.close()
+
+
+def test_history_from_earlier_runs_kept(tmp_path):
+    bucket = FakeBucket()
+    earlier = {"2023-12-01": metadata("success")}
+    bucket.put_object(Body=json.dumps(json.dumps(earlier)), Key="metadata/success/site.com.json")
+    index = MetadataIndex(str(tmp_path / "sites.sqlite3"))
+    assert index.bootstrap(bucket) == 1
+    assert index.bootstrap(bucket) == 0 # Once per index
+    assert index.lookup("site.com") == ({}, "success")
+
+    index.record("site.com", "2024-01-01", metadata("fail"))
+    index.sync(bucket)
+    assert sorted(bucket.store) == ["metadata/fail/site.com.json"]
+    assert json.loads(bucket.store["metadata/fail/site.com.json"]) == dict(earlier, **{"2024-01-01": metadata("fail")})
+    index.close()
+
+
+class RacingBucket(FakeBucket):
+    """
+    FakeBucket that runs a record() of the site while its object is being uploaded
+    """
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+        self.race = None
+
+    def put_object(self, Body, Key):
+        super().put_object(Body, Key)
+        if self.race is not None:
+            race, self.race = self.race, None
+            race()
+
+
+def test_record_during_sync(tmp_path):
+    index = MetadataIndex(str(tmp_path / "sites.sqlite3"))
+    bucket = RacingBucket(index)
+    earlier = {"2023-12-01": metadata("success")}
+    bucket.store["metadata/success/site.com.json"] = json.dumps(json.dumps(earlier))
+    index.bootstrap(bucket)
+
+    index.record("site.com", "2024-01-01", metadata("fail"))
+    bucket.race = lambda: index.record("site.com", "2024-01-02", metadata("low_count"))
+    # Put in fail, changed meanwhile, so uploaded again and moved out of fail (where S3 has it now)
+    assert index.sync(bucket) == 2
+    assert sorted(bucket.store) == ["metadata/low_count/site.com.json"]
+    assert json.loads(bucket.store["metadata/low_count/site.com.json"]) == \
+        dict(earlier, **{"2024-01-01": metadata("fail"), "2024-01-02": metadata("low_count")})
+    assert index.pending() == 0
+    index.close()
@@ -0,0 +1,95 @@
+from src.webscraper.page_cache import PageCache, conditional_headers
+from src.webscraper.seen_store import content_hash
+from src.webscraper.thread import ScannerThread, page_result
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = text
+        self.url = "https://site.com/a"
+        self.headers = headers or {"Content-Type": "text/html"}
+
+
+class FakeStaticEngine:
+    """
+    Static engine answering every request with one response
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def request(self, link, timeout=10, validators=None):
+        self.requests.append(validators)
+        return self.response
+
+    def parse(self, response):
+        return page_result(["fresh"] * 60, [], validators={"etag": '"v2"'})
+
+    def read(self, response):
+        return (self.parse(response), False)
+
+    def close(self):
+        pass
+
+
+def cached_site(tmp_path):
+    cache = PageCache("site.com", str(tmp_path))
+    cache.store("https://site.com/a", page_result(["old", "text"], ["https://site.com/b"], canonical="",
+                                                  validators={"etag": '"v1"'}))
+    cache.save()
+    return PageCache("site.com", str(tmp_path))
+
+
+def test_conditional_headers():
+    assert conditional_headers({"etag": '"v1"', "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"}) == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+
+def test_unchanged_page_served_from_cache(tmp_path):
+    thread = ScannerThread(fetch_mode="static")
+    thread.static_engine = FakeStaticEngine(FakeResponse(304))
+    thread.page_cache = cached_site(tmp_path)
+
+    page = thread.fetch("https://site.com/a", True)
+    assert page["text"] == ["old", "text"] and page["links"] == ["https://site.com/b"]
+    assert thread.static_engine.requests == [{"etag": '"v1"'}]
+    assert thread.cached_pages == 1 and thread.static_pages == 0
+    assert thread.page_cache.hit_rate() == 100.0
+
+
+def test_changed_page_refetched_and_saved(tmp_path):
+    thread = ScannerThread(fetch_mode="static")
+    thread.static_engine = FakeStaticEngine(FakeResponse(200))
+    thread.page_cache = cached_site(tmp_path)
+
+    page = thread.fetch("https://site.com/a", True)
+    assert page["text"][0] == "fresh"
+    assert thread.page_cache.hits == 0
+    thread.page_cache.save()
+    assert PageCache("site.com", str(tmp_path)).get("https://site.com/a")["validators"] == {"etag": '"v2"'}
+
+
+def test_same_text_after_refetch_is_not_a_hit(tmp_path):
+    cache = cached_site(tmp_path)
+    cache.get("https://site.com/a")
+    cache.store("https://site.com/a", page_result(["old", "text"], []))
+    # Fetched again, so not served from the cache
+    assert (cache.hits, cache.unchanged, cache.hit_rate()) == (0, 1, 0.0)
+
+
+def test_recent_crawl_served_without_request(tmp_path):
+    thread = ScannerThread(fetch_mode="static")
+    thread.static_engine = FakeStaticEngine(FakeResponse(200))
+    thread.page_cache = cached_site(tmp_path)
+    thread.recently_crawled = lambda link: (0, content_hash(["old", "text"]))
+    page = thread.fetch("https://site.com/a", True)
+    assert page["text"] == ["old", "text"] and page["links"] == ["https://site.com/b"]
+    assert thread.static_engine.requests == [] and thread.cached_pages == 1
+
+    # Cache holds other text than the crawl the seen store recorded: fetched as usual
+    thread.recently_crawled = lambda link: (0, content_hash(["newer", "text"]))
+    assert thread.fetch("https://site.com/a", True)["text"][0] == "fresh"
+    assert thread.static_engine.requests == [{"etag": '"v1"'}]
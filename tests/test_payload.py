@@ -0,0 +1,50 @@
+import io
+import gzip
+import json
+
+from src.webscraper.payload import (PieceReader, double_encoded, encoded_payload, payload_pieces, read_payload,
+                                    read_text_chunks, write_payload)
+
+
+FIELDS = {"domain": "https://site.com", "date": "2024-01-01_00:00:00", "duration": 12.5, "count": 4}
+
+
+def test_pieces_match_json_dumps():
+    chunks = ["Hello \"quoted\" ", "café \U0001F600 ", "back\\slash\n "]
+    data = dict(FIELDS, html="".join(chunks))
+
+    assert "".join(payload_pieces(FIELDS, chunks)) == json.dumps(data, indent=2)
+    assert "".join(double_encoded(payload_pieces(FIELDS, chunks))) == json.dumps(json.dumps(data, indent=2))
+    assert json.loads(json.loads("".join(double_encoded(payload_pieces(FIELDS, []))))) == dict(FIELDS, html="")
+
+
+def test_stream_from_file(tmp_path):
+    text_file = tmp_path / "site.txt"
+    text = "word " * 50000
+    text_file.write_text(text)
+    expected = json.dumps(json.dumps(dict(FIELDS, html=text), indent=2)).encode("utf-8")
+
+    reader = PieceReader(double_encoded(payload_pieces(FIELDS, read_text_chunks(str(text_file), size=1000))))
+    assert reader.read() == expected
+
+    out = io.BytesIO()
+    assert write_payload(out, double_encoded(payload_pieces(FIELDS, read_text_chunks(str(text_file))))) == len(expected)
+    assert out.getvalue() == expected
+    assert list(read_text_chunks(str(tmp_path / "missing.txt"))) == []
+
+
+def test_formats_read_back_alike():
+    chunks = ["Hello \"quoted\" ", "café \U0001F600 ", "new\nline "] * 1000
+    expected = dict(FIELDS, html="".join(chunks))
+    sizes = {}
+    for payload_format in ["legacy", "json", "ndjson"]:
+        pieces, compress, extra_args = encoded_payload(FIELDS, iter(chunks), payload_format)
+        body = PieceReader(pieces, compress).read()
+        sizes[payload_format] = len(body)
+        assert read_payload(body) == expected
+        assert (extra_args.get("ContentEncoding") == "gzip") == compress
+
+    pieces, compress, _ = encoded_payload(FIELDS, iter(chunks), "json")
+    assert json.loads(gzip.decompress(PieceReader(pieces, compress).read()))["payload_version"] == 2
+    assert sizes["json"] * 4 < sizes["legacy"] and sizes["ndjson"] * 4 < sizes["legacy"]
+    assert read_payload(json.dumps({"a": 1}).encode()) == {"a": 1} # Plain JSON objects too
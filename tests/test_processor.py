@@ -0,0 +1,61 @@
+from src.webscraper import processor
+from src.webscraper.processor import Processor, clean_page, strip_numbers
+from src.webscraper.token_store import TokenStore
+
+
+class FakeQueue:
+    def __init__(self, text):
+        self.text = TokenStore.from_pages(text)
+        self.english = True
+
+
+def test_clean_page():
+    page = ["The", "quick,", "brown", "fox's", "running", "42", "km/h!", "Companies", "who're"]
+    assert clean_page(page) == ["quick", "brown", "fox", "run", "km", "h", "compani"]
+    assert clean_page([]) == []
+
+
+def test_strip_numbers():
+    assert strip_numbers(["a", "12", "-3.5", "1e6", "b2", "4th", "."]) == ["a", "b2", "4th", "."]
+
+
+def test_numbers_dropped_the_same_way():
+    numbers = ["1e6", "-3", "2.5", "+7", ".5", "1.5e-3"]
+    assert strip_numbers(numbers) == [] and clean_page(numbers) == []
+    # Not split by the punctuation step into words that would be kept
+    assert clean_page(["Growth", "1.5e-3", "(12)", "42,"]) == ["growth"]
+
+
+def test_replace_stem_words():
+    assert Processor(FakeQueue([])).replace_stem_words(["Running", "was"]) == ["run", "wa"]
+
+
+def test_counts():
+    p = Processor(FakeQueue([["The", "cat", "sat"], [], ["on", "the", "mat"]]))
+    p.run_processes()
+    assert (p.word_count, p.page_count, p.stop_word_count) == (6, 2, 3)
+    assert list(p.clean_pages()) == [["cat", "sat"], [], ["mat"]]
+    assert p.get_text() == "The cat sat on the mat "
+
+
+def test_clean_file_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(processor, "BLOCK_SIZE", 7) # Cuts words between blocks
+    words = ["Running", "the", "connections", "123", "quickly,", "published"] * 20
+    source = tmp_path / "site.txt"
+    source.write_text(" ".join(words) + " ")
+
+    Processor(FakeQueue([])).clean_file(str(source), str(tmp_path / "clean.txt"))
+    assert (tmp_path / "clean.txt").read_text().split() == clean_page(words)
+
+    Processor(FakeQueue([])).clean_file(str(source))
+    assert source.read_text().split() == clean_page(words)
+
+
+def test_tokens_normalized_once(monkeypatch):
+    monkeypatch.setattr(processor, "NORMALIZED_WORDS", processor.NormalizedWords())
+    monkeypatch.setattr(processor, "STEM_CACHE_SIZE", 2)
+    stemmed = []
+    monkeypatch.setattr(processor.STEMMER, "stem", lambda word: stemmed.append(word) or word[:4])
+    assert clean_page(["Running", "the", "running", "2024", "Walking", "jumping"]) == ["runn", "runn", "walk", "jump"]
+    assert stemmed == ["running", "walking", "jumping"] # Once per distinct token
+    assert dict(processor.NORMALIZED_WORDS) == {"running": "runn", "the": ""} # Bounded at STEM_CACHE_SIZE
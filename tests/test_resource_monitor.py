@@ -0,0 +1,15 @@
+import csv
+
+from src.webscraper.resource_monitor import ResourceSampler
+
+
+def test_csv_keeps_original_columns_first(tmp_path):
+    sampler = ResourceSampler()
+    sampler.samples.append((100.0, 40.5, 12.25, 310.2, "https://site.com/a"))
+    sampler.samples.append((200.0, 41.0, 80.0, 512.0, "https://site.com/a https://site.com/b"))
+    path = tmp_path / "cpu_ram.csv"
+    sampler.write_csv(str(path), start_time=150)
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    # Headerless ram, cpu, links as before; time and Chrome RSS appended
+    assert rows == [["41.0", "80.0", "https://site.com/a https://site.com/b", "200.0", "512.0"]]
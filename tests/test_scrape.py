@@ -0,0 +1,212 @@
+import io
+import os
+import pickle
+import functools
+import contextlib
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from src.webscraper import scrape
+from src.webscraper import uploader as uploader_module
+from src.webscraper.backends import LocalBucket, LocalClient, LocalQueue
+from src.webscraper.spill import PageSpill, spill_path
+from src.webscraper.sqs_consumer import SQSConsumer
+from src.webscraper.uploader import Uploader
+
+
+class FakeDriverPool:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def warm(self, count=None):
+        pass
+
+    def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def fake_crawl(url, driver_pool=None, sampler=None, seen_store=None, spill_file=None):
+    result = scrape.new_result(url)
+    result["code"] = 200
+    result["total_words"] = 600
+    result["text_file"] = os.path.join(os.getcwd(), f"{result['home_domain']}.txt")
+    with open(result["text_file"], 'w', encoding='utf-8') as f:
+        f.write(" ".join(f"word{n}" for n in range(600)))
+    return result
+
+
+def run_main(monkeypatch, tmp_path, domains, number_links, client=None, processes=1):
+    """
+    Run scrape.main in tmp_path on local backends with a fake crawl
+
+    Returns: (queue, bucket, uploader)
+    """
+    monkeypatch.chdir(tmp_path)
+    queue = LocalQueue()
+    for domain in domains:
+        queue.send_message(MessageBody="", MessageAttributes={"domain": {"StringValue": domain, "DataType": "String"}})
+    bucket = LocalBucket("results", root=str(tmp_path / "storage"))
+    uploader = Uploader(client or LocalClient(root=str(tmp_path / "storage")), "results", num_workers=2)
+    monkeypatch.setattr(scrape, "s3_bucket", lambda name: bucket)
+    monkeypatch.setattr(scrape, "sqs_queue", lambda name: queue)
+    monkeypatch.setattr(scrape, "shared_uploader", lambda: uploader)
+    monkeypatch.setattr(scrape, "SQSConsumer", functools.partial(SQSConsumer, wait_time=0, heartbeat_interval=0.05))
+    monkeypatch.setattr(scrape, "crawl_site", fake_crawl)
+    monkeypatch.setattr(scrape, "DriverPool", FakeDriverPool)
+    monkeypatch.setattr(scrape, "max_processes", lambda: processes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scrape.main("queue", number_links)
+    uploader.close()
+    return queue, bucket, uploader
+
+
+def test_main_stops_when_queue_runs_dry(monkeypatch, tmp_path):
+    queue, bucket, uploader = run_main(monkeypatch, tmp_path, ["a.com", "b.com"], number_links=5)
+    assert len(queue) == 0 and queue.received == 2 # No more long polls once the queue is empty
+    assert [summary.key for summary in bucket.objects.filter(Prefix="html_data/")] == \
+        ["html_data/a.com.json", "html_data/b.com.json"]
+    assert bucket.objects.filter(Prefix="flagged_links/error_links/") == []
+
+
+class FailingClient(LocalClient):
+    """
+    LocalClient whose uploads of site data always fail
+    """
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        if Key.startswith("html_data/b.com"):
+            raise ConnectionError("connection reset")
+        super().upload_fileobj(Fileobj, Bucket, Key, ExtraArgs, **kwargs)
+
+
+def test_message_kept_until_uploads_succeed(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploader_module, "UPLOAD_BACKOFF", 0.001)
+    client = FailingClient(root=str(tmp_path / "storage"))
+    queue, bucket, uploader = run_main(monkeypatch, tmp_path, ["a.com", "b.com"], number_links=2, client=client)
+    assert uploader.failed == 1
+    # a.com is stored and deleted; b.com's upload was given up, so its message is back on the queue
+    assert [message.message_attributes["domain"]["StringValue"] for message in queue.receive_messages(
+        MessageAttributeNames=["All"], MaxNumberOfMessages=10)] == ["b.com"]
+    assert len(queue) == 1
+
+
+class FakeExecutor:
+    """
+    Worker pool running crawls inline. Crawling a domain starting with
+    "dies" kills its worker, which breaks the pool as ProcessPoolExecutor does
+    """
+    created = []
+
+    def __init__(self, num_processes):
+        self.broken = False
+        FakeExecutor.created.append(self)
+
+    def submit(self, fn, url, **kwargs):
+        if self.broken:
+            raise BrokenProcessPool("A child process terminated abruptly, the process pool is not usable anymore")
+        future = Future()
+        if url.startswith("http://dies"):
+            self.broken = True
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        else:
+            future.set_result(fn(url, **kwargs))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_broken_worker_pool_replaced_and_sites_released(monkeypatch, tmp_path):
+    FakeExecutor.created = []
+    monkeypatch.setattr(scrape, "new_executor", FakeExecutor)
+    queue, bucket, uploader = run_main(monkeypatch, tmp_path, ["a.com", "dies.com", "b.com", "c.com"],
+                                       number_links=4, processes=3)
+    assert len(FakeExecutor.created) == 2 # Replaced once, not once per failed site
+    assert [summary.key for summary in bucket.objects.filter(Prefix="html_data/")] == \
+        ["html_data/a.com.json", "html_data/c.com.json"]
+    # Neither the site that killed its worker nor the one refused by the broken pool is lost
+    assert bucket.objects.filter(Prefix="flagged_links/error_links/") == []
+    assert sorted(message.message_attributes["domain"]["StringValue"] for message in queue.receive_messages(
+        MessageAttributeNames=["All"], MaxNumberOfMessages=10)) == ["b.com", "dies.com"]
+
+
+def test_processes_bounded_by_memory(monkeypatch):
+    monkeypatch.setattr(scrape, "NUM_PROCESSES", 8)
+    monkeypatch.setattr(scrape, "PROCESS_MEMORY_MB", 1000)
+    monkeypatch.setattr(scrape, "available_memory_mb", lambda: 3500)
+    assert scrape.max_processes() == 3
+    monkeypatch.setattr(scrape, "available_memory_mb", lambda: 200)
+    assert scrape.max_processes() == 1 # Always crawl something
+    monkeypatch.setattr(scrape, "available_memory_mb", lambda: 64000)
+    assert scrape.max_processes() == 8
+
+    def unreadable():
+        raise OSError("no /proc")
+    monkeypatch.setattr(scrape, "available_memory_mb", unreadable)
+    assert scrape.max_processes() == 8 # Trust params.json
+
+
+def test_dead_worker_site_recovered_from_spill(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    empty = PageSpill(spill_path("http://site.com"))
+    empty.append([], "http://site.com")
+    empty.close()
+    assert scrape.recover_site("http://site.com", empty.path) is None # Nothing spilled, nothing to keep
+    assert not os.path.exists(empty.path)
+
+    spill = PageSpill(spill_path("http://site.com"))
+    assert spill.path != empty.path # One file per crawl, even for the same site on the same day
+    spill.append(["first", "page"], "http://site.com")
+    spill.append([], "http://site.com/empty")
+    spill.append(["second"], "http://site.com/b")
+    spill.close()
+    with open(spill.path, "a", encoding="utf-8") as f:
+        f.write('{"url": "http://site.com/c", "cou') # Worker killed mid-write
+
+    result = scrape.recover_site("http://site.com", spill.path)
+    assert result["timeout"] and result["total_words"] == 3 # Uploaded as partial data
+    with open(result["text_file"], encoding="utf-8") as f:
+        assert f.read() == "first page second "
+    assert result["spill_file"] == spill.path
+
+
+class FakeSmartQueue:
+    def __init__(self, url, **kwargs):
+        self.root = url
+        self.home_domain = "site.com"
+        self.timeout = False
+        self.total_words = 3
+        self.page_cache = None
+        self.english = True
+        self.text = [["one", "two"], ["three"]]
+        self.text_file = os.path.join(os.getcwd(), "site.com.txt")
+        self.spill_file = os.path.join(os.getcwd(), "site.com.ndjson")
+
+    def run_all(self):
+        pass
+
+
+class FakeResponse:
+    status_code = 200
+
+
+def test_worker_result_sent_to_parent(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scrape.requests, "get", lambda url: FakeResponse())
+    monkeypatch.setattr(scrape, "SmartQueue", FakeSmartQueue)
+    result = scrape.crawl_site("http://site.com", driver_pool=FakeDriverPool())
+    assert pickle.loads(pickle.dumps(result)) == result # Crosses the process boundary as is
+    assert set(result) == set(scrape.new_result("http://site.com"))
+    assert (result["code"], result["total_words"], result["error"]) == (200, 3, None)
+    with open(result["text_file"], encoding="utf-8") as f:
+        assert f.read() == "one two three " # Text stays on disk, only its path is sent
+
+    def crash(self):
+        raise RuntimeError("driver crashed")
+    monkeypatch.setattr(FakeSmartQueue, "run_all", crash)
+    failed = scrape.crawl_site("http://site.com", driver_pool=FakeDriverPool())
+    assert failed["error"] == "driver crashed" and failed["text_file"] is None
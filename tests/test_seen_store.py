@@ -0,0 +1,54 @@
+import time
+
+from src.webscraper.frontier import Frontier
+from src.webscraper.seen_store import SeenStore, content_hash
+
+
+def test_record_and_reopen(tmp_path):
+    path = str(tmp_path / "urls")
+    store = SeenStore(path, capacity=1000)
+    assert store.get("https://site.com/a") is None
+    assert store.record("https://site.com/a", content_hash(["hello", "world"]), crawled_at=100)
+    assert store.record("https://site.com/a", 7, crawled_at=200) # Replaces earlier crawl
+    assert store.get("https://site.com/a") == (200, 7)
+    assert len(store) == 1
+    store.close()
+
+    store = SeenStore(path, capacity=5) # Existing store keeps its capacity
+    assert store.capacity == 1000
+    assert store.get("https://site.com/a") == (200, 7)
+    store.close()
+
+
+def test_bloom_rebuilt_from_table(tmp_path):
+    path = str(tmp_path / "urls")
+    store = SeenStore(path, capacity=100)
+    for n in range(50):
+        store.record(f"https://site.com/{n}", n)
+    store.close()
+    (tmp_path / "urls.bloom").unlink()
+
+    store = SeenStore(path, capacity=100)
+    assert all(store.get(f"https://site.com/{n}")[1] == n for n in range(50))
+    store.close()
+
+
+def test_full_store_refuses_new_urls(tmp_path):
+    store = SeenStore(str(tmp_path / "urls"), capacity=3)
+    assert all(store.record(f"https://site.com/{n}", n) for n in range(3))
+    assert not store.record("https://site.com/new", 0)
+    assert store.record("https://site.com/0", 1) # Updates still allowed
+    store.close()
+
+
+def test_frontier_reports_recent_crawls(tmp_path):
+    store = SeenStore(str(tmp_path / "urls"), capacity=100)
+    store.record("https://site.com/fresh", 7)
+    store.record("https://site.com/stale", 0, crawled_at=time.time() - 7200)
+
+    frontier = Frontier(store, recrawl_after=3600)
+    assert frontier.recently_crawled("https://site.com/fresh")[1] == 7
+    assert frontier.recently_crawled("https://site.com/stale") is None
+    assert not frontier.seen("https://site.com/fresh") # Still queued, so its links are followed
+    assert Frontier(store).recently_crawled("https://site.com/fresh") is None # recrawl_after 0 fetches every page
+    store.close()
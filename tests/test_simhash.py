@@ -0,0 +1,47 @@
+import random
+
+from src.webscraper.simhash import FingerprintIndex, fingerprint, hamming
+
+
+def page(seed, length=300):
+    rng = random.Random(seed)
+    return [f"word{rng.randint(0, 5000)}" for _ in range(length)]
+
+
+def test_near_duplicates_are_close():
+    original = page(1)
+    variant = list(original)
+    variant[10:14] = ["Français", "Deutsch", "Español", "Print"] # Locale switcher / print view
+    other = page(2)
+
+    # The 4 words changed touch 6 of the 298 shingles: a few bits, far fewer than an unrelated page
+    assert hamming(fingerprint(original), fingerprint(variant)) <= 5
+    assert hamming(fingerprint(original), fingerprint(other)) > 20
+
+
+def test_short_pages_not_fingerprinted():
+    assert fingerprint(["too", "short"]) is None
+    assert not FingerprintIndex(3).is_duplicate(None)
+
+
+def test_index_finds_within_distance():
+    index = FingerprintIndex(3)
+    base = fingerprint(page(1))
+    assert not index.is_duplicate(base)
+    assert index.is_duplicate(base ^ 0b1011) # 3 bits apart
+    assert not index.is_duplicate(base ^ 0b1111) # 4 bits apart, stored
+    assert index.size == 2
+    assert index.find(base ^ 0b1111 ^ (1 << 63)) == base ^ 0b1111
+
+
+def test_shared_boilerplate_not_duplicate():
+    nav = "Home About Products Services Blog Careers Contact Login Search Menu".split()
+    footer = ("Copyright 2024 Example Inc All rights reserved Privacy Policy Terms of Use Cookie Settings "
+              "Follow us on Twitter Facebook LinkedIn Subscribe to our newsletter").split()
+    body = page(1, 80)
+    other = list(body)
+    random.Random(1).shuffle(other) # Same words, so single-word fingerprints would be identical
+    first, second = fingerprint(nav + body + footer), fingerprint(nav + other + footer)
+    assert hamming(first, second) > 10
+    index = FingerprintIndex(3)
+    assert not index.is_duplicate(first) and not index.is_duplicate(second)
@@ -0,0 +1,181 @@
+import time
+import threading
+
+from src.webscraper import smart_queue
+from src.webscraper.deadline import Deadline
+from src.webscraper.frontier import Frontier
+from src.webscraper.smart_queue import SmartQueue
+from src.webscraper.seen_store import SeenStore
+from src.webscraper.token_store import TokenStore
+
+
+def words(name, count=80):
+    return [f"{name}{n}" for n in range(count)]
+
+
+class FakeScannerThread:
+    """
+    Stand-in for ScannerThread serving pages from a dict of link -> (text, links, canonical)
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.thread = None
+
+    def scan_page(self, link, continue_link_gathering, keep=None, deadline=None):
+        text, links, canonical = self.pages[link]
+        return (list(text), keep(links) if keep is not None else links, canonical)
+
+    def release_driver(self, failed=False):
+        pass
+
+    def quit(self):
+        pass
+
+
+def scan(tmp_path, pages, recrawl_after=0, crawled=()):
+    seen_store = SeenStore(str(tmp_path / "urls"), capacity=1000)
+    for link in crawled:
+        seen_store.record(link, 0, crawled_at=1000) # Crawled by an earlier run
+    queue = SmartQueue("https://site.com", num_threads=1, max_links=20, seen_store=seen_store)
+    queue.queue = Frontier(seen_store, recrawl_after)
+    queue.text = TokenStore()
+    queue.fingerprints = None # Only rel=canonical decides duplicates here
+    queue.scanner_threads = [FakeScannerThread(pages)]
+    queue.home_domain = "site.com"
+    queue.original_link_count = 1
+    queue.populate_queue(["https://site.com"])
+    queue.start_time = time.time()
+    queue.visit_all_links()
+    queue.crawl_times = {link: seen_store.get(link)[0] for link in pages}
+    seen_store.close()
+    return queue
+
+
+def test_canonical_pointing_home_keeps_distinct_subpages(tmp_path):
+    home = words("home")
+    pages = {
+        "https://site.com": (home, ["https://site.com/a", "https://site.com/copy"], "https://site.com"),
+        # Misconfigured site: every page names the home page canonical
+        "https://site.com/a": (words("about"), ["https://site.com/b"], "https://site.com"),
+        "https://site.com/b": (words("blog"), [], "https://site.com"),
+        "https://site.com/copy": (home, ["https://site.com/c"], "https://site.com/"),
+        "https://site.com/c": (words("contact"), [], ""),
+    }
+    queue = scan(tmp_path, pages)
+    assert sorted(queue.visited_links) == sorted(pages)
+    kept = dict(zip(queue.visited_links, queue.text)) # Pages in scan order
+    assert kept["https://site.com/a"][0] == "about0" and kept["https://site.com/b"][0] == "blog0"
+    # A true copy of its canonical page is dropped, but the links on it are still followed
+    assert kept["https://site.com/copy"] == [] and queue.duplicate_pages == 1
+    assert kept["https://site.com/c"][0] == "contact0"
+
+
+def test_recent_crawls_still_scanned_for_text_and_links(tmp_path, monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 2000.0)
+    pages = {
+        "https://site.com": (words("home"), ["https://site.com/a"], ""),
+        "https://site.com/a": (words("about"), ["https://site.com/b"], ""), # Only way to reach /b
+        "https://site.com/b": (words("blog"), [], ""),
+    }
+    queue = scan(tmp_path, pages, recrawl_after=3600, crawled=["https://site.com/a"])
+    assert sorted(queue.visited_links) == sorted(pages)
+    assert queue.total_words == 240 # Text of the recently crawled page is kept
+    # A recent crawl keeps its time, so the page is fetched again once recrawl_after has passed
+    assert queue.crawl_times == {"https://site.com": 2000, "https://site.com/a": 1000, "https://site.com/b": 2000}
+
+
+class HookedScannerThread(FakeScannerThread):
+    """
+    FakeScannerThread that runs hooks[link]() before returning a page, to
+    hold a page open or make threads meet
+    """
+
+    def __init__(self, pages, hooks):
+        super().__init__(pages)
+        self.hooks = hooks
+        self.scanned = []
+        self.quit_called = False
+
+    def scan_page(self, link, continue_link_gathering, keep=None, deadline=None):
+        self.scanned.append(link)
+        if link in self.hooks:
+            self.hooks[link]()
+        return super().scan_page(link, continue_link_gathering, keep, deadline)
+
+    def quit(self):
+        self.quit_called = True
+
+
+def run_threads(tmp_path, threads, deadline=60):
+    """
+    Scan the site with threads; the queue's seen store is left open for threads still running
+
+    Returns: SmartQueue
+    """
+    seen_store = SeenStore(str(tmp_path / "urls"), capacity=1000)
+    queue = SmartQueue("https://site.com", num_threads=len(threads), max_links=20, seen_store=seen_store)
+    queue.text = TokenStore()
+    queue.fingerprints = None
+    queue.scanner_threads = threads
+    queue.home_domain = "site.com"
+    queue.original_link_count = 1
+    queue.populate_queue(["https://site.com"])
+    queue.start_time = time.time()
+    queue.deadline = Deadline(deadline)
+    started = time.monotonic()
+    queue.visit_all_links()
+    queue.elapsed = time.monotonic() - started
+    return queue
+
+
+def test_idle_threads_wait_for_links_from_pages_in_flight(tmp_path):
+    pages = {
+        "https://site.com": (words("home"), ["https://site.com/a", "https://site.com/b"], ""),
+        "https://site.com/a": (words("about"), [], ""),
+        "https://site.com/b": (words("blog"), [], ""),
+    }
+    meet = threading.Barrier(2, timeout=5) # /a and /b only finish if scanned at the same time
+    hooks = {"https://site.com": lambda: time.sleep(0.2), # Other thread finds the queue empty meanwhile
+             "https://site.com/a": meet.wait, "https://site.com/b": meet.wait}
+    threads = [HookedScannerThread(pages, hooks), HookedScannerThread(pages, hooks)]
+    queue = run_threads(tmp_path, threads)
+    # The idle thread waited for the root page's links instead of exiting, so both links ran at once
+    assert sorted(queue.visited_links) == sorted(pages) and not meet.broken
+    assert queue.total_words == 240 and queue.complete and not queue.timeout
+    assert sorted(len(thread.scanned) for thread in threads) == [1, 2]
+    assert all(thread.quit_called for thread in threads)
+    queue.seen_store.close()
+
+
+def test_completion_wakes_every_waiter(tmp_path):
+    pages = {"https://site.com": (words("home"), [], "")}
+    hooks = {"https://site.com": lambda: time.sleep(0.2)}
+    threads = [HookedScannerThread(pages, hooks) for _ in range(4)]
+    queue = run_threads(tmp_path, threads, deadline=60)
+    assert queue.complete and not queue.timeout
+    assert queue.elapsed < 5 # Waiters woken when the last page finished, not at the deadline
+    assert not any(thread.thread.is_alive() for thread in threads)
+    assert sum(len(thread.scanned) for thread in threads) == 1
+    queue.seen_store.close()
+
+
+def test_deadline_wakes_every_waiter(tmp_path, monkeypatch):
+    monkeypatch.setattr(smart_queue, "JOIN_GRACE", 0.05)
+    pages = {"https://site.com": (words("home"), ["https://site.com/a"], ""),
+             "https://site.com/a": (words("about"), [], "")}
+    release = threading.Event()
+    hooks = {"https://site.com": lambda: release.wait(10)} # Page that outlives the deadline
+    threads = [HookedScannerThread(pages, hooks) for _ in range(3)]
+    queue = run_threads(tmp_path, threads, deadline=0.3)
+    assert queue.timeout and queue.elapsed < 5
+    stuck = [thread for thread in threads if thread.scanned]
+    waiters = [thread for thread in threads if not thread.scanned]
+    assert len(stuck) == 1 and stuck[0].abandoned
+    # Threads waiting for links were released by the deadline and exited
+    assert all(not thread.thread.is_alive() and thread.quit_called for thread in waiters)
+
+    release.set()
+    stuck[0].thread.join(5)
+    assert queue.visited_links == ["https://site.com"] # Links from the late page are not followed
+    queue.seen_store.close()
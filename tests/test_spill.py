@@ -0,0 +1,56 @@
+from src.webscraper.processor import Processor
+from src.webscraper.spill import PageSpill, read_spill
+
+
+class FakeQueue:
+    def __init__(self, text):
+        self.text = text
+        self.english = True
+
+
+def test_pages_read_back_lazily(tmp_path):
+    spill = PageSpill(str(tmp_path / "results" / "site.com.ndjson"))
+    assert list(spill) == [] and not (tmp_path / "results").exists() # Nothing written until a page arrives
+
+    spill.append(["The", "cat", "sat"], "https://site.com/a")
+    spill.append([], "https://site.com/b")
+    spill.append(["on", "the", "mat"], "https://site.com/c")
+
+    assert list(spill) == [["The", "cat", "sat"], [], ["on", "the", "mat"]]
+    assert [record["url"] for record in spill.records()] == ["https://site.com/a", "https://site.com/b",
+                                                            "https://site.com/c"]
+    assert (len(spill), spill.word_count(), spill.page_count()) == (3, 6, 2)
+
+    p = Processor(FakeQueue(spill))
+    p.run_processes()
+    assert (p.word_count, p.page_count, p.stop_word_count) == (6, 2, 3)
+    p.write_text(str(tmp_path / "site.com.txt"))
+    assert (tmp_path / "site.com.txt").read_text() == "The cat sat on the mat "
+    spill.close()
+
+
+def test_resume_after_crash(tmp_path):
+    path = str(tmp_path / "site.com.ndjson")
+    spill = PageSpill(path)
+    spill.append(["kept", "page"], "https://site.com/a")
+    spill.close()
+    with open(path, "a") as f:
+        f.write('{"url": "https://site.com/b", "count": 2, "te') # Cut short by the crash
+
+    assert [record["count"] for record in read_spill(path)] == [2]
+    resumed = PageSpill(path, resume=True)
+    assert resumed.word_count() == 2
+    resumed.append(["more"], "https://site.com/c")
+    resumed.close()
+    assert list(PageSpill(path, resume=True)) == [["kept", "page"], ["more"]]
+
+    assert list(PageSpill(path)) == [] # A new crawl starts empty
+
+
+def test_appends_after_close_dropped(tmp_path):
+    spill = PageSpill(str(tmp_path / "site.com.ndjson"))
+    spill.append(["kept"], "https://site.com/a")
+    spill.close()
+    spill.append(["late"], "https://site.com/b") # Thread that overran the deadline
+    assert spill.file is None and list(spill) == [["kept"]] and spill.word_count() == 1
+    spill.close()
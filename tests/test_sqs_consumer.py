@@ -0,0 +1,105 @@
+import time
+import threading
+
+from src.webscraper.sqs_consumer import SQSConsumer
+
+
+class FakeMessage:
+    def __init__(self, body, receipt_handle):
+        self.body = body
+        self.receipt_handle = receipt_handle
+        self.message_attributes = {"domain": {"StringValue": body, "DataType": "String"}}
+
+
+class FakeQueue:
+    """
+    In-process stand-in for a boto3 SQS Queue: received messages are hidden
+    until their visibility timeout runs out, then handed out again
+    """
+
+    def __init__(self, bodies):
+        self.visible_at = {body: 0.0 for body in bodies} # body -> time it can be received again
+        self.handles = {} # receipt handle -> body
+        self.receives = []
+        self.deliveries = {}
+        self.delete_calls = 0
+        self.lock = threading.Lock()
+
+    def receive_messages(self, MessageAttributeNames, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=30):
+        with self.lock:
+            now = time.monotonic()
+            bodies = [body for body, at in self.visible_at.items() if at <= now][:MaxNumberOfMessages]
+            self.receives.append((MaxNumberOfMessages, WaitTimeSeconds))
+            messages = []
+            for body in bodies:
+                self.visible_at[body] = now + VisibilityTimeout
+                self.deliveries[body] = self.deliveries.get(body, 0) + 1
+                handle = f"{body}-{self.deliveries[body]}"
+                self.handles[handle] = body
+                messages.append(FakeMessage(body, handle))
+            return messages
+
+    def change_message_visibility_batch(self, Entries):
+        assert len(Entries) <= 10
+        with self.lock:
+            for entry in Entries:
+                body = self.handles[entry["ReceiptHandle"]]
+                self.visible_at[body] = time.monotonic() + entry["VisibilityTimeout"]
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries]}
+
+    def delete_messages(self, Entries):
+        assert len(Entries) <= 10
+        with self.lock:
+            self.delete_calls += 1
+            for entry in Entries:
+                self.visible_at.pop(self.handles[entry["ReceiptHandle"]], None)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries]}
+
+
+def test_receives_batches_and_deletes_in_batches():
+    queue = FakeQueue([f"site{n}.com" for n in range(25)])
+    consumer = SQSConsumer(queue, batch_size=10, wait_time=20, visibility_timeout=60)
+    messages = [consumer.get() for _ in range(25)]
+
+    assert [message.body for message in messages] == [f"site{n}.com" for n in range(25)]
+    assert messages[0].message_attributes["domain"]["StringValue"] == "site0.com"
+    assert queue.receives == [(10, 20), (10, 20), (10, 20)]
+    for message in messages:
+        message.delete()
+    assert queue.delete_calls == 2 and len(queue.visible_at) == 5 # Last 5 wait for a full batch
+    consumer.close()
+    assert queue.delete_calls == 3 and len(queue.visible_at) == 0
+    assert consumer.get() is None
+
+
+def test_limit_and_close_release_unused_messages():
+    queue = FakeQueue([f"site{n}.com" for n in range(10)])
+    consumer = SQSConsumer(queue, wait_time=0, visibility_timeout=60)
+    first = consumer.get(limit=3)
+    assert queue.receives == [(3, 0)]
+    first.delete()
+    consumer.close() # Two buffered messages go back to the queue right away
+
+    other = SQSConsumer(queue, wait_time=0, visibility_timeout=60)
+    bodies = {other.get().body for _ in range(9)}
+    assert bodies == {f"site{n}.com" for n in range(1, 10)}
+    other.close()
+
+
+def test_heartbeat_keeps_long_site_hidden():
+    queue = FakeQueue(["slow.com", "fast.com"])
+    consumer = SQSConsumer(queue, wait_time=0, visibility_timeout=0.3, heartbeat_interval=0.05)
+    slow = consumer.get(limit=1)
+    time.sleep(0.8) # Crawl runs well past the visibility timeout
+    other = SQSConsumer(queue, wait_time=0, visibility_timeout=60)
+    assert other.get().body == "fast.com" # slow.com was not handed out again
+    slow.delete()
+    consumer.close()
+    other.close()
+    assert queue.deliveries["slow.com"] == 1 and "slow.com" not in queue.visible_at
+
+    # Without heartbeats the message would have gone to another consumer
+    queue = FakeQueue(["slow.com"])
+    queue.receive_messages(["All"], VisibilityTimeout=0.05)
+    time.sleep(0.1)
+    assert queue.receive_messages(["All"])[0].receipt_handle == "slow.com-2"
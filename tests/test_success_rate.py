@@ -0,0 +1,71 @@
+from conftest import FakeBucket
+from src.webscraper.success_rate import (SuccessRateCounter, claim_slot, encode, rate_data, read_success_rate,
+                                         shard_name, write_summary)
+
+
+def test_counts_flushed_on_interval_and_shutdown():
+    bucket = FakeBucket()
+    counter = SuccessRateCounter(bucket, "host-1", flush_interval=3600)
+    for status in ["success", "success", "fail", "bad"]:
+        counter.add(status)
+    assert bucket.puts == 0 # No S3 round-trip per site
+
+    assert counter.flush() and bucket.puts == 1
+    assert counter.flush() and bucket.puts == 1 # Unchanged, nothing to upload
+    assert read_success_rate(bucket) == rate_data(2, 1, 1)
+
+    eager = SuccessRateCounter(bucket, "host-2", flush_interval=0)
+    eager.add("success")
+    assert bucket.puts == 2
+
+
+def test_shards_merged_with_legacy_totals():
+    bucket = FakeBucket()
+    bucket.put_object(Body=encode(rate_data(10, 10, 5)), Key="success_rate/success-fail.json")
+    workers = [SuccessRateCounter(bucket, f"host-{n}", flush_interval=3600) for n in range(3)]
+    for worker in workers:
+        worker.add("success")
+        worker.add("fail")
+        worker.flush()
+
+    merged = write_summary(bucket)
+    assert merged == {"success": 13, "fail": 13, "bad_site": 5, "rate": "50.0%"}
+    assert read_success_rate(bucket) == merged # Summary object is not counted as a shard
+
+
+def test_later_runs_continue_their_shard(tmp_path):
+    bucket = FakeBucket()
+    slot, lock_file = claim_slot(str(tmp_path))
+    other_slot, other_lock = claim_slot(str(tmp_path))
+    assert (slot, other_slot) == (0, 1) # Slot 0 is held by the first scraper
+    other_lock.close()
+    for run in range(3):
+        counter = SuccessRateCounter(bucket, shard_name(slot), flush_interval=3600)
+        counter.add("success")
+        counter.add("fail")
+        counter.flush()
+    lock_file.close()
+    assert claim_slot(str(tmp_path))[0] == 0 # Free again once released
+    assert list(bucket.store) == [f"success_rate/shards/{shard_name(0)}.json"] # No shard per run
+    assert read_success_rate(bucket) == rate_data(3, 3, 0)
+
+
+class UnreadableBucket(FakeBucket):
+    def __init__(self):
+        super().__init__()
+        self.readable = False
+
+    def Object(self, key):
+        if not self.readable:
+            raise ConnectionError("connection reset")
+        return super().Object(key)
+
+
+def test_shard_not_overwritten_before_it_is_read():
+    bucket = UnreadableBucket()
+    bucket.put_object(Body=encode(rate_data(5, 5, 0)), Key="success_rate/shards/host-0.json")
+    counter = SuccessRateCounter(bucket, "host-0", flush_interval=3600)
+    counter.add("success")
+    assert not counter.flush() and bucket.puts == 1 # Earlier totals unknown, not uploaded
+    bucket.readable = True
+    assert counter.flush() and read_success_rate(bucket) == rate_data(6, 5, 0)
@@ -0,0 +1,220 @@
+import logging
+
+import requests
+
+from requests.structures import CaseInsensitiveDict
+
+from src.webscraper.thread import (EXTRACT_SCRIPT, FETCH_POLICY, PageParser, ScannerThread, StaticFetchEngine,
+                                   extract_page, html_encoding, page_result)
+
+
+def html_response(body, content_type="text/html", status_code=200, url="https://site.com/a"):
+    """
+    requests Response for raw bytes, with its encoding set from the headers as requests does
+    """
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers = CaseInsensitiveDict({"Content-Type": content_type})
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = url
+    return response
+
+
+def page_html(body, head=""):
+    return f"<html><head>{head}</head><body>{body}</body></html>"
+
+
+TEXT = " ".join(f"word{n}" for n in range(60))
+
+
+def test_meta_charset_used_when_header_has_none():
+    response = html_response(page_html(f"<p>café {TEXT}</p>", '<meta charset="utf-8">').encode("utf-8"))
+    assert "cafÃ©" in response.text # requests' fallback for text/html without a charset
+    assert html_encoding(response) == "utf-8"
+    assert StaticFetchEngine().parse(response)["text"][0] == "café"
+
+    legacy = html_response(page_html(f"<p>café {TEXT}</p>", '<meta http-equiv="Content-Type" '
+                                     'content="text/html; charset=windows-1252">').encode("cp1252"))
+    assert StaticFetchEngine().parse(legacy)["text"][0] == "café"
+
+
+def test_header_charset_bom_and_guess():
+    latin = html_response(page_html(f"<p>café {TEXT}</p>").encode("latin-1"), "text/html; charset=ISO-8859-1")
+    assert StaticFetchEngine().parse(latin)["text"][0] == "café"
+
+    bom = html_response(b"\xef\xbb\xbf" + page_html(f"<p>café {TEXT}</p>").encode("utf-8"),
+                        "text/html; charset=ISO-8859-1")
+    assert html_encoding(bom) == "utf-8-sig" # Byte order mark wins over the header
+    assert StaticFetchEngine().parse(bom)["text"][0] == "café"
+
+    undeclared = html_response(page_html(f"<p>{'café crème brûlée ' * 20} {TEXT}</p>").encode("utf-8"))
+    assert StaticFetchEngine().parse(undeclared)["text"][:2] == ["café", "crème"]
+
+
+def test_page_parser_reads_visible_text_and_metadata():
+    parser = PageParser("https://site.com/dir/page")
+    parser.feed('<html lang="en-US"><head><title>Site Title</title><base href="https://site.com/base/">'
+                '<link rel="canonical" href="/about"><style>p { color: red }</style></head>'
+                '<body><script>var hidden = 1;</script><p>Hello <b>visible</b> world</p>'
+                '<a href="one">1</a> <a href=" https://other.com/two ">2</a></body></html>')
+    parser.close()
+    assert parser.words == ["Hello", "visible", "world", "1", "2"]
+    assert parser.hrefs == ["https://site.com/base/one", "https://other.com/two"]
+    assert (parser.title, parser.canonical, parser.lang) == ("Site Title", "https://site.com/about", "en-US")
+
+    meta = PageParser("https://site.com/")
+    meta.feed('<html><head><meta http-equiv="Content-Language" content="de"></head><body></body></html>')
+    assert meta.lang == "de"
+
+
+def parsed(body):
+    parser = PageParser("https://site.com/")
+    parser.feed(page_html(body))
+    parser.close()
+    return parser
+
+
+def test_js_rendered_heuristic():
+    assert parsed("<p>Loading</p>").looks_js_rendered() # Empty body
+    assert not parsed(f"<p>{TEXT}</p>").looks_js_rendered()
+    # Framework mount point or noscript warning with little server-side text
+    assert parsed(f'<div id="root"></div><p>{TEXT}</p>').looks_js_rendered()
+    assert parsed(f"<noscript>Please enable JavaScript</noscript><p>{TEXT}</p>").looks_js_rendered()
+    # Server-rendered framework pages have enough text to keep
+    long_text = " ".join(f"word{n}" for n in range(250))
+    assert not parsed(f'<div id="__next"><p>{long_text}</p></div>').looks_js_rendered()
+
+
+class FakeChromeEngine:
+    def __init__(self):
+        self.links = []
+
+    def fetch(self, link, continue_link_gathering=True, deadline=None):
+        self.links.append(link)
+        return page_result(["rendered"] * 60, [])
+
+
+class FakeStaticEngine(StaticFetchEngine):
+    """
+    Static engine answering requests from a dict of link -> response
+    """
+
+    def __init__(self, responses):
+        super().__init__(pool_size=1)
+        self.responses = responses
+
+    def request(self, link, timeout=10, validators=None):
+        return self.responses.get(link) # None, as for a network error, if not listed
+
+
+def scanner(fetch_mode, responses):
+    thread = ScannerThread(fetch_mode=fetch_mode)
+    thread.static_engine = FakeStaticEngine(responses)
+    thread.chrome_engine = FakeChromeEngine()
+    return thread
+
+
+def test_static_pages_escalate_to_chrome():
+    text_page = html_response(page_html(f"<p>{TEXT}</p>").encode("utf-8"))
+    shell_page = html_response(page_html('<div id="app"></div>').encode("utf-8"))
+    responses = {
+        "https://static.com/a": text_page,
+        "https://shell.com/a": shell_page,
+        "https://shell.com/b": shell_page,
+        "https://shell.com/c": shell_page,
+        "https://shell.com/d": text_page,
+        "https://files.com/a.pdf": html_response(b"%PDF-1.4", "application/pdf"),
+    }
+    thread = scanner("auto", responses)
+    assert thread.fetch("https://static.com/a", True)["text"][0] == "word0"
+    assert thread.fetch("https://files.com/a.pdf", True)["text"] == [] # Not a page, no render
+    for link in ["https://shell.com/a", "https://shell.com/b", "https://shell.com/c"]:
+        assert thread.fetch(link, True)["text"][0] == "rendered"
+    assert FETCH_POLICY.needs_chrome("shell.com") # App shells page after page
+    # Rest of the domain goes straight to Chrome, even pages with static text
+    assert thread.fetch("https://shell.com/d", True)["text"][0] == "rendered"
+    assert thread.chrome_engine.links == ["https://shell.com/a", "https://shell.com/b", "https://shell.com/c",
+                                          "https://shell.com/d"]
+    assert (thread.static_pages, thread.chrome_pages) == (2, 4)
+
+    static = scanner("static", {"https://shell2.com/a": html_response(page_html("<p>Loading</p>").encode("utf-8"))})
+    assert static.fetch("https://shell2.com/a", True)["text"] == [] # Never rendered in static mode
+    assert static.chrome_engine.links == [] and not FETCH_POLICY.needs_chrome("shell2.com")
+
+
+def test_single_page_escalations_not_remembered():
+    responses = {"https://site.com/blocked": html_response(b"", status_code=403),
+                 "https://site.com/limited": html_response(b"", status_code=429),
+                 "https://site.com/contact": html_response(page_html("<p>Call us</p>").encode("utf-8"))}
+    for page in "abcd":
+        responses[f"https://site.com/{page}"] = html_response(page_html(f"<p>{TEXT}</p>").encode("utf-8"))
+    shell_page = html_response(page_html('<div id="root"></div>').encode("utf-8"))
+    responses.update({"https://site.com/app1": shell_page, "https://site.com/app2": shell_page,
+                      "https://site.com/app3": shell_page})
+    thread = scanner("auto", responses)
+    # Bot protection, rate limit, network error (not listed) and a short page: only that page is rendered
+    for link in ["https://site.com/blocked", "https://site.com/limited", "https://site.com/down",
+                 "https://site.com/contact"]:
+        assert thread.fetch(link, True)["text"][0] == "rendered"
+        assert thread.fetch("https://site.com/a", True)["text"][0] == "word0" # Static path still used
+    # App shells not in a row do not send the site to Chrome
+    for link in ["https://site.com/app1", "https://site.com/app2", "https://site.com/b", "https://site.com/app3"]:
+        thread.fetch(link, True)
+    assert not FETCH_POLICY.needs_chrome("site.com")
+    assert thread.fetch("https://site.com/c", True)["text"][0] == "word0"
+
+
+class FakeElement:
+    def __init__(self, text="", href=None):
+        self.text = text
+        self.href = href
+
+    def get_attribute(self, name):
+        return self.href
+
+
+class FakeRenderedDriver:
+    """
+    Stand-in for a Chrome driver with a page loaded. With script_error set,
+    the extraction script fails and only element lookups work.
+    """
+
+    def __init__(self, script_error=None):
+        self.script_error = script_error
+        self.scripts = []
+        self.lookups = 0
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        if self.script_error is not None:
+            raise self.script_error
+        # Text is cut to max words by the script itself
+        return {"text": "one two  three", "links": ["https://site.com/a"], "lang": "en",
+                "title": "Site", "canonical": "https://site.com/"}
+
+    def find_element(self, by, value):
+        self.lookups += 1
+        return FakeElement(text="body text here")
+
+    def find_elements(self, by, value):
+        self.lookups += 1
+        return [FakeElement(href="https://site.com/a"), FakeElement(href="https://site.com/b")]
+
+
+def test_page_extracted_in_one_script_call():
+    driver = FakeRenderedDriver()
+    page = extract_page(driver, max_words=3, gather_links=False)
+    assert driver.scripts == [(EXTRACT_SCRIPT, (3, False))] and driver.lookups == 0 # One round-trip
+    assert page == page_result(["one", "two", "three"], ["https://site.com/a"], "en", "Site",
+                               "https://site.com/")
+
+
+def test_extraction_falls_back_to_element_lookups(caplog):
+    driver = FakeRenderedDriver(script_error=RuntimeError("javascript error"))
+    with caplog.at_level(logging.WARNING):
+        page = extract_page(driver, max_words=2)
+    assert page == page_result(["body", "text"], ["https://site.com/a", "https://site.com/b"])
+    assert "extraction script failed" in caplog.text and "javascript error" in caplog.text
+
+    assert extract_page(driver, gather_links=False)["links"] == [] # Links not read when not gathering
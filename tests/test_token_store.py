@@ -0,0 +1,21 @@
+from src.webscraper.token_store import TokenStore
+
+
+def test_pages_round_trip():
+    pages = [["a", "rose", "is", "a", "rose"], [], ["is", "it"]]
+    store = TokenStore.from_pages(pages)
+
+    assert list(store) == pages
+    assert len(store) == 3 and store[-1] == ["is", "it"] and store[1] == []
+    assert store.words == ["a", "rose", "is", "it"] # Each word kept once
+    assert list(store.page_ids(0)) == [0, 1, 2, 0, 1]
+
+
+def test_counts():
+    store = TokenStore.from_pages([["a", "rose", "is", "a", "rose"], [], ["is", "it"]])
+
+    assert (store.word_count(), store.page_count()) == (7, 2)
+    assert list(store.page_lengths()) == [5, 0, 2]
+    assert store.word_counts() == {"a": 2, "rose": 2, "is": 2, "it": 1}
+    assert store.count_matching(lambda word: word in ("is", "it")) == 3
+    assert store.count_matching(lambda word: False) == 0
@@ -0,0 +1,61 @@
+import time
+import threading
+
+from src.webscraper import uploader as up
+from src.webscraper.uploader import Uploader
+
+
+class FakeClient:
+    """
+    Stand-in for a boto3 S3 client; the first failures calls of each key raise
+    """
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.attempts = {}
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Body, Key):
+        time.sleep(self.delay)
+        with self.lock:
+            self.attempts[Key] = self.attempts.get(Key, 0) + 1
+            if self.attempts[Key] <= self.failures:
+                raise ConnectionError("connection reset")
+            self.objects[(Bucket, Key)] = Body
+
+
+def test_uploads_retried_and_flushed(monkeypatch):
+    monkeypatch.setattr(up, "UPLOAD_BACKOFF", 0.001)
+    client = FakeClient(failures=2)
+    uploader = Uploader(client, "bucket", num_workers=3, queue_size=4)
+    done = []
+    for n in range(10):
+        uploader.put_object(Body=f"body{n}", Key=f"key{n}")
+    uploader.submit("key10", lambda client, bucket_name: client.put_object(Bucket=bucket_name, Body="x", Key="key10"),
+                    on_done=lambda succeeded: done.append(("key10", succeeded)))
+    uploader.flush()
+
+    assert len(client.objects) == 11 and client.objects[("bucket", "key3")] == "body3"
+    assert client.attempts["key3"] == 3
+    assert (uploader.uploaded, uploader.failed, done) == (11, 0, [("key10", True)])
+    uploader.close()
+
+
+def test_gives_up_and_applies_backpressure(monkeypatch):
+    monkeypatch.setattr(up, "UPLOAD_BACKOFF", 0.001)
+    uploader = Uploader(FakeClient(failures=100), "bucket", num_workers=1, queue_size=1)
+    done = []
+    uploader.put_object(Body="x", Key="lost", on_done=done.append)
+    uploader.flush()
+    assert (uploader.uploaded, uploader.failed, done) == (0, 1, [False])
+    uploader.close()
+
+    slow = Uploader(FakeClient(delay=0.05), "bucket", num_workers=1, queue_size=1)
+    start = time.time()
+    for n in range(4):
+        slow.put_object(Body="x", Key=f"key{n}") # Queue holds one: later calls wait for the worker
+    assert time.time() - start >= 0.05 and slow.blocked_time > 0
+    slow.close() # Finishes queued uploads
+    assert slow.uploaded == 4